@@ -0,0 +1,127 @@
+"""Round trips and wall time of the Amazon extraction, per fixture.
+
+Compares the former one-call-per-field extraction with the extraction
+AmazonAsyncProduct runs in production: bot wall check, readiness wait,
+single in-page script and page snapshot. Both start with the navigation.
+Round trips are the requests actually sent to the browser, counted at the
+playwright protocol level. Run with `poe bench_extraction`.
+"""
+
+import asyncio
+import pathlib
+import tempfile
+import time
+from typing import Any, Awaitable, Callable
+from unittest.mock import Mock
+
+from aiohttp import web
+from camoufox.async_api import AsyncCamoufox
+from playwright._impl._connection import Channel
+from playwright.async_api import Browser, Page
+from xtracted_common.model import AmazonProductUrl
+
+from tests.integration.amazon_server import new_web_app
+from xtracted.context import CrawlContext
+from xtracted.crawlers.amazon.amazon_async_product import (
+    TWISTER_INIT_DATA,
+    AmazonAsyncProduct,
+)
+from xtracted.crawlers.page_cache import PageCache
+from xtracted.crawlers.readiness import ReadinessPolicy
+
+asins = sorted(
+    path.stem for path in (pathlib.Path(__file__).parent / 'asins').glob('*.html')
+)
+readiness = ReadinessPolicy(selectors=['#averageCustomerReviews'], timeout_ms=5000)
+# only read when the page is extracted, nothing is written to it
+page_cache = PageCache(tempfile.gettempdir(), ttl_seconds=0, max_bytes=0)
+
+
+class RoundTrips:
+    """Counts the requests playwright sends and waits for a reply to."""
+
+    def __init__(self) -> None:
+        self.count = 0
+        inner_send = Channel._inner_send
+
+        async def counted(channel: Channel, *args: Any, **kwargs: Any) -> Any:
+            self.count += 1
+            return await inner_send(channel, *args, **kwargs)
+
+        Channel._inner_send = counted  # type: ignore
+
+
+round_trips = RoundTrips()
+
+
+async def per_field_extraction(page: Page, url: str) -> None:
+    await readiness.navigate(page, url)
+    await page.locator('#averageCustomerReviews').first.get_attribute('data-asin')
+    for element in await page.locator('#feature-bullets ul li').all():
+        await element.text_content()
+    await page.evaluate('document.location.href')
+    await page.evaluate(f'mw:{TWISTER_INIT_DATA}')
+
+
+async def production_extraction(page: Page, url: str) -> None:
+    ctx = Mock(spec=CrawlContext)
+    ctx.get_crawler_url.return_value = AmazonProductUrl(
+        job_id='bench', url=url, uid='bench'
+    )
+    product = AmazonAsyncProduct(
+        crawl_context=ctx, readiness=readiness, page_cache=page_cache
+    )
+    await product.extract(page)
+
+
+async def measure(
+    browser: Browser, url: str, extraction: Callable[[Page, str], Awaitable[None]]
+) -> tuple[int, float]:
+    page = await browser.new_page()
+    try:
+        counted = round_trips.count
+        started = time.perf_counter()
+        await extraction(page, url)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        return round_trips.count - counted, elapsed_ms
+    finally:
+        await page.close()
+
+
+async def main() -> None:
+    runner = web.AppRunner(new_web_app())
+    await runner.setup()
+    site = web.TCPSite(runner, 'localhost', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]  # type: ignore
+
+    print(f'{"asin":12s} {"per field":>18s} {"production":>18s}')
+    totals = [0, 0.0, 0, 0.0]
+    try:
+        async with AsyncCamoufox(main_world_eval=True) as browser:  # type: ignore
+            for asin in asins:
+                url = f'http://localhost:{port}/dp/{asin}'
+                try:
+                    legacy = await measure(browser, url, per_field_extraction)
+                    production = await measure(browser, url, production_extraction)
+                except Exception as e:
+                    print(f'{asin:12s} skipped: {e}')
+                    continue
+                totals = [
+                    totals[0] + legacy[0],
+                    totals[1] + legacy[1],
+                    totals[2] + production[0],
+                    totals[3] + production[1],
+                ]
+                print(
+                    f'{asin:12s} {legacy[0]:5d} rt {legacy[1]:8.1f}ms {production[0]:5d} rt {production[1]:8.1f}ms'
+                )
+    finally:
+        await runner.cleanup()
+    print(
+        f'{"total":12s} {totals[0]:5d} rt {totals[1]:8.1f}ms {totals[2]:5d} rt {totals[3]:8.1f}ms'
+    )
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -7,7 +7,7 @@ from asyncpg import Connection
 from pydantic_settings import BaseSettings
 from xtracted_common.services.jobs_service import PostgresJobService
 
-from xtracted.context import CrawlSyncer, PostgresCrawlSyncer
+from xtracted.context import PostgresCrawlSyncer
 from xtracted.crawler_configuration import CrawlerConfig
 from xtracted.services.crawlers_services import CrawlersService, PostgresCrawlersService
 
@@ -35,7 +35,9 @@ def docker_compose_file(project_root_path: str) -> str:
 async def crawlers_service(
     conf: CrawlerConfig, pg_client: Connection
 ) -> AsyncGenerator[CrawlersService, Any]:
-    yield PostgresCrawlersService(conf)
+    service = PostgresCrawlersService(conf)
+    yield service
+    await service.clients.close()
 
 
 @pytest.fixture(scope='function')
@@ -50,5 +52,10 @@ async def jobs_service(
     yield PostgresJobService(conf)
 
 
-async def crawl_syncer(conf: CrawlerConfig) -> CrawlSyncer:
-    return PostgresCrawlSyncer(conf)
+@pytest.fixture(scope='function')
+async def crawl_syncer(
+    conf: CrawlerConfig,
+) -> AsyncGenerator[PostgresCrawlSyncer, Any]:
+    syncer = PostgresCrawlSyncer(conf)
+    yield syncer
+    await syncer.clients.close()
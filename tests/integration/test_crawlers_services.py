@@ -1,5 +1,7 @@
+import json
 from uuid import UUID
 
+from asyncpg import Connection
 from pydantic import HttpUrl
 from xtracted_common.model import XtractedUrlType
 from xtracted_common.services.jobs_service import PostgresJobService
@@ -132,3 +134,90 @@ async def test_add_crawler_url_returns_url_when_does_not_exsist(
     assert added.url_type == XtractedUrlType.amazon_product
     assert added.job_urls_seq > 3
     assert added.user_id == with_uuid
+
+
+async def test_add_crawler_urls_only_adds_new_urls(
+    crawlers_service: CrawlersService,
+    with_uuid: UUID,
+    conf: CrawlerConfig,
+    with_user_token: str,
+    pg_client: Connection,
+) -> None:
+    job_service = PostgresJobService(config=conf)
+    crawl_job = await create_crawl_job(
+        job_service=job_service, token=with_user_token, urls=urls
+    )
+
+    added = await crawlers_service.add_crawler_urls(
+        user_id=with_uuid,
+        job_id=crawl_job.job_id,
+        urls=[
+            'https://www.amazon.co.uk/dp/B0931VRJT5',
+            'https://www.amazon.co.uk/dp/B0931VRJT8',
+            'https://www.amazon.co.uk/dp/B0931VRJT9',
+            'https://www.amazon.co.uk/dp/B0931VRJT9?psc=1',
+            'https://www.example.com/not-a-product',
+        ],
+    )
+
+    assert [crawler_url.url_id for crawler_url in added] == [
+        'B0931VRJT8',
+        'B0931VRJT9',
+    ]
+    assert added[0].job_urls_seq < added[1].job_urls_seq
+
+    crawl_job_urls = await crawlers_service.list_crawler_urls(
+        user_id=with_uuid, job_id=crawl_job.job_id
+    )
+    assert len(crawl_job_urls) == 4
+
+    events = await pg_client.fetch("""select * from pgmq.q_job_urls""")
+    assert sorted(json.loads(event['message'])['url_id'] for event in events) == [
+        'B0931VRJT8',
+        'B0931VRJT9',
+    ]
+
+
+async def test_add_crawler_urls_caps_the_job_size(
+    crawlers_service: CrawlersService,
+    with_uuid: UUID,
+    conf: CrawlerConfig,
+    with_user_token: str,
+) -> None:
+    job_service = PostgresJobService(config=conf)
+    crawl_job = await create_crawl_job(
+        job_service=job_service, token=with_user_token, urls=urls
+    )
+
+    added = await crawlers_service.add_crawler_urls(
+        user_id=with_uuid,
+        job_id=crawl_job.job_id,
+        urls=[
+            'https://www.amazon.co.uk/dp/B0931VRJT7',
+            'https://www.amazon.co.uk/dp/B0931VRJT8',
+            'https://www.amazon.co.uk/dp/B0931VRJT9',
+        ],
+        max_job_urls=3,
+    )
+
+    assert [crawler_url.url_id for crawler_url in added] == ['B0931VRJT7']
+
+
+async def test_existing_url_ids(
+    crawlers_service: CrawlersService,
+    with_uuid: UUID,
+    conf: CrawlerConfig,
+    with_user_token: str,
+) -> None:
+    job_service = PostgresJobService(config=conf)
+    crawl_job = await create_crawl_job(
+        job_service=job_service, token=with_user_token, urls=urls
+    )
+
+    existing = await crawlers_service.existing_url_ids(
+        user_id=with_uuid,
+        job_id=crawl_job.job_id,
+        url_ids=['B0931VRJT5', 'B0931VRJT9'],
+    )
+
+    assert existing == {'B0931VRJT5'}
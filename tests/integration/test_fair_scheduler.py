@@ -0,0 +1,37 @@
+from asyncpg import Connection
+
+from xtracted.crawler_configuration import CrawlerConfig
+from xtracted.services.postgres_clients import PostgresClients
+from xtracted.workers.fair_scheduler import NO_USER_KEY, FairScheduler
+
+
+async def test_fair_read_claims_messages_across_users(
+    conf: CrawlerConfig, pg_client: Connection
+) -> None:
+    clients = PostgresClients(conf)
+    try:
+        queue = await clients.queue()
+        await queue.send_batch(
+            'job_urls',
+            [{'event': 'new_url', 'user_id': 'big', 'job_id': 1} for _ in range(5)]
+            + [{'event': 'new_url', 'user_id': 'small', 'job_id': 2}]
+            + [{'event': 'new_url', 'job_id': 3}],
+        )
+
+        scheduler = FairScheduler()
+        async with clients.acquire() as conn:
+            messages = await scheduler.read(conn, vt=30, qty=3)
+            assert sorted(
+                scheduler.key_of(message.message) for message in messages
+            ) == [
+                'big',
+                NO_USER_KEY,
+                'small',
+            ]
+            assert all(message.read_ct == 1 for message in messages)
+
+            # claimed messages are invisible to the next read
+            messages = await scheduler.read(conn, vt=30, qty=10)
+            assert [message.message['user_id'] for message in messages] == ['big'] * 4
+    finally:
+        await clients.close()
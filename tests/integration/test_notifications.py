@@ -0,0 +1,52 @@
+from xtracted.crawler_configuration import CrawlerConfig
+from xtracted.services.postgres_clients import PostgresClients
+from xtracted.workers.notifications import (
+    QueueNotifier,
+    install_notify_triggers,
+    seconds_until_visible,
+)
+
+
+async def test_notifier_wakes_on_enqueue(conf: CrawlerConfig) -> None:
+    clients = PostgresClients(conf)
+    queue = await clients.queue()
+    notifier = QueueNotifier(conf)
+    try:
+        assert await notifier.listen()
+        notifier.arm('job_urls')
+        notifier.arm('jobs')
+        assert not await notifier.wait('job_urls', 0.2)
+
+        await queue.send_batch('job_urls', [{'event': 'noop'}, {'event': 'noop'}])
+
+        assert await notifier.wait('job_urls', 5)
+        assert not await notifier.wait('jobs', 0.2)
+    finally:
+        await notifier.close()
+        await clients.close()
+
+
+async def test_install_notify_triggers_is_idempotent(conf: CrawlerConfig) -> None:
+    clients = PostgresClients(conf)
+    try:
+        async with clients.acquire() as conn:
+            await install_notify_triggers(conn)
+            await install_notify_triggers(conn)
+            count = await conn.fetchval(
+                """select count(*) from pg_trigger where tgname = 'xtracted_notify'"""
+            )
+        assert count == 2
+    finally:
+        await clients.close()
+
+
+async def test_seconds_until_visible(conf: CrawlerConfig) -> None:
+    clients = PostgresClients(conf)
+    queue = await clients.queue()
+    try:
+        async with clients.acquire() as conn:
+            await queue.send('jobs', {'event': 'noop'}, delay=30)
+            visible_in = await seconds_until_visible(conn, 'jobs')
+        assert visible_in is not None and 0 < visible_in <= 30
+    finally:
+        await clients.close()
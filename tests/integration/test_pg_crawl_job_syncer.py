@@ -1,3 +1,4 @@
+import asyncio
 import json
 from typing import Any
 from uuid import UUID
@@ -13,7 +14,7 @@ from xtracted_common.services.jobs_service import JobsService, PostgresJobServic
 from tests.utilities import create_crawl_job, wait_for_condition
 from xtracted.context import PostgresCrawlSyncer
 from xtracted.crawler_configuration import CrawlerConfig
-from xtracted.model import CrawlerUrl
+from xtracted.model import CrawlerUrl, PermanentCrawlException
 from xtracted.services.crawlers_services import CrawlersService
 
 urls = [
@@ -30,13 +31,13 @@ async def list_crawler_urls(
 
 async def test_syncer_update_crawler_url(
     conf: CrawlerConfig,
+    crawl_syncer: PostgresCrawlSyncer,
     crawlers_service: CrawlersService,
     jobs_service: JobsService,
     pg_stack: Any,
     with_uuid: UUID,
     with_user_token: str,
 ) -> None:
-    syncer = PostgresCrawlSyncer(conf)
     crawl_job = await create_crawl_job(
         job_service=jobs_service, token=with_user_token, urls=urls
     )
@@ -48,7 +49,7 @@ async def test_syncer_update_crawler_url(
     assert crawler_urls[1].status == CrawlJobUrlStatus.pending
 
     crawler_urls[0].status = CrawlJobUrlStatus.running
-    await syncer.sync(crawler_urls[0])
+    await crawl_syncer.sync(crawler_urls[0])
 
     crawl_urls = await list_crawler_urls(crawlers_service, with_uuid, crawl_job.job_id)
 
@@ -57,11 +58,13 @@ async def test_syncer_update_crawler_url(
 
 
 async def test_syncer_ack_message(
-    conf: CrawlerConfig, pgmq_client: PGMQueue, pg_client: Connection
+    conf: CrawlerConfig,
+    crawl_syncer: PostgresCrawlSyncer,
+    pgmq_client: PGMQueue,
+    pg_client: Connection,
 ) -> None:
     msg_id = await pgmq_client.send('job_urls', {'hello': 'world'}, conn=pg_client)
-    syncer = PostgresCrawlSyncer(conf)
-    await syncer.ack(msg_id)
+    await crawl_syncer.ack(msg_id)
     archived = await pg_client.fetchrow(
         """select * from pgmq.a_job_urls where msg_id = $1""", msg_id
     )
@@ -71,17 +74,17 @@ async def test_syncer_ack_message(
 
 async def test_syncer_enqueue_url_does_nothing_when_url_exists(
     conf: CrawlerConfig,
+    crawl_syncer: PostgresCrawlSyncer,
     pgmq_client: PGMQueue,
     pg_client: Connection,
     with_uuid: UUID,
     with_user_token: str,
 ) -> None:
-    syncer = PostgresCrawlSyncer(conf)
     job_service = PostgresJobService(config=conf)
     crawl_job = await create_crawl_job(
         job_service=job_service, token=with_user_token, urls=urls
     )
-    enqueued = await syncer.enqueue(
+    enqueued = await crawl_syncer.enqueue(
         user_id=with_uuid,
         job_id=crawl_job.job_id,
         url=HttpUrl('https://www.amazon.co.uk/dp/B0931VRJT6?something=different'),
@@ -91,18 +94,18 @@ async def test_syncer_enqueue_url_does_nothing_when_url_exists(
 
 async def test_syncer_enqueue_url_when_url_does_not_exists(
     conf: CrawlerConfig,
+    crawl_syncer: PostgresCrawlSyncer,
     pgmq_client: PGMQueue,
     pg_client: Connection,
     crawlers_service: CrawlersService,
     with_uuid: UUID,
     with_user_token: str,
 ) -> None:
-    syncer = PostgresCrawlSyncer(conf)
     job_service = PostgresJobService(config=conf)
     crawl_job = await create_crawl_job(
         job_service=job_service, token=with_user_token, urls=urls
     )
-    enqueued = await syncer.enqueue(
+    enqueued = await crawl_syncer.enqueue(
         user_id=with_uuid,
         job_id=crawl_job.job_id,
         url=HttpUrl('https://www.amazon.co.uk/dp/B0931VRJT9'),
@@ -118,18 +121,18 @@ async def test_syncer_enqueue_url_when_url_does_not_exists(
 
 async def test_syncer_enqueue_url_and_send_event_when_url_does_not_exists(
     conf: CrawlerConfig,
+    crawl_syncer: PostgresCrawlSyncer,
     pgmq_client: PGMQueue,
     pg_client: Connection,
     crawlers_service: CrawlersService,
     with_uuid: UUID,
     with_user_token: str,
 ) -> None:
-    syncer = PostgresCrawlSyncer(conf)
     job_service = PostgresJobService(config=conf)
     crawl_job = await create_crawl_job(
         job_service=job_service, token=with_user_token, urls=urls
     )
-    enqueued = await syncer.enqueue(
+    enqueued = await crawl_syncer.enqueue(
         user_id=with_uuid,
         job_id=crawl_job.job_id,
         url=HttpUrl('https://www.amazon.co.uk/dp/B0931VRJT9'),
@@ -149,13 +152,13 @@ async def test_syncer_enqueue_url_and_send_event_when_url_does_not_exists(
 
 async def test_syncer_complete_archive_event(
     conf: CrawlerConfig,
+    crawl_syncer: PostgresCrawlSyncer,
     pgmq_client: PGMQueue,
     pg_client: Connection,
     with_uuid: UUID,
     with_user_token: str,
     crawlers_service: CrawlersService,
 ) -> None:
-    syncer = PostgresCrawlSyncer(conf)
     job_service = PostgresJobService(config=conf)
     crawl_job = await create_crawl_job(
         job_service=job_service, token=with_user_token, urls=urls
@@ -178,7 +181,7 @@ async def test_syncer_complete_archive_event(
         },
         conn=pg_client,
     )
-    await syncer.complete(existing_url, msg_id, {'hello': 'world'})
+    await crawl_syncer.complete(existing_url, msg_id, {'hello': 'world'})
 
     row = await pg_client.fetchrow(
         """select * from job_urls where url_id = $1""", existing_url.url_id
@@ -188,8 +191,74 @@ async def test_syncer_complete_archive_event(
     assert json.loads(row['data']) == {'hello': 'world'}
 
 
+async def test_syncer_complete_batches_concurrent_completions(
+    conf: CrawlerConfig,
+    crawl_syncer: PostgresCrawlSyncer,
+    pgmq_client: PGMQueue,
+    pg_client: Connection,
+    with_uuid: UUID,
+    with_user_token: str,
+    crawlers_service: CrawlersService,
+) -> None:
+    job_service = PostgresJobService(config=conf)
+    crawl_job = await create_crawl_job(
+        job_service=job_service, token=with_user_token, urls=urls
+    )
+    requests_before = await pg_client.fetchval(
+        """select requests from api_requests where user_id = $1""", with_uuid
+    )
+
+    crawler_urls = await list_crawler_urls(
+        crawlers_service, with_uuid, crawl_job.job_id
+    )
+    msg_ids = []
+    for crawler_url in crawler_urls:
+        msg_ids.append(
+            await pgmq_client.send(
+                'job_urls',
+                {
+                    'event': 'new_url',
+                    'job_id': crawl_job.job_id,
+                    'user_id': with_uuid,
+                    'url_id': crawler_url.url_id,
+                    'url': str(crawler_url.url),
+                },
+                conn=pg_client,
+            )
+        )
+        crawler_url.status = CrawlJobUrlStatus.complete
+
+    await asyncio.gather(
+        *[
+            crawl_syncer.complete(crawler_url, msg_id, {'url_id': crawler_url.url_id})
+            for crawler_url, msg_id in zip(crawler_urls, msg_ids)
+        ]
+    )
+
+    rows = await pg_client.fetch(
+        """select * from job_urls where job_id = $1 and user_id = $2""",
+        crawl_job.job_id,
+        with_uuid,
+    )
+    assert len(rows) == 2
+    for row in rows:
+        assert row['status'] == CrawlJobUrlStatus.complete
+        assert json.loads(row['data']) == {'url_id': row['url_id']}
+
+    archived = await pg_client.fetch(
+        """select * from pgmq.a_job_urls where msg_id = any($1::bigint[])""", msg_ids
+    )
+    assert len(archived) == 2
+
+    requests_after = await pg_client.fetchval(
+        """select requests from api_requests where user_id = $1""", with_uuid
+    )
+    assert requests_after == requests_before - 2
+
+
 async def test_syncer_should_report_errors(
     conf: CrawlerConfig,
+    crawl_syncer: PostgresCrawlSyncer,
     pgmq_client: PGMQueue,
     pg_client: Connection,
     with_uuid: UUID,
@@ -207,7 +276,6 @@ async def test_syncer_should_report_errors(
         assert job_url['errors'] == [repr(ValueError('KABOOM!'))]
         assert job_url['retries'] == 1
 
-    syncer = PostgresCrawlSyncer(conf)
     job_service = PostgresJobService(config=conf)
     crawl_job = await create_crawl_job(
         job_service=job_service, token=with_user_token, urls=urls
@@ -233,13 +301,14 @@ async def test_syncer_should_report_errors(
 
     assert existing_url is not None
 
-    await syncer.report_error(existing_url, msg_id, ValueError('KABOOM!'))
+    await crawl_syncer.report_error(existing_url, msg_id, ValueError('KABOOM!'))
 
     await wait_for_condition(cond)
 
 
 async def test_syncer_should_discard_message_when_3_consecutive_failures(
     conf: CrawlerConfig,
+    crawl_syncer: PostgresCrawlSyncer,
     pgmq_client: PGMQueue,
     pg_client: Connection,
     with_uuid: UUID,
@@ -261,7 +330,6 @@ async def test_syncer_should_discard_message_when_3_consecutive_failures(
         )
         assert archived_message is not None
 
-    syncer = PostgresCrawlSyncer(conf)
     job_service = PostgresJobService(config=conf)
     crawl_job = await create_crawl_job(
         job_service=job_service, token=with_user_token, urls=urls
@@ -286,16 +354,64 @@ async def test_syncer_should_discard_message_when_3_consecutive_failures(
     )
 
     existing_url.retries = 1
-    await syncer.report_error(existing_url, msg_id, ValueError('KABOOM!'))
+    await crawl_syncer.report_error(existing_url, msg_id, ValueError('KABOOM!'))
 
     existing_url.retries = 2
-    await syncer.report_error(existing_url, msg_id, ValueError('KABOOM2!'))
+    await crawl_syncer.report_error(existing_url, msg_id, ValueError('KABOOM2!'))
 
     existing_url.retries = 3
-    await syncer.report_error(existing_url, msg_id, ValueError('KABOOM3!'))
+    await crawl_syncer.report_error(existing_url, msg_id, ValueError('KABOOM3!'))
 
     await wait_for_condition(cond)
 
 
 async def test_syncer_complete_decrease_request() -> None:
     pass
+
+
+async def test_syncer_archives_permanent_errors_and_delays_transient_ones(
+    conf: CrawlerConfig,
+    crawl_syncer: PostgresCrawlSyncer,
+    pgmq_client: PGMQueue,
+    pg_client: Connection,
+    with_uuid: UUID,
+    with_user_token: str,
+    crawlers_service: CrawlersService,
+) -> None:
+    job_service = PostgresJobService(config=conf)
+    crawl_job = await create_crawl_job(
+        job_service=job_service, token=with_user_token, urls=urls
+    )
+    crawler_urls = await list_crawler_urls(
+        crawlers_service, with_uuid, crawl_job.job_id
+    )
+    msg_ids = await pgmq_client.send_batch(
+        'job_urls',
+        [
+            {
+                'event': 'new_url',
+                'job_id': crawl_job.job_id,
+                'user_id': with_uuid,
+                'url_id': crawler_url.url_id,
+                'url': str(crawler_url.url),
+            }
+            for crawler_url in crawler_urls
+        ],
+        conn=pg_client,
+    )
+
+    await crawl_syncer.report_error(
+        crawler_urls[0], msg_ids[0], PermanentCrawlException('http status 404')
+    )
+    await crawl_syncer.report_error(crawler_urls[1], msg_ids[1], TimeoutError())
+
+    archived = await pg_client.fetchval(
+        """select count(*) from pgmq.a_job_urls where msg_id = $1""", msg_ids[0]
+    )
+    assert archived == 1
+    delayed = await pg_client.fetchval(
+        """select vt > now() + make_interval(secs => $2) from pgmq.q_job_urls where msg_id = $1""",
+        msg_ids[1],
+        conf.crawler_retry_base_seconds / 2 - 1,
+    )
+    assert delayed
@@ -1,12 +1,16 @@
+import asyncio
 import json
 from typing import Any
+from unittest.mock import Mock
 
 from asyncpg import Connection
+from tembo_pgmq_python.async_queue import PGMQueue
 from xtracted_common.services.jobs_service import PostgresJobService
 
 from tests.integration.amazon_server import new_web_app
 from tests.utilities import create_crawl_job, wait_for_condition
 from xtracted.crawler_configuration import CrawlerConfig
+from xtracted.services.completion_writer import install_completed_at
 from xtracted.workers.pg_crawl_job_worker import PGCrawlJobWorker
 
 
@@ -168,7 +172,7 @@ async def test_crawl_job_worker_crawls_reset_all_urls(
     await worker.cancel()
 
 
-async def test_crawler_should_report_error_and_discard_after_3_attempts(
+async def test_crawler_should_report_missing_product_and_discard_it_at_once(
     conf: CrawlerConfig,
     pg_client: Connection,
     with_user_token: str,
@@ -187,8 +191,10 @@ async def test_crawler_should_report_error_and_discard_after_3_attempts(
         )
         assert job_url is not None
         assert job_url['errors'] is not None
+        # a 404 is permanent, no point in crawling it 3 times
         errors = job_url['errors']
-        assert len(errors) == 3
+        assert len(errors) == 1
+        assert job_url['retries'] == 1
 
         archived_errors = await pg_client.fetchrow("""select * from pgmq.a_job_urls""")
         assert archived_errors is not None
@@ -209,3 +215,276 @@ async def test_crawler_should_report_error_and_discard_after_3_attempts(
     await wait_for_condition(cond, timeout=30)
 
     await worker.cancel()
+
+
+async def test_crawl_job_worker_reads_no_more_urls_than_free_slots(
+    conf: CrawlerConfig,
+    pg_client: Connection,
+    with_user_token: str,
+    with_user: str,
+    aiohttp_server: Any,
+) -> None:
+    server = await aiohttp_server(new_web_app())
+
+    conf.crawler_max_crawl_tasks = 1
+    conf.crawler_url_qty = 10
+
+    async def cond() -> Any:
+        completed = await pg_client.fetchval(
+            """select count(*) from job_urls where job_id = $1 and user_id = $2 and data is not null and completed_at is not null""",
+            crawl_job.job_id,
+            with_user,
+        )
+        assert completed == len(urls)
+
+    urls = [
+        f'http://localhost:{server.port}/dp/{asin}'
+        for asin in ('B01GFPWTI4', 'B09Y58N791', 'B09YVBJH4S')
+    ]
+
+    job_service = PostgresJobService(config=conf)
+    crawl_job = await create_crawl_job(
+        job_service=job_service, token=with_user_token, urls=urls
+    )
+
+    await job_service.run_job(token=with_user_token, job_id=crawl_job.job_id)
+
+    worker = PGCrawlJobWorker(conf)
+    in_flight = []
+    crawl = worker.crawl
+
+    def tracking_crawl(message: Any) -> None:
+        crawl(message)
+        in_flight.append(len(worker.crawling_tasks))
+
+    worker.crawl = tracking_crawl  # type: ignore
+
+    worker.run()
+
+    await wait_for_condition(cond, timeout=30)
+    await worker.cancel()
+    assert max(in_flight) == 1
+
+
+async def test_blocked_host_does_not_hold_up_the_other_hosts(
+    conf: CrawlerConfig,
+    pg_client: Connection,
+    with_user_token: str,
+    with_user: str,
+    aiohttp_server: Any,
+) -> None:
+    server = await aiohttp_server(new_web_app())
+
+    # one message per read, the blocked host ones come first
+    conf.crawler_url_qty = 1
+
+    blocked_url = f'http://localhost:{server.port}/dp/B01GFPWTI4'
+    open_url = f'http://127.0.0.1:{server.port}/dp/B09Y58N791'
+
+    async def cond() -> Any:
+        data = await pg_client.fetchval(
+            """select data from job_urls where job_id = $1 and user_id = $2 and url_id = 'B09Y58N791'""",
+            crawl_job.job_id,
+            with_user,
+        )
+        assert data is not None
+
+    job_service = PostgresJobService(config=conf)
+    crawl_job = await create_crawl_job(
+        job_service=job_service, token=with_user_token, urls=[blocked_url, open_url]
+    )
+
+    worker = PGCrawlJobWorker(conf)
+    # the breaker of the first host stays open for a minute
+    for _ in range(conf.crawler_breaker_threshold):
+        worker.circuit_breakers.record_blocked(blocked_url)
+
+    await job_service.run_job(token=with_user_token, job_id=crawl_job.job_id)
+    worker.run()
+
+    await wait_for_condition(cond)
+    await worker.cancel()
+
+    blocked = await pg_client.fetchval(
+        """select data from job_urls where job_id = $1 and user_id = $2 and url_id = 'B01GFPWTI4'""",
+        crawl_job.job_id,
+        with_user,
+    )
+    assert blocked is None
+
+
+async def test_incremental_run_job_only_resets_urls_to_refresh(
+    conf: CrawlerConfig,
+    pg_client: Connection,
+    pgmq_client: PGMQueue,
+    with_user_token: str,
+    with_user: str,
+    aiohttp_server: Any,
+) -> None:
+    server = await aiohttp_server(new_web_app())
+
+    urls = [
+        f'http://localhost:{server.port}/dp/B01GFPWTI4',
+        f'http://localhost:{server.port}/dp/B09Y58N791',
+    ]
+    job_service = PostgresJobService(config=conf)
+    crawl_job = await create_crawl_job(
+        job_service=job_service, token=with_user_token, urls=urls
+    )
+    await install_completed_at(pg_client)
+    # completed recently, although created long ago
+    await pg_client.execute(
+        """update job_urls set status = 'complete', data = $1, created_at = now() - interval '2 days', completed_at = now() where url_id = 'B01GFPWTI4'""",
+        json.dumps({'hello': 'world'}),
+    )
+    # created just now by a previous run, but completed too long ago
+    await pg_client.execute(
+        """update job_urls set status = 'complete', data = $1, completed_at = now() - interval '2 days' where url_id = 'B09Y58N791'""",
+        json.dumps({'hello': 'world'}),
+    )
+    created_at = await pg_client.fetchval(
+        """select created_at from job_urls where url_id = 'B09Y58N791'"""
+    )
+
+    await pgmq_client.send(
+        'jobs',
+        {
+            'event': 'run_job',
+            'job_id': crawl_job.job_id,
+            'user_id': with_user,
+            'mode': 'incremental',
+        },
+    )
+
+    async def cond() -> Any:
+        refreshed = await pg_client.fetchval(
+            """select created_at from job_urls where url_id = 'B09Y58N791'"""
+        )
+        assert refreshed != created_at
+
+    worker = PGCrawlJobWorker(conf)
+    worker.run()
+
+    await wait_for_condition(cond)
+    await worker.cancel()
+
+    fresh = await pg_client.fetchrow(
+        """select * from job_urls where url_id = 'B01GFPWTI4'"""
+    )
+    assert json.loads(fresh['data']) == {'hello': 'world'}
+
+
+async def test_drain_lets_crawls_in_flight_finish(
+    conf: CrawlerConfig,
+    pg_client: Connection,
+    with_user_token: str,
+    with_user: str,
+    aiohttp_server: Any,
+) -> None:
+    server = await aiohttp_server(new_web_app())
+
+    urls = [f'http://localhost:{server.port}/dp/B01GFPWTI4']
+    job_service = PostgresJobService(config=conf)
+    crawl_job = await create_crawl_job(
+        job_service=job_service, token=with_user_token, urls=urls
+    )
+    await job_service.run_job(token=with_user_token, job_id=crawl_job.job_id)
+
+    worker = PGCrawlJobWorker(conf)
+    worker.run()
+
+    async def crawling() -> Any:
+        assert worker.crawling_tasks
+
+    await wait_for_condition(crawling, timeout=20)
+    await worker.drain(30)
+
+    assert all(task.done() for task in worker.polling_tasks)
+    completed = await pg_client.fetchval(
+        """select count(*) from job_urls where job_id = $1 and user_id = $2 and data is not null""",
+        crawl_job.job_id,
+        with_user,
+    )
+    assert completed == 1
+
+
+async def test_drain_releases_unfinished_messages(
+    conf: CrawlerConfig,
+    pg_client: Connection,
+    pgmq_client: PGMQueue,
+    with_user: str,
+) -> None:
+    conf.crawler_url_vt = 60
+    msg_id = await pgmq_client.send(
+        'job_urls',
+        {
+            'event': 'new_url',
+            'job_id': 1,
+            'user_id': with_user,
+            'url_id': 'B01GFPWTI4',
+            'url': 'http://localhost/dp/B01GFPWTI4',
+        },
+    )
+
+    worker = PGCrawlJobWorker(conf)
+
+    def stalled_crawl(message: Any) -> None:
+        task = asyncio.create_task(asyncio.sleep(3600))
+        worker.crawling_tasks.add(task)
+        worker.heartbeat.track(message.msg_id)
+
+    worker.crawl = stalled_crawl  # type: ignore
+    worker.run()
+
+    async def crawling() -> Any:
+        assert msg_id in worker.heartbeat.msg_ids
+
+    await wait_for_condition(crawling)
+    await worker.drain(0.1)
+
+    visible = await pg_client.fetchval(
+        """select vt <= now() from pgmq.q_job_urls where msg_id = $1""", msg_id
+    )
+    assert visible
+
+
+async def test_drain_keeps_the_retry_delay_of_reported_messages(
+    conf: CrawlerConfig,
+    pg_client: Connection,
+    pgmq_client: PGMQueue,
+    with_user: str,
+) -> None:
+    conf.crawler_url_vt = 60
+    msg_id = await pgmq_client.send(
+        'job_urls',
+        {
+            'event': 'new_url',
+            'job_id': 1,
+            'user_id': with_user,
+            'url_id': 'B01GFPWTI4',
+            'url': 'http://localhost/dp/B01GFPWTI4',
+        },
+    )
+
+    worker = PGCrawlJobWorker(conf)
+
+    def failed_crawl(message: Any) -> None:
+        # reported its error, still running when the worker drains
+        task = asyncio.create_task(asyncio.sleep(3600))
+        worker.crawling_tasks.add(task)
+        worker.heartbeat.track(message.msg_id)
+        worker.on_error(Mock(), message.msg_id, Exception('failed'))
+
+    worker.crawl = failed_crawl  # type: ignore
+    worker.run()
+
+    async def crawled() -> Any:
+        assert worker.crawling_tasks
+
+    await wait_for_condition(crawled)
+    await worker.drain(0.1)
+
+    visible = await pg_client.fetchval(
+        """select vt <= now() from pgmq.q_job_urls where msg_id = $1""", msg_id
+    )
+    assert not visible
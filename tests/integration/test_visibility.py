@@ -0,0 +1,39 @@
+from asyncpg import Connection
+
+from xtracted.crawler_configuration import CrawlerConfig
+from xtracted.services.postgres_clients import PostgresClients
+from xtracted.workers.visibility import VisibilityHeartbeat
+
+
+async def test_heartbeat_extends_in_flight_messages(
+    conf: CrawlerConfig, pg_client: Connection
+) -> None:
+    clients = PostgresClients(conf)
+    try:
+        queue = await clients.queue()
+        msg_ids = await queue.send_batch(
+            'job_urls', [{'event': 'noop'}, {'event': 'noop'}]
+        )
+        messages = await queue.read_batch('job_urls', vt=1, batch_size=2)
+        assert messages is not None
+        assert {message.msg_id for message in messages} == set(msg_ids)
+
+        heartbeat = VisibilityHeartbeat(clients, 'job_urls', vt=30, interval_seconds=1)
+        heartbeat.track(msg_ids[0])
+        assert await heartbeat.beat() == 1
+
+        extended = await pg_client.fetchval(
+            """select vt > now() + interval '20 seconds' from pgmq.q_job_urls where msg_id = $1""",
+            msg_ids[0],
+        )
+        assert extended
+        not_tracked = await pg_client.fetchval(
+            """select vt > now() + interval '20 seconds' from pgmq.q_job_urls where msg_id = $1""",
+            msg_ids[1],
+        )
+        assert not not_tracked
+
+        heartbeat.untrack(msg_ids[0])
+        assert await heartbeat.beat() == 0
+    finally:
+        await clients.close()
@@ -1,11 +1,17 @@
+import pathlib
 from typing import Any
-from unittest.mock import Mock
+from unittest.mock import AsyncMock, Mock
 
+from aiohttp import web
 from xtracted_common.model import AmazonProductUrl
 
 from tests.integration.amazon_server import new_web_app
 from xtracted.context import CrawlContext
 from xtracted.crawlers.amazon.amazon_async_product import AmazonAsyncProduct
+from xtracted.crawlers.browser_pool import BrowserPool
+from xtracted.crawlers.http_fetcher import HttpFetcher, HttpPage
+from xtracted.crawlers.page_cache import PageCache
+from xtracted.model import BlockedCrawlException, PermanentCrawlException
 
 
 async def test_extract_data_update_crawl_context(aiohttp_server: Any) -> None:
@@ -30,6 +36,24 @@ async def test_extract_data_update_crawl_context(aiohttp_server: Any) -> None:
     assert len(extracted['variants']) == 5
 
 
+async def test_product_without_variations_has_no_variants(aiohttp_server: Any) -> None:
+    server = await aiohttp_server(new_web_app())
+
+    ctx = Mock(spec=CrawlContext)
+    crawler_url = AmazonProductUrl(
+        job_id='124667',
+        url=f'http://localhost:{server.port}/dp/B01GFPWTI4',
+        uid='dummy-uid',
+    )
+    ctx.get_crawler_url.return_value = crawler_url
+    aap = AmazonAsyncProduct(crawl_context=ctx)
+    await aap.crawl()
+    ctx.complete.assert_called_once()
+    extracted = ctx.complete.call_args.args[0]
+    assert extracted['asin'] == 'B01GFPWTI4'
+    assert extracted['variants'] == {}
+
+
 # async def test_extract_real_data(aiohttp_server: Any) -> None:
 #     ctx = Mock(spec=CrawlContext)
 #     crawler_url = AmazonProductUrl(
@@ -58,3 +82,196 @@ async def test_with_failing_product(aiohttp_server: Any) -> None:
     aap = AmazonAsyncProduct(crawl_context=ctx)
     await aap.crawl()
     ctx.fail.assert_called_once()
+
+
+async def test_http_fast_path_skips_the_browser(aiohttp_server: Any) -> None:
+    server = await aiohttp_server(new_web_app())
+
+    ctx = Mock(spec=CrawlContext)
+    crawler_url = AmazonProductUrl(
+        job_id='124667',
+        url=f'http://localhost:{server.port}/dp/B0CX9DVZDP',
+        uid='dummy-uid',
+    )
+    ctx.get_crawler_url.return_value = crawler_url
+    browser_pool = Mock(spec=BrowserPool)
+    http_fetcher = HttpFetcher()
+    aap = AmazonAsyncProduct(
+        crawl_context=ctx, browser_pool=browser_pool, http_fetcher=http_fetcher
+    )
+    try:
+        await aap.crawl()
+    finally:
+        await http_fetcher.close()
+    browser_pool.new_context.assert_not_called()
+    ctx.complete.assert_called_once()
+    extracted = ctx.complete.call_args.args[0]
+    assert extracted['asin'] == 'B0CX9DVZDP'
+    assert len(extracted['variants']) == 5
+
+
+async def test_http_fast_path_falls_back_to_the_browser(aiohttp_server: Any) -> None:
+    server = await aiohttp_server(new_web_app())
+
+    ctx = Mock(spec=CrawlContext)
+    url = f'http://localhost:{server.port}/dp/B0CX9DVZDP'
+    crawler_url = AmazonProductUrl(job_id='124667', url=url, uid='dummy-uid')
+    ctx.get_crawler_url.return_value = crawler_url
+    browser_pool = Mock(spec=BrowserPool)
+    browser_pool.new_context.side_effect = RuntimeError('no browser')
+    http_fetcher = Mock(spec=HttpFetcher)
+    http_fetcher.fetch.return_value = HttpPage(url=url, status=503, html='')
+    aap = AmazonAsyncProduct(
+        crawl_context=ctx, browser_pool=browser_pool, http_fetcher=http_fetcher
+    )
+    await aap.crawl()
+    browser_pool.new_context.assert_called_once()
+    ctx.complete.assert_not_called()
+    ctx.fail.assert_called_once()
+
+
+async def test_missing_product_fails_permanently_without_the_browser(
+    aiohttp_server: Any,
+) -> None:
+    server = await aiohttp_server(new_web_app())
+
+    ctx = Mock(spec=CrawlContext)
+    crawler_url = AmazonProductUrl(
+        job_id='124667',
+        url=f'http://localhost:{server.port}/dp/B000000000',
+        uid='dummy-uid',
+    )
+    ctx.get_crawler_url.return_value = crawler_url
+    browser_pool = Mock(spec=BrowserPool)
+    http_fetcher = HttpFetcher()
+    aap = AmazonAsyncProduct(
+        crawl_context=ctx, browser_pool=browser_pool, http_fetcher=http_fetcher
+    )
+    try:
+        await aap.crawl()
+    finally:
+        await http_fetcher.close()
+    browser_pool.new_context.assert_not_called()
+    ctx.complete.assert_not_called()
+    ctx.fail.assert_called_once()
+    assert isinstance(ctx.fail.call_args.args[0], PermanentCrawlException)
+
+
+async def test_missing_product_fails_permanently_in_the_browser(
+    aiohttp_server: Any,
+) -> None:
+    server = await aiohttp_server(new_web_app())
+
+    ctx = Mock(spec=CrawlContext)
+    crawler_url = AmazonProductUrl(
+        job_id='124667',
+        url=f'http://localhost:{server.port}/dp/B000000000',
+        uid='dummy-uid',
+    )
+    ctx.get_crawler_url.return_value = crawler_url
+    aap = AmazonAsyncProduct(crawl_context=ctx)
+    await aap.crawl()
+    ctx.fail.assert_called_once()
+    assert isinstance(ctx.fail.call_args.args[0], PermanentCrawlException)
+
+
+async def test_bot_wall_fails_as_blocked_without_waiting(aiohttp_server: Any) -> None:
+    async def robot_check(request: web.Request) -> web.Response:
+        return web.Response(
+            text='<html><head><title dir="ltr">Robot Check</title></head><body>'
+            '<form method="get" action="/errors/validateCaptcha"></form></body></html>',
+            content_type='text/html',
+        )
+
+    app = web.Application()
+    app.router.add_get('/dp/{asin}', robot_check)
+    server = await aiohttp_server(app)
+
+    ctx = Mock(spec=CrawlContext)
+    crawler_url = AmazonProductUrl(
+        job_id='124667',
+        url=f'http://localhost:{server.port}/dp/B0CX9DVZDP',
+        uid='dummy-uid',
+    )
+    ctx.get_crawler_url.return_value = crawler_url
+    aap = AmazonAsyncProduct(crawl_context=ctx)
+    await aap.crawl()
+    ctx.fail.assert_called_once()
+    assert isinstance(ctx.fail.call_args.args[0], BlockedCrawlException)
+
+
+async def test_variant_expansion_enqueues_variants_in_one_batch(
+    aiohttp_server: Any,
+) -> None:
+    server = await aiohttp_server(new_web_app())
+
+    ctx = Mock(spec=CrawlContext)
+    crawler_url = AmazonProductUrl(
+        job_id='124667',
+        url=f'http://localhost:{server.port}/dp/B0CX9DVZDP',
+        uid='dummy-uid',
+    )
+    ctx.get_crawler_url.return_value = crawler_url
+    ctx.enqueue_many.return_value = []
+    http_fetcher = HttpFetcher()
+    aap = AmazonAsyncProduct(
+        crawl_context=ctx,
+        http_fetcher=http_fetcher,
+        variant_depth=2,
+        max_variants=10,
+    )
+    try:
+        await aap.crawl()
+    finally:
+        await http_fetcher.close()
+    ctx.enqueue_many.assert_called_once()
+    urls = ctx.enqueue_many.call_args.args[0]
+    assert len(urls) == 10
+    assert f'http://localhost:{server.port}/dp/B0CX9DVZDP?psc=1' not in urls
+    assert ctx.enqueue_many.call_args.kwargs['variant_depth'] == 1
+    ctx.complete.assert_called_once()
+
+
+async def test_fresh_cache_entry_skips_the_browser(tmp_path: pathlib.Path) -> None:
+    ctx = Mock(spec=CrawlContext)
+    crawler_url = AmazonProductUrl(
+        job_id='124667',
+        url='https://www.amazon.co.uk/dp/B0CX9DVZDP?x=foo',
+        uid='dummy-uid',
+    )
+    ctx.get_crawler_url.return_value = crawler_url
+    page_cache = PageCache(str(tmp_path), ttl_seconds=60, max_bytes=1_000_000)
+    await page_cache.put(
+        PageCache.key(str(crawler_url.url), 'B0CX9DVZDP'),
+        'https://www.amazon.co.uk/dp/B0CX9DVZDP',
+        {'asin': 'B0CX9DVZDP', 'feature_bullets': [], 'variants': {}},
+    )
+    browser_pool = Mock(spec=BrowserPool)
+    aap = AmazonAsyncProduct(
+        crawl_context=ctx, browser_pool=browser_pool, page_cache=page_cache
+    )
+    await aap.crawl()
+    browser_pool.new_context.assert_not_called()
+    ctx.complete.assert_called_once()
+    extracted = ctx.complete.call_args.args[0]
+    assert extracted['asin'] == 'B0CX9DVZDP'
+    assert extracted['url'] == 'https://www.amazon.co.uk/dp/B0CX9DVZDP?x=foo'
+
+
+async def test_page_close_error_does_not_fail_the_crawl() -> None:
+    ctx = Mock(spec=CrawlContext)
+    ctx.get_crawler_url.return_value = AmazonProductUrl(
+        job_id='124667',
+        url='https://www.amazon.co.uk/dp/B0CX9DVZDP',
+        uid='dummy-uid',
+    )
+    page = Mock()
+    page.close = AsyncMock(side_effect=RuntimeError('target closed'))
+    browser = Mock()
+    browser.new_page = AsyncMock(return_value=page)
+    aap = AmazonAsyncProduct(crawl_context=ctx)
+    aap.extract = AsyncMock(return_value={'asin': 'B0CX9DVZDP'})  # type: ignore
+
+    assert await aap.run(browser) == {'asin': 'B0CX9DVZDP'}
+    page.close.assert_called_once()
+    ctx.fail.assert_not_called()
@@ -0,0 +1,65 @@
+import pathlib
+
+from xtracted.crawlers.amazon.amazon_async_product import AmazonAsyncProduct
+from xtracted.crawlers.amazon.amazon_html_parser import (
+    extract_asin,
+    extract_feature_bullets,
+    extract_twister_data,
+    has_variations,
+    is_bot_wall,
+    is_bot_wall_redirect,
+)
+
+asins = pathlib.Path(__file__).parent / 'asins'
+
+
+def read_asin(asin: str) -> str:
+    return (asins / f'{asin}.html').read_text()
+
+
+def test_extract_asin() -> None:
+    assert extract_asin(read_asin('B0CX9DVZDP')) == 'B0CX9DVZDP'
+    assert extract_asin(read_asin('B01GFPWTI4')) == 'B01GFPWTI4'
+
+
+def test_extract_feature_bullets() -> None:
+    bullets = extract_feature_bullets(read_asin('B0CX9DVZDP'))
+    assert bullets
+    assert all(bullet == bullet.strip() for bullet in bullets)
+
+
+def test_product_without_variations() -> None:
+    html = read_asin('B01GFPWTI4')
+    assert not has_variations(html)
+    assert extract_twister_data(html, 'B01GFPWTI4') is None
+
+
+def test_twister_data_builds_variants() -> None:
+    html = read_asin('B0CX9DVZDP')
+    assert has_variations(html)
+    matrix = extract_twister_data(html, 'B0CX9DVZDP')
+    assert matrix is not None
+    variants = AmazonAsyncProduct.build_variants(
+        matrix, 'https://www.amazon.co.uk/dp/B0CX9DVZDP'
+    )
+    assert len(variants) == 5
+    assert variants['current_asin'] == 'B0CX9DVZDP'
+    assert len(variants['variants']) == variants['variants_count']
+    assert variants['variants'][0]['url'].startswith('https://www.amazon.co.uk/dp/')
+
+
+def test_bot_wall() -> None:
+    assert not is_bot_wall(read_asin('B0CX9DVZDP'))
+    assert is_bot_wall(
+        '<form method="get" action="/errors/validateCaptcha" name="">'
+        '<input id="captchacharacters" name="field-keywords"></form>'
+    )
+
+
+def test_bot_wall_redirect() -> None:
+    assert not is_bot_wall_redirect('https://www.amazon.de/dp/B0CX9DVZDP?th=1')
+    assert not is_bot_wall_redirect('https://amazon.de/dp/B0CX9DVZDP')
+    assert is_bot_wall_redirect('https://www.amazon.de/errors/validateCaptcha')
+    assert is_bot_wall_redirect('https://www.amazon.de/ap/cvf/request?arb=x')
+    assert not is_bot_wall_redirect('https://www.amazon.de/ap/signin?openid=x')
+    assert not is_bot_wall_redirect('https://www.amazon.com/dp/B0CX9DVZDP')
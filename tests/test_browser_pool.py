@@ -0,0 +1,88 @@
+from typing import Any
+from unittest.mock import AsyncMock, Mock
+
+from playwright.async_api import Browser
+
+from xtracted.crawlers.browser_pool import BrowserPool
+
+
+class FakeBrowserPool(BrowserPool):
+    def __init__(self, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        self.launched: list[Mock] = []
+
+    async def _launch_browser(self) -> Browser:
+        browser = Mock(spec=Browser)
+        browser.is_connected.return_value = True
+        browser.new_context = AsyncMock()
+        browser.close = AsyncMock()
+        self.launched.append(browser)
+        return browser
+
+
+async def test_browser_is_reused_across_contexts() -> None:
+    pool = FakeBrowserPool(size=1, max_pages_per_browser=10)
+
+    for _ in range(3):
+        async with pool.new_context() as context:
+            assert context is not None
+
+    assert len(pool.launched) == 1
+    assert pool.launched[0].new_context.await_count == 3
+    stats = pool.stats()
+    assert stats.contexts_served == 3
+    assert stats.contexts_in_use == 0
+    assert stats.browsers_recycled == 0
+
+
+async def test_browser_is_recycled_after_max_pages() -> None:
+    pool = FakeBrowserPool(size=1, max_pages_per_browser=2)
+
+    for _ in range(5):
+        async with pool.new_context():
+            pass
+
+    assert len(pool.launched) == 3
+    pool.launched[0].close.assert_awaited_once()
+    pool.launched[1].close.assert_awaited_once()
+    pool.launched[2].close.assert_not_awaited()
+    assert pool.stats().browsers_recycled == 2
+
+
+async def test_pool_launches_up_to_size_when_busy() -> None:
+    pool = FakeBrowserPool(size=2, max_pages_per_browser=10)
+
+    async with pool.new_context():
+        async with pool.new_context():
+            async with pool.new_context():
+                assert pool.stats().contexts_in_use == 3
+
+    assert len(pool.launched) == 2
+    assert pool.stats().browsers == 2
+
+
+async def test_disconnected_browser_is_replaced() -> None:
+    pool = FakeBrowserPool(size=1, max_pages_per_browser=10)
+
+    async with pool.new_context():
+        pass
+    pool.launched[0].is_connected.return_value = False
+
+    async with pool.new_context():
+        pass
+
+    assert len(pool.launched) == 2
+
+
+async def test_close_closes_all_browsers() -> None:
+    pool = FakeBrowserPool(size=2, max_pages_per_browser=10)
+
+    async with pool.new_context():
+        async with pool.new_context():
+            pass
+
+    await pool.close()
+
+    for browser in pool.launched:
+        browser.close.assert_awaited_once()
+    assert pool.stats().browsers == 0
@@ -0,0 +1,98 @@
+from xtracted.workers.circuit_breaker import CircuitBreakers
+
+url = 'https://www.amazon.de/dp/B0CX9DVZDP'
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_breaker_opens_after_threshold_consecutive_blocks() -> None:
+    breakers = CircuitBreakers(threshold=2, cooldown_seconds=60, clock=FakeClock())
+    breakers.record_blocked(url)
+    breakers.record_success(url)
+    breakers.record_blocked(url)
+    assert breakers.state(url) == 'closed'
+    assert breakers.admit(url) == 0
+
+    breakers.record_blocked(url)
+    assert breakers.state(url) == 'open'
+    assert breakers.admit(url) == 60
+    assert breakers.stats()['www.amazon.de'].times_opened == 1
+
+
+def test_blocked_netloc_does_not_defer_the_others() -> None:
+    breakers = CircuitBreakers(threshold=1, clock=FakeClock())
+    breakers.record_blocked(url)
+    assert breakers.admit(url) > 0
+    assert breakers.admit('https://www.amazon.co.uk/dp/B0CX9DVZDP') == 0
+
+
+def test_half_open_probe_closes_the_breaker() -> None:
+    clock = FakeClock()
+    breakers = CircuitBreakers(
+        threshold=1, cooldown_seconds=60, half_open_probes=1, clock=clock
+    )
+    breakers.record_blocked(url)
+    clock.now = 60
+    assert breakers.admit(url) == 0
+    assert breakers.state(url) == 'half_open'
+    # a single probe at a time
+    assert breakers.admit(url) > 0
+
+    breakers.record_success(url)
+    breakers.release(url)
+    assert breakers.state(url) == 'closed'
+    assert breakers.admit(url) == 0
+
+
+def test_blocked_probe_reopens_for_longer() -> None:
+    clock = FakeClock()
+    breakers = CircuitBreakers(
+        threshold=1, cooldown_seconds=60, max_cooldown_seconds=100, clock=clock
+    )
+    breakers.record_blocked(url)
+    clock.now = 60
+    assert breakers.admit(url) == 0
+    breakers.record_blocked(url)
+    breakers.release(url)
+    assert breakers.state(url) == 'open'
+    assert breakers.admit(url) == 100
+
+    clock.now = 160
+    assert breakers.admit(url) == 0
+    breakers.record_blocked(url)
+    breakers.release(url)
+    assert breakers.admit(url) == 100
+
+
+def test_only_probes_decide_a_half_open_breaker() -> None:
+    clock = FakeClock()
+    breakers = CircuitBreakers(threshold=1, cooldown_seconds=60, clock=clock)
+    breakers.record_blocked(url)
+    clock.now = 60
+    probe = 'https://www.amazon.de/dp/B0CX9DVZDQ'
+    assert breakers.admit(probe) == 0
+
+    # crawls admitted before the breaker opened
+    breakers.record_success(url)
+    breakers.release(url)
+    assert breakers.state(url) == 'half_open'
+    breakers.record_blocked(url)
+    assert breakers.state(url) == 'half_open'
+    assert breakers.admit(url) > 0
+
+    breakers.record_success(probe)
+    breakers.release(probe)
+    assert breakers.state(url) == 'closed'
+
+
+def test_success_started_before_opening_is_ignored() -> None:
+    breakers = CircuitBreakers(threshold=1, clock=FakeClock())
+    breakers.record_blocked(url)
+    breakers.record_success(url)
+    assert breakers.state(url) == 'open'
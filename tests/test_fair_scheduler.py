@@ -0,0 +1,70 @@
+from xtracted.workers.fair_scheduler import NO_USER_KEY, Candidate, FairScheduler
+
+
+def candidates(user_id: str, first_msg_id: int, count: int) -> list[Candidate]:
+    return [
+        Candidate(msg_id, {'user_id': user_id, 'job_id': 1})
+        for msg_id in range(first_msg_id, first_msg_id + count)
+    ]
+
+
+def users(selected: list[Candidate]) -> list[str]:
+    return [candidate.message['user_id'] for candidate in selected]
+
+
+def test_small_user_is_not_queued_behind_a_big_job() -> None:
+    scheduler = FairScheduler()
+    selected = scheduler.select(
+        candidates('big', 1, 4) + candidates('small', 100_000, 1), 2
+    )
+    assert users(selected) == ['big', 'small']
+
+
+def test_round_robin_resumes_after_the_last_served_user() -> None:
+    scheduler = FairScheduler()
+    backlog = candidates('a', 1, 3) + candidates('b', 10, 3) + candidates('c', 20, 3)
+    assert users(scheduler.select(backlog, 1)) == ['a']
+    assert users(scheduler.select(backlog, 1)) == ['b']
+    assert users(scheduler.select(backlog, 1)) == ['c']
+
+
+def test_tier_weights() -> None:
+    scheduler = FairScheduler(
+        tier_weights={'pro': 3, 'free': 1}, user_tiers={'p': 'pro'}, default_tier='free'
+    )
+    selected = scheduler.select(candidates('p', 1, 6) + candidates('f', 10, 6), 4)
+    assert users(selected) == ['p', 'p', 'p', 'f']
+
+
+def test_tier_weights_hold_with_single_message_reads() -> None:
+    scheduler = FairScheduler(
+        tier_weights={'pro': 3, 'free': 1}, user_tiers={'p': 'pro'}, default_tier='free'
+    )
+    served: list[str] = []
+    for read in range(40):
+        # a read of one message gets the oldest message of each user
+        backlog = candidates('p', read + 1, 1) + candidates('f', read + 100, 1)
+        served += users(scheduler.select(backlog, 1))
+    assert ''.join(served[:8]) == 'pppfpppf'
+    assert served.count('p') == 3 * served.count('f')
+    assert max(scheduler.deficits.values()) < 3
+
+
+def test_messages_without_user_share_a_default_key() -> None:
+    scheduler = FairScheduler(
+        tier_weights={'pro': 3, 'free': 1}, user_tiers={'p': 'pro'}, default_tier='free'
+    )
+    backlog = candidates('p', 1, 4) + [Candidate(10, {'job_id': 1})]
+    assert scheduler.key_of(backlog[-1].message) == NO_USER_KEY
+    assert scheduler.weight_of(backlog[-1].message) == 1
+    assert [c.msg_id for c in scheduler.select(backlog, 4)] == [1, 2, 3, 10]
+
+
+def test_user_job_key() -> None:
+    scheduler = FairScheduler(key='user_job')
+    backlog = [
+        Candidate(1, {'user_id': 'u', 'job_id': 1}),
+        Candidate(2, {'user_id': 'u', 'job_id': 1}),
+        Candidate(3, {'user_id': 'u', 'job_id': 2}),
+    ]
+    assert [c.msg_id for c in scheduler.select(backlog, 2)] == [1, 3]
@@ -0,0 +1,74 @@
+from typing import Any
+
+import pytest
+
+from xtracted.metrics import CONTENT_TYPE, Metric, MetricsRegistry, MetricsServer
+
+
+def test_counters_and_gauges_render_in_text_format() -> None:
+    registry = MetricsRegistry()
+    read = registry.counter('messages_read_total', 'Messages read', ('queue',))
+    in_flight = registry.gauge('crawls_in_flight', 'Crawls running')
+    read.inc(3, queue='job_urls')
+    read.inc(queue='job_urls')
+    in_flight.set(2)
+
+    assert registry.render() == (
+        '# HELP messages_read_total Messages read\n'
+        '# TYPE messages_read_total counter\n'
+        'messages_read_total{queue="job_urls"} 4.0\n'
+        '# HELP crawls_in_flight Crawls running\n'
+        '# TYPE crawls_in_flight gauge\n'
+        'crawls_in_flight 2.0\n'
+    )
+
+
+def test_gauge_function_is_read_at_scrape_time() -> None:
+    registry = MetricsRegistry()
+    browsers = registry.gauge('browsers', 'Browsers running')
+    count = [1]
+    browsers.set_function(lambda: count[0])
+    count[0] = 3
+    assert 'browsers 3.0' in registry.render()
+
+
+def test_histogram_buckets_are_cumulative() -> None:
+    registry = MetricsRegistry()
+    stages = registry.histogram(
+        'stage_seconds', 'Stage duration', ('stage',), buckets=(0.1, 1.0)
+    )
+    stages.observe(0.05, stage='http')
+    stages.observe(0.5, stage='http')
+    stages.observe(5, stage='http')
+
+    assert registry.render().splitlines()[2:] == [
+        'stage_seconds_bucket{stage="http",le="0.1"} 1',
+        'stage_seconds_bucket{stage="http",le="1.0"} 2',
+        'stage_seconds_bucket{stage="http",le="+Inf"} 3',
+        'stage_seconds_sum{stage="http"} 5.55',
+        'stage_seconds_count{stage="http"} 3',
+    ]
+
+
+def test_label_values_are_escaped() -> None:
+    registry = MetricsRegistry()
+    errors = registry.counter('errors_total', 'Errors', ('kind',))
+    errors.inc(kind='say "hi"\n')
+    assert 'errors_total{kind="say \\"hi\\"\\n"} 1.0' in registry.render()
+
+
+async def test_metrics_endpoint(aiohttp_client: Any) -> None:
+    registry = MetricsRegistry()
+    registry.counter('messages_read_total', 'Messages read').inc()
+    server = MetricsServer(host='127.0.0.1', port=0, registry=registry)
+    client = await aiohttp_client(server.new_web_app())
+
+    response = await client.get('/metrics')
+    assert response.status == 200
+    assert response.headers['Content-Type'] == CONTENT_TYPE
+    assert 'messages_read_total 1.0' in await response.text()
+
+
+def test_metric_kinds_must_render_their_samples() -> None:
+    with pytest.raises(TypeError):
+        Metric('untyped', 'No samples')  # type: ignore
@@ -0,0 +1,84 @@
+import asyncio
+import pathlib
+import time
+
+from xtracted.crawlers.page_cache import PageCache
+
+product = {'asin': 'B0CX9DVZDP', 'feature_bullets': ['bullet'], 'variants': {}}
+
+
+def test_key_is_normalized() -> None:
+    assert (
+        PageCache.key(
+            'https://www.Amazon.co.uk/Some-Title/dp/B0CX9DVZDP?x=1', 'b0cx9dvzdp'
+        )
+        == PageCache.key('https://amazon.co.uk/dp/B0CX9DVZDP', 'B0CX9DVZDP')
+        == 'amazon.co.uk/B0CX9DVZDP'
+    )
+
+
+async def test_put_then_get(tmp_path: pathlib.Path) -> None:
+    cache = PageCache(str(tmp_path), ttl_seconds=60, max_bytes=1_000_000)
+    key = PageCache.key('https://www.amazon.co.uk/dp/B0CX9DVZDP', 'B0CX9DVZDP')
+    assert await cache.get(key) is None
+
+    await cache.put(key, 'https://www.amazon.co.uk/dp/B0CX9DVZDP', product, '<html/>')
+    cached = await cache.get(key)
+    assert cached is not None
+    assert cached.extracted == product
+    assert await cache.get_html(key) == '<html/>'
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    # entries on disk are found again by a new cache
+    assert await PageCache(str(tmp_path), ttl_seconds=60, max_bytes=1_000_000).get(key)
+
+
+async def test_expired_entries_are_not_served(tmp_path: pathlib.Path) -> None:
+    cache = PageCache(str(tmp_path), ttl_seconds=0, max_bytes=1_000_000)
+    await cache.put('amazon.de/B0CX9DVZDP', 'https://amazon.de/dp/B0CX9DVZDP', product)
+    time.sleep(0.01)
+    assert await cache.get('amazon.de/B0CX9DVZDP') is None
+    assert list(tmp_path.iterdir()) == []
+
+
+async def test_least_recently_used_entries_are_evicted(tmp_path: pathlib.Path) -> None:
+    cache = PageCache(str(tmp_path), ttl_seconds=60, max_bytes=400)
+    await cache.put('amazon.de/B000000001', 'https://amazon.de/dp/B000000001', product)
+    await cache.put('amazon.de/B000000002', 'https://amazon.de/dp/B000000002', product)
+    assert await cache.get('amazon.de/B000000001')
+    await cache.put('amazon.de/B000000003', 'https://amazon.de/dp/B000000003', product)
+
+    assert await cache.get('amazon.de/B000000001')
+    assert await cache.get('amazon.de/B000000002') is None
+    assert await cache.get('amazon.de/B000000003')
+
+
+async def test_concurrent_puts_of_an_entry_do_not_collide(
+    tmp_path: pathlib.Path,
+) -> None:
+    cache = PageCache(str(tmp_path), ttl_seconds=60, max_bytes=1_000_000)
+    key = 'amazon.de/B0CX9DVZDP'
+    await asyncio.gather(
+        *(
+            cache.put(key, 'https://amazon.de/dp/B0CX9DVZDP', product, '<html/>')
+            for _ in range(10)
+        )
+    )
+    assert await cache.get(key)
+    assert not [path for path in tmp_path.iterdir() if path.suffix == '.tmp']
+
+
+async def test_the_cap_covers_the_entries_of_every_process(
+    tmp_path: pathlib.Path,
+) -> None:
+    first = PageCache(str(tmp_path), ttl_seconds=60, max_bytes=400, rescan_seconds=0)
+    second = PageCache(str(tmp_path), ttl_seconds=60, max_bytes=400, rescan_seconds=0)
+    await first.put('amazon.de/B000000001', 'https://amazon.de/dp/B000000001', product)
+    time.sleep(0.01)
+    await second.put('amazon.de/B000000002', 'https://amazon.de/dp/B000000002', product)
+    time.sleep(0.01)
+    await first.put('amazon.de/B000000003', 'https://amazon.de/dp/B000000003', product)
+
+    assert await second.get('amazon.de/B000000001') is None
+    assert await second.get('amazon.de/B000000002')
+    assert await second.get('amazon.de/B000000003')
@@ -0,0 +1,84 @@
+from xtracted.model import HostPolicy
+from xtracted.workers.politeness import MAX_DEFER_SECONDS, PolitenessScheduler
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_token_bucket_defers_past_the_burst() -> None:
+    clock = FakeClock()
+    scheduler = PolitenessScheduler(
+        HostPolicy(rate_per_second=2, burst=2, max_in_flight=10), clock=clock
+    )
+    assert scheduler.admit('https://www.amazon.de/dp/B0CX9DVZDP') == 0
+    assert scheduler.admit('https://www.amazon.de/dp/B0CX9DVZDQ') == 0
+    assert scheduler.admit('https://www.amazon.de/dp/B0CX9DVZDR') == 0.5
+
+    clock.now = 0.5
+    assert scheduler.admit('https://www.amazon.de/dp/B0CX9DVZDR') == 0
+
+
+def test_max_in_flight_defers_until_release() -> None:
+    scheduler = PolitenessScheduler(
+        HostPolicy(rate_per_second=100, burst=100, max_in_flight=1),
+        saturated_defer_seconds=3,
+        clock=FakeClock(),
+    )
+    url = 'https://www.amazon.de/dp/B0CX9DVZDP'
+    assert scheduler.admit(url) == 0
+    assert scheduler.admit(url) == 3
+    scheduler.release(url)
+    assert scheduler.admit(url) == 0
+    stats = scheduler.stats()['www.amazon.de']
+    assert stats.in_flight == 1
+    assert stats.admitted == 2
+    assert stats.deferred == 1
+
+
+def test_hosts_are_limited_independently() -> None:
+    scheduler = PolitenessScheduler(
+        HostPolicy(rate_per_second=1, burst=1, max_in_flight=1), clock=FakeClock()
+    )
+    assert scheduler.admit('https://www.amazon.de/dp/B0CX9DVZDP') == 0
+    assert scheduler.admit('https://www.amazon.co.uk/dp/B0CX9DVZDP') == 0
+    assert scheduler.admit('https://www.amazon.de/dp/B0CX9DVZDQ') > 0
+
+
+def test_host_policies_match_subdomains() -> None:
+    strict = HostPolicy(rate_per_second=0.5, burst=1, max_in_flight=1)
+    scheduler = PolitenessScheduler(HostPolicy(), {'amazon.de': strict})
+    assert scheduler.policy_for('www.amazon.de') == strict
+    assert scheduler.policy_for('amazon.de:443') == strict
+    assert scheduler.policy_for('www.amazon.co.uk') == HostPolicy()
+
+
+def test_deferrals_grow_with_the_host_backlog() -> None:
+    scheduler = PolitenessScheduler(
+        HostPolicy(rate_per_second=2, burst=1, max_in_flight=10), clock=FakeClock()
+    )
+    url = 'https://www.amazon.de/dp/B0CX9DVZDP'
+    assert scheduler.admit(url) == 0
+    assert [scheduler.admit(url) for _ in range(3)] == [0.5, 1.0, 1.5]
+
+
+def test_deferrals_are_capped() -> None:
+    scheduler = PolitenessScheduler(
+        HostPolicy(rate_per_second=0.1, burst=1, max_in_flight=10), clock=FakeClock()
+    )
+    url = 'https://www.amazon.de/dp/B0CX9DVZDP'
+    assert scheduler.admit(url) == 0
+    assert max(scheduler.admit(url) for _ in range(20)) == MAX_DEFER_SECONDS
+
+
+def test_policy_share_splits_it_across_processes() -> None:
+    policy = HostPolicy(rate_per_second=2, burst=5, max_in_flight=4)
+    shares = [policy.share(index, 3) for index in range(3)]
+    assert sum(share.rate_per_second for share in shares) == 2
+    assert [share.burst for share in shares] == [2, 2, 1]
+    assert [share.max_in_flight for share in shares] == [2, 1, 1]
+    assert HostPolicy(max_in_flight=1).share(2, 4).max_in_flight == 1
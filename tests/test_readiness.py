@@ -0,0 +1,56 @@
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+from playwright.async_api import Page
+
+from xtracted.crawlers.readiness import (
+    ReadinessPolicy,
+    main_world_global,
+    wait_for_main_world,
+)
+
+
+def test_main_world_global_is_null_safe() -> None:
+    assert (
+        main_world_global('twisterController.twisterModel')
+        == 'window.twisterController?.twisterModel != null'
+    )
+
+
+async def test_wait_for_main_world_polls_until_truthy() -> None:
+    page = Mock(spec=Page)
+    page.evaluate = AsyncMock(side_effect=[False, None, {'ready': True}])
+
+    value = await wait_for_main_world(
+        page, 'window.x', timeout_ms=1000, poll_interval_ms=1
+    )
+
+    assert value == {'ready': True}
+    assert page.evaluate.await_count == 3
+    page.evaluate.assert_awaited_with('mw:window.x')
+
+
+async def test_wait_for_main_world_times_out() -> None:
+    page = Mock(spec=Page)
+    page.evaluate = AsyncMock(return_value=False)
+
+    with pytest.raises(TimeoutError):
+        await wait_for_main_world(page, 'window.x', timeout_ms=20, poll_interval_ms=5)
+
+
+async def test_navigate_waits_for_selectors_and_globals() -> None:
+    page = Mock(spec=Page)
+    page.goto = AsyncMock()
+    page.wait_for_function = AsyncMock()
+    page.evaluate = AsyncMock(return_value=True)
+    readiness = ReadinessPolicy(
+        wait_until='commit', selectors=['#asin'], js_globals=['a.b']
+    )
+
+    await readiness.navigate(page, 'http://localhost/dp/B0CX9DVZDP')
+
+    page.goto.assert_awaited_once_with(
+        'http://localhost/dp/B0CX9DVZDP', wait_until='commit'
+    )
+    assert page.wait_for_function.call_args.kwargs['arg'] == ['#asin']
+    page.evaluate.assert_awaited_once_with('mw:window.a?.b != null')
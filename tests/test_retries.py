@@ -0,0 +1,43 @@
+from xtracted.model import (
+    BlockedCrawlException,
+    InvalidUrlException,
+    PermanentCrawlException,
+)
+from xtracted.retries import error_kind, retry_delay
+
+policy = {
+    'max_retries': 3,
+    'base_seconds': 10,
+    'max_seconds': 600,
+    'blocked_cooldown_seconds': 300,
+}
+
+
+def test_error_kind() -> None:
+    assert error_kind(PermanentCrawlException('404')) == 'permanent'
+    assert error_kind(InvalidUrlException('not amazon')) == 'permanent'
+    assert error_kind(BlockedCrawlException('captcha')) == 'blocked'
+    assert error_kind(TimeoutError()) == 'transient'
+    assert error_kind(ValueError('KABOOM!')) == 'transient'
+
+
+def test_permanent_errors_are_not_retried() -> None:
+    assert retry_delay('permanent', 1, **policy) is None
+
+
+def test_no_retry_past_max_retries() -> None:
+    assert retry_delay('transient', 3, **policy) is None
+    assert retry_delay('blocked', 3, **policy) is None
+
+
+def test_transient_errors_back_off_exponentially() -> None:
+    assert retry_delay('transient', 1, rng=lambda: 1.0, **policy) == 10
+    assert retry_delay('transient', 2, rng=lambda: 1.0, **policy) == 20
+    assert retry_delay('transient', 2, rng=lambda: 0.0, **policy) == 10
+    capped = {**policy, 'max_retries': 10, 'max_seconds': 60}
+    assert retry_delay('transient', 9, rng=lambda: 1.0, **capped) == 60
+
+
+def test_blocked_errors_cool_down_longer() -> None:
+    assert retry_delay('blocked', 1, rng=lambda: 1.0, **policy) == 300
+    assert retry_delay('blocked', 1, rng=lambda: 0.0, **policy) == 150
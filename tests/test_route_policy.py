@@ -0,0 +1,52 @@
+from xtracted.crawlers.route_policy import RoutePolicy, RouteStats
+
+
+def test_main_frame_document_is_never_blocked() -> None:
+    policy = RoutePolicy(
+        blocked_resource_types={'document'}, allowed_domains=['amazon.co.uk']
+    )
+    assert not policy.should_block(
+        'https://www.amazon.de/dp/B0CX9DVZDP', 'document', main_frame=True
+    )
+
+
+def test_iframe_documents_are_filtered() -> None:
+    policy = RoutePolicy(blocked_domains=['amazon-adsystem.com'])
+    assert policy.should_block('https://aax-eu.amazon-adsystem.com/ad', 'document')
+    assert not policy.should_block('https://www.amazon.de/frame', 'document')
+
+
+def test_blocked_resource_types() -> None:
+    policy = RoutePolicy(blocked_resource_types={'image', 'font'})
+    assert policy.should_block('https://m.media-amazon.com/a.jpg', 'image')
+    assert policy.should_block('https://m.media-amazon.com/a.woff', 'font')
+    assert not policy.should_block('https://m.media-amazon.com/a.js', 'script')
+
+
+def test_blocked_domains_match_subdomains() -> None:
+    policy = RoutePolicy(blocked_domains=['amazon-adsystem.com'])
+    assert policy.should_block('https://aax-eu.amazon-adsystem.com/x', 'script')
+    assert policy.should_block('https://amazon-adsystem.com/x', 'xhr')
+    assert not policy.should_block('https://notamazon-adsystem.com/x', 'xhr')
+
+
+def test_allowed_domains() -> None:
+    policy = RoutePolicy(allowed_domains=['amazon.co.uk', 'media-amazon.com'])
+    assert not policy.should_block('https://www.amazon.co.uk/x.js', 'script')
+    assert not policy.should_block('https://m.media-amazon.com/x.js', 'script')
+    assert policy.should_block('https://www.googletagmanager.com/gtm.js', 'script')
+
+
+def test_empty_policy_is_noop() -> None:
+    assert RoutePolicy().is_noop()
+    assert not RoutePolicy(blocked_domains=['doubleclick.net']).is_noop()
+
+
+def test_route_stats_estimates_bytes_saved() -> None:
+    stats = RouteStats()
+    stats.record_blocked('image')
+    stats.record_blocked('image')
+    stats.record_blocked('unknown')
+    assert stats.blocked_requests == 3
+    assert stats.blocked_by_type == {'image': 2, 'unknown': 1}
+    assert stats.estimated_bytes_saved > 0
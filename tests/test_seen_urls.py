@@ -0,0 +1,117 @@
+from unittest.mock import AsyncMock, Mock
+from uuid import uuid4
+
+from pydantic import HttpUrl
+
+from xtracted.context import CrawlSyncer, DefaultCrawlContext
+from xtracted.model import CrawlerUrl
+from xtracted.seen_urls import BloomFilter, LruSet, SeenUrlRegistry, SeenUrls
+
+
+def test_lru_set_evicts_the_least_recently_seen() -> None:
+    lru = LruSet(2)
+    lru.add('a')
+    lru.add('b')
+    assert 'a' in lru
+    lru.add('c')
+    assert 'a' in lru
+    assert 'b' not in lru
+    assert 'c' in lru
+
+
+def test_bloom_filter_has_no_false_negative() -> None:
+    bloom = BloomFilter(1000, 0.001)
+    keys = [f'B0{i:08d}' for i in range(1000)]
+    for key in keys:
+        bloom.add(key)
+    assert all(key in bloom for key in keys)
+    false_positives = sum(f'X0{i:08d}' in bloom for i in range(10_000))
+    assert false_positives < 50
+    assert bloom.is_full()
+
+
+def test_seen_urls_switch_to_a_bloom_filter() -> None:
+    seen = SeenUrls(exact_capacity=2, bloom_capacity=100, error_rate=0.001)
+    seen.add('B000000001')
+    seen.add('B000000002')
+    assert seen.bloom is None
+    seen.add('B000000003')
+    assert seen.exact is None
+    assert all(url_id in seen for url_id in ('B000000001', 'B000000002', 'B000000003'))
+
+
+def test_seen_urls_stop_answering_once_the_bloom_filter_is_full() -> None:
+    seen = SeenUrls(exact_capacity=1, bloom_capacity=2, error_rate=0.001)
+    for url_id in ('B000000001', 'B000000002', 'B000000003'):
+        seen.add(url_id)
+    assert 'B000000001' not in seen
+
+
+def test_registry_keeps_the_most_recent_jobs() -> None:
+    registry = SeenUrlRegistry(max_jobs=1)
+    user_id = uuid4()
+    first = registry.for_job(user_id, 1)
+    assert registry.for_job(user_id, 1) is first
+    registry.for_job(user_id, 2)
+    assert registry.for_job(user_id, 1) is not first
+
+
+async def test_context_skips_urls_the_job_has_seen() -> None:
+    syncer = Mock(spec=CrawlSyncer)
+    syncer.enqueue = AsyncMock(return_value=None)
+    context = DefaultCrawlContext(
+        crawl_syncer=syncer,
+        crawler_url=CrawlerUrl(
+            user_id=uuid4(),
+            job_id=1,
+            url_id='B0CX9DVZDP',
+            url_type='amazon_product',
+            url='https://www.amazon.co.uk/dp/B0CX9DVZDP',
+        ),
+        message_id=1,
+        seen_urls=SeenUrls(exact_capacity=10, bloom_capacity=0, error_rate=0.001),
+    )
+    await context.enqueue(HttpUrl('https://www.amazon.co.uk/dp/B0CX9DVZDQ?psc=1'))
+    await context.enqueue(HttpUrl('https://www.amazon.co.uk/dp/B0CX9DVZDQ'))
+    syncer.enqueue.assert_called_once()
+
+
+async def test_context_does_not_mark_urls_dropped_by_the_cap() -> None:
+    user_id = uuid4()
+    enqueued = CrawlerUrl(
+        user_id=user_id,
+        job_id=1,
+        url_id='B0CX9DVZDQ',
+        url_type='amazon_product',
+        url='https://www.amazon.co.uk/dp/B0CX9DVZDQ',
+    )
+    syncer = Mock(spec=CrawlSyncer)
+    syncer.enqueue_many = AsyncMock(return_value=[enqueued])
+    syncer.existing_url_ids = AsyncMock(return_value={'B0CX9DVZDR'})
+    seen_urls = SeenUrls(exact_capacity=10, bloom_capacity=0, error_rate=0.001)
+    context = DefaultCrawlContext(
+        crawl_syncer=syncer,
+        crawler_url=CrawlerUrl(
+            user_id=user_id,
+            job_id=1,
+            url_id='B0CX9DVZDP',
+            url_type='amazon_product',
+            url='https://www.amazon.co.uk/dp/B0CX9DVZDP',
+        ),
+        message_id=1,
+        seen_urls=seen_urls,
+    )
+    await context.enqueue_many(
+        [
+            'https://www.amazon.co.uk/dp/B0CX9DVZDQ',
+            'https://www.amazon.co.uk/dp/B0CX9DVZDR',
+            'https://www.amazon.co.uk/dp/B0CX9DVZDS',
+        ]
+    )
+    assert syncer.existing_url_ids.call_args.kwargs['url_ids'] == [
+        'B0CX9DVZDR',
+        'B0CX9DVZDS',
+    ]
+    assert 'B0CX9DVZDQ' in seen_urls
+    assert 'B0CX9DVZDR' in seen_urls
+    assert 'B0CX9DVZDS' not in seen_urls
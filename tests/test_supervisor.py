@@ -0,0 +1,47 @@
+from xtracted.crawlers.browser_pool import BrowserPoolStats
+from xtracted.workers.supervisor import WorkerStats, aggregate_stats, split_budget
+
+
+def test_split_budget_spreads_the_remainder() -> None:
+    assert split_budget(10, 4) == [3, 3, 2, 2]
+    assert split_budget(8, 4) == [2, 2, 2, 2]
+
+
+def test_split_budget_gives_each_process_a_task() -> None:
+    assert split_budget(2, 4) == [1, 1, 1, 1]
+
+
+def test_aggregate_stats() -> None:
+    def worker_stats(
+        index: int, crawling_tasks: int, open_circuits: list[str]
+    ) -> WorkerStats:
+        return WorkerStats(
+            index=index,
+            pid=1000 + index,
+            max_crawl_tasks=4,
+            crawling_tasks=crawling_tasks,
+            browser_pool=BrowserPoolStats(
+                size=1,
+                browsers=1,
+                contexts_in_use=crawling_tasks,
+                contexts_served=10,
+                browsers_launched=1,
+                browsers_recycled=0,
+            ),
+            open_circuits=open_circuits,
+        )
+
+    stats = aggregate_stats(
+        [
+            worker_stats(0, 3, ['www.amazon.de']),
+            worker_stats(1, 1, ['www.amazon.fr', 'www.amazon.de']),
+        ],
+        restarts=2,
+    )
+    assert stats.workers == 2
+    assert stats.restarts == 2
+    assert stats.max_crawl_tasks == 8
+    assert stats.crawling_tasks == 4
+    assert stats.contexts_served == 20
+    assert stats.browsers_launched == 2
+    assert stats.open_circuits == ['www.amazon.de', 'www.amazon.fr']
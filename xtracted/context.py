@@ -1,4 +1,3 @@
-import json
 import logging
 from abc import ABC, abstractmethod
 from typing import Any, Optional
@@ -6,11 +5,16 @@ from uuid import UUID
 
 from asyncpg import Connection
 from pydantic import HttpUrl
-from xtracted_common.model import CrawlJobUrlStatus
+from xtracted_common.model import CrawlJobUrlStatus, UrlFactory
 
 from xtracted.crawler_configuration import CrawlerConfig
+from xtracted.metrics import DB_CALL_SECONDS, MESSAGES_ARCHIVED
 from xtracted.model import CrawlerUrl
+from xtracted.retries import error_kind, retry_delay
+from xtracted.seen_urls import SeenUrls
+from xtracted.services.completion_writer import PostgresCompletionWriter
 from xtracted.services.crawlers_services import PostgresCrawlersService
+from xtracted.services.postgres_clients import PostgresClients
 
 logger = logging.getLogger('crawljob-syncer')
 
@@ -36,6 +40,22 @@ class CrawlSyncer(ABC):
     ) -> Optional[CrawlerUrl]:
         pass
 
+    @abstractmethod
+    async def enqueue_many(
+        self,
+        user_id: UUID,
+        job_id: int,
+        urls: list[HttpUrl | str],
+        variant_depth: int = 0,
+    ) -> list[CrawlerUrl]:
+        pass
+
+    @abstractmethod
+    async def existing_url_ids(
+        self, user_id: UUID, job_id: int, url_ids: list[str]
+    ) -> set[str]:
+        pass
+
     @abstractmethod
     async def complete(
         self, crawler_url: CrawlerUrl, msg_id: int | str, data: dict[str, Any]
@@ -43,6 +63,23 @@ class CrawlSyncer(ABC):
         pass
 
 
+class CrawlListener(ABC):
+    """Told how each crawl ended, once the syncer knows it."""
+
+    @abstractmethod
+    def on_complete(
+        self, crawler_url: CrawlerUrl, msg_id: int | str, fetched: bool = True
+    ) -> None:
+        """`fetched` is False when the data did not come from the site."""
+        pass
+
+    @abstractmethod
+    def on_error(
+        self, crawler_url: CrawlerUrl, msg_id: int | str, error: Exception
+    ) -> None:
+        pass
+
+
 class CrawlContext(ABC):
     @abstractmethod
     def get_crawler_url(self) -> CrawlerUrl:
@@ -52,12 +89,18 @@ class CrawlContext(ABC):
     async def enqueue(self, url: HttpUrl) -> Optional[CrawlerUrl]:
         pass
 
+    @abstractmethod
+    async def enqueue_many(
+        self, urls: list[HttpUrl | str], variant_depth: int = 0
+    ) -> list[CrawlerUrl]:
+        pass
+
     @abstractmethod
     async def fail(self, error: Exception) -> None:
         pass
 
     @abstractmethod
-    async def complete(self, data: dict[str, Any]) -> None:
+    async def complete(self, data: dict[str, Any], fetched: bool = True) -> None:
         pass
 
     @abstractmethod
@@ -66,9 +109,13 @@ class CrawlContext(ABC):
 
 
 class PostgresCrawlSyncer(CrawlSyncer):
-    def __init__(self, config: CrawlerConfig):
+    def __init__(
+        self, config: CrawlerConfig, clients: Optional[PostgresClients] = None
+    ):
         self.config = config
-        self.crawlers_service = PostgresCrawlersService(config)
+        self.clients = clients or PostgresClients(config)
+        self.crawlers_service = PostgresCrawlersService(config, self.clients)
+        self.completion_writer = PostgresCompletionWriter(config, self.clients)
 
     async def update_last_fetched_url(
         self, conn: Connection, user_id: UUID, job_id: int
@@ -80,89 +127,114 @@ class PostgresCrawlSyncer(CrawlSyncer):
         )
 
     async def ack(self, msg_id: str | int) -> None:
-        queue = await self.config.new_pgmq_client()
-        conn = await self.config.new_db_client()
+        queue = await self.clients.queue()
         try:
-            await queue.archive('job_urls', msg_id=msg_id, conn=conn)
+            with DB_CALL_SECONDS.time(method='ack'):
+                async with self.clients.acquire() as conn:
+                    await queue.archive('job_urls', msg_id=msg_id, conn=conn)
+                MESSAGES_ARCHIVED.inc(reason='ack')
         except Exception as e:
             logger.error(e)
-        finally:
-            await conn.close()
 
     async def report_error(
         self, crawler_url: CrawlerUrl, msg_id: str | int, error: Exception
     ) -> None:
-        conn = await self.config.new_db_client()
-        queue = await self.config.new_pgmq_client()
+        queue = await self.clients.queue()
 
         try:
-            retries = await conn.fetchval(
-                """update job_urls set errors = errors || $1, retries = retries + 1 where user_id = $2 and job_id = $3 and url_id = $4 returning retries""",
-                [repr(error)],
-                crawler_url.user_id,
-                crawler_url.job_id,
-                crawler_url.url_id,
-            )
-            if retries >= 3:
-                await queue.archive('job_urls', msg_id=msg_id, conn=conn)
-                await self.update_last_fetched_url(
-                    conn, user_id=crawler_url.user_id, job_id=crawler_url.job_id
-                )
+            with DB_CALL_SECONDS.time(method='report_error'):
+                async with self.clients.acquire() as conn:
+                    retries = await conn.fetchval(
+                        """update job_urls set errors = errors || $1, retries = retries + 1 where user_id = $2 and job_id = $3 and url_id = $4 returning retries""",
+                        [repr(error)],
+                        crawler_url.user_id,
+                        crawler_url.job_id,
+                        crawler_url.url_id,
+                    )
+                    kind = error_kind(error)
+                    delay = retry_delay(
+                        kind,
+                        retries,
+                        max_retries=self.config.crawler_max_retries,
+                        base_seconds=self.config.crawler_retry_base_seconds,
+                        max_seconds=self.config.crawler_retry_max_seconds,
+                        blocked_cooldown_seconds=self.config.crawler_retry_blocked_cooldown_seconds,
+                    )
+                    if delay is None:
+                        logger.debug(
+                            f'{crawler_url.url_id}: {kind} error after {retries} attempts, giving up'
+                        )
+                        await queue.archive('job_urls', msg_id=msg_id, conn=conn)
+                        MESSAGES_ARCHIVED.inc(reason='gave_up')
+                        await self.update_last_fetched_url(
+                            conn, user_id=crawler_url.user_id, job_id=crawler_url.job_id
+                        )
+                    else:
+                        logger.debug(
+                            f'{crawler_url.url_id}: {kind} error, retrying in {delay}s'
+                        )
+                        await queue.set_vt('job_urls', msg_id, delay, conn=conn)
         except Exception as e:
             logger.error(e)
-        finally:
-            await conn.close()
 
     async def sync(self, crawler_url: CrawlerUrl) -> None:
-        conn = await self.config.new_db_client()
         try:
             logger.debug(f'syncing {crawler_url.human_repr()}')
-            await conn.execute(
-                """update job_urls set status = $1 where job_id = $2 and user_id = $3 and url_id = $4""",
-                crawler_url.status,
-                crawler_url.job_id,
-                crawler_url.user_id,
-                crawler_url.url_id,
-            )
+            with DB_CALL_SECONDS.time(method='sync'):
+                async with self.clients.acquire() as conn:
+                    await conn.execute(
+                        """update job_urls set status = $1 where job_id = $2 and user_id = $3 and url_id = $4""",
+                        crawler_url.status,
+                        crawler_url.job_id,
+                        crawler_url.user_id,
+                        crawler_url.url_id,
+                    )
         except Exception as e:
             logger.error(e)
-        finally:
-            await conn.close()
 
     async def complete(
         self, crawler_url: CrawlerUrl, msg_id: int | str, data: dict[str, Any]
     ) -> None:
-        conn = await self.config.new_db_client()
-        queue = await self.config.new_pgmq_client()
         try:
-            async with conn.transaction():
-                await conn.execute(
-                    'update job_urls set status = $1, data = $2 where job_id = $3 and user_id = $4 and url_id = $5',
-                    crawler_url.status,
-                    json.dumps(data),
-                    crawler_url.job_id,
-                    crawler_url.user_id,
-                    crawler_url.url_id,
-                )  # update urls
-                await conn.execute(
-                    'update api_requests set requests = requests - 1 where user_id = $1',
-                    crawler_url.user_id,
-                )
-                await queue.archive('job_urls', msg_id=msg_id, conn=conn)
-            await self.update_last_fetched_url(
-                conn, user_id=crawler_url.user_id, job_id=crawler_url.job_id
-            )
+            with DB_CALL_SECONDS.time(method='complete'):
+                await self.completion_writer.complete(crawler_url, msg_id, data)
         except Exception as e:
             logger.error(e)
-        finally:
-            await conn.close()
+
+    async def flush(self) -> None:
+        await self.completion_writer.flush()
 
     async def enqueue(
         self, user_id: UUID, job_id: int, url: HttpUrl
     ) -> Optional[CrawlerUrl]:
-        return await self.crawlers_service.add_crawler_url(
-            user_id=user_id, job_id=job_id, url=url
-        )
+        with DB_CALL_SECONDS.time(method='enqueue'):
+            return await self.crawlers_service.add_crawler_url(
+                user_id=user_id, job_id=job_id, url=url
+            )
+
+    async def enqueue_many(
+        self,
+        user_id: UUID,
+        job_id: int,
+        urls: list[HttpUrl | str],
+        variant_depth: int = 0,
+    ) -> list[CrawlerUrl]:
+        with DB_CALL_SECONDS.time(method='enqueue_many'):
+            return await self.crawlers_service.add_crawler_urls(
+                user_id=user_id,
+                job_id=job_id,
+                urls=urls,
+                variant_depth=variant_depth,
+                max_job_urls=self.config.crawler_max_urls_per_job,
+            )
+
+    async def existing_url_ids(
+        self, user_id: UUID, job_id: int, url_ids: list[str]
+    ) -> set[str]:
+        with DB_CALL_SECONDS.time(method='existing_url_ids'):
+            return await self.crawlers_service.existing_url_ids(
+                user_id=user_id, job_id=job_id, url_ids=url_ids
+            )
 
 
 class DefaultCrawlContext(CrawlContext):
@@ -172,30 +244,85 @@ class DefaultCrawlContext(CrawlContext):
         crawl_syncer: CrawlSyncer,
         crawler_url: CrawlerUrl,
         message_id: str | int,
+        seen_urls: Optional[SeenUrls] = None,
+        listener: Optional[CrawlListener] = None,
     ) -> None:
         self._crawl_syncer = crawl_syncer
         self._crawler_url = crawler_url
         self._message_id = message_id
+        self._seen_urls = seen_urls
+        self._listener = listener
 
     def get_crawler_url(self) -> CrawlerUrl:
         return self._crawler_url
 
     async def enqueue(self, url: HttpUrl) -> Optional[CrawlerUrl]:
-        return await self._crawl_syncer.enqueue(
+        if self._seen_urls is None:
+            return await self._crawl_syncer.enqueue(
+                user_id=self._crawler_url.user_id,
+                job_id=self._crawler_url.job_id,
+                url=url,
+            )
+
+        xtracted_url = UrlFactory.new_url(url=url)
+        if xtracted_url is None or xtracted_url.url_id in self._seen_urls:
+            return None
+        enqueued = await self._crawl_syncer.enqueue(
             user_id=self._crawler_url.user_id,
             job_id=self._crawler_url.job_id,
             url=url,
         )
+        # added or already there, the job has it either way
+        self._seen_urls.add(xtracted_url.url_id)
+        return enqueued
+
+    async def enqueue_many(
+        self, urls: list[HttpUrl | str], variant_depth: int = 0
+    ) -> list[CrawlerUrl]:
+        url_ids: list[str] = []
+        if self._seen_urls is not None:
+            unseen: list[HttpUrl | str] = []
+            for url in urls:
+                xtracted_url = UrlFactory.new_url(url=url)
+                if xtracted_url and xtracted_url.url_id not in self._seen_urls:
+                    unseen.append(url)
+                    url_ids.append(xtracted_url.url_id)
+            urls = unseen
+        if not urls:
+            return []
+        enqueued = await self._crawl_syncer.enqueue_many(
+            user_id=self._crawler_url.user_id,
+            job_id=self._crawler_url.job_id,
+            urls=urls,
+            variant_depth=variant_depth,
+        )
+        if self._seen_urls is not None:
+            seen = {crawler_url.url_id for crawler_url in enqueued}
+            # urls dropped by the job size cap must not be filtered later on
+            missing = [url_id for url_id in url_ids if url_id not in seen]
+            if missing:
+                seen |= await self._crawl_syncer.existing_url_ids(
+                    user_id=self._crawler_url.user_id,
+                    job_id=self._crawler_url.job_id,
+                    url_ids=missing,
+                )
+            for url_id in seen:
+                self._seen_urls.add(url_id)
+        return enqueued
 
     async def fail(self, error: Exception) -> None:
         await self._crawl_syncer.report_error(
             self._crawler_url, self._message_id, error
         )
+        if self._listener:
+            self._listener.on_error(self._crawler_url, self._message_id, error)
 
     async def set_running(self) -> None:
         self._crawler_url.status = CrawlJobUrlStatus.running
         await self._crawl_syncer.sync(self._crawler_url)
 
-    async def complete(self, data: dict[str, Any]) -> None:
+    async def complete(self, data: dict[str, Any], fetched: bool = True) -> None:
         self._crawler_url.status = CrawlJobUrlStatus.complete
         await self._crawl_syncer.complete(self._crawler_url, self._message_id, data)
+        if self._listener:
+            self._listener.on_complete(self._crawler_url, self._message_id, fetched)
@@ -1,20 +1,126 @@
+from typing import Any, Literal, Optional
+
+import asyncpg
+from asyncpg import Connection, Pool
 from pydantic_settings import SettingsConfigDict
 from xtracted_common.configuration import XtractedConfig
 
+from xtracted.model import HostPolicy
+
 
 class CrawlerConfig(XtractedConfig):
     crawler_max_crawl_tasks: int = 1
 
+    # supervisor: 0 processes means one per core, a 0 total budget means
+    # crawler_max_crawl_tasks per process
+    crawler_processes: int = 0
+    crawler_total_crawl_tasks: int = 0
+    crawler_stats_interval_seconds: float = 30.0
+    # on SIGTERM, how long the crawls in flight may take to finish. Keep it
+    # below the stop grace period of the container, 10s by default in docker,
+    # or raise stop_grace_period along with it
+    crawler_drain_timeout_seconds: float = 8.0
+
     crawler_url_vt: int = 6
     crawler_url_qty: int = 1
     crawler_url_max_poll_seconds: int = 5
     crawler_url_poll_interval_ms: int = 1000
+    # in-flight url messages get crawler_url_vt more seconds at this interval
+    crawler_url_heartbeat_seconds: float = 2.0
+
+    # failed urls are redelivered with exponential backoff, blocked ones wait
+    # at least crawler_retry_blocked_cooldown_seconds, permanent errors and
+    # urls failing crawler_max_retries times are archived
+    crawler_max_retries: int = 3
+    crawler_retry_base_seconds: float = 10.0
+    crawler_retry_max_seconds: float = 600.0
+    crawler_retry_blocked_cooldown_seconds: float = 300.0
 
     crawler_job_vt: int = 10
     crawler_job_qty: int = 1
     crawler_job_max_poll_seconds: int = 5
     crawler_job_poll_interval_ms: int = 1000
 
+    # wake the loops with LISTEN/NOTIFY, polling every
+    # crawler_notify_fallback_poll_seconds in case a notification is lost
+    crawler_listen_notify: bool = False
+    crawler_notify_fallback_poll_seconds: float = 30.0
+
+    # deficit round robin over the users (or jobs) sharing job_urls, users
+    # are weighted by the tier crawler_fair_user_tiers maps them to
+    crawler_fair_scheduling: bool = False
+    crawler_fair_key: Literal['user', 'user_job'] = 'user'
+    crawler_fair_tier_weights: dict[str, float] = {}
+    crawler_fair_user_tiers: dict[str, str] = {}
+
+    # variant expansion, run_job events may set their own variant_depth
+    crawler_variant_depth: int = 0
+    crawler_variants_per_product: int = 100
+    crawler_max_urls_per_job: int = 10_000
+
+    # incremental run_job events keep complete urls crawled more recently
+    crawler_incremental_max_age_seconds: int = 86_400
+
+    # on disk cache of extracted products, disabled without a directory
+    crawler_page_cache_dir: Optional[str] = None
+    crawler_page_cache_ttl_seconds: int = 3600
+    crawler_page_cache_max_bytes: int = 1_000_000_000
+
+    # url ids known per job, checked before enqueueing discovered urls
+    crawler_seen_urls_max_jobs: int = 64
+    crawler_seen_urls_exact_capacity: int = 10_000
+    crawler_seen_urls_bloom_capacity: int = 1_000_000
+    crawler_seen_urls_error_rate: float = 1e-4
+
+    # per netloc limits, crawler_politeness_hosts keys also match subdomains
+    crawler_politeness_default: HostPolicy = HostPolicy()
+    crawler_politeness_hosts: dict[str, HostPolicy] = {}
+    crawler_politeness_defer_seconds: float = 2.0
+
+    # crawler_breaker_threshold consecutive bot walls pause a netloc, then
+    # crawler_breaker_half_open_probes urls probe it before resuming
+    crawler_breaker_threshold: int = 3
+    crawler_breaker_cooldown_seconds: float = 60.0
+    crawler_breaker_max_cooldown_seconds: float = 900.0
+    crawler_breaker_half_open_probes: int = 1
+
+    crawler_browser_pool_size: int = 1
+    crawler_browser_max_pages: int = 50
+    crawler_block_resource_types: list[str] = ['image', 'media', 'font']
+    crawler_block_domains: list[str] = [
+        'amazon-adsystem.com',
+        'doubleclick.net',
+        'googlesyndication.com',
+    ]
+    crawler_allow_domains: list[str] = []
+
+    crawler_db_pool_min_size: int = 2
+    crawler_db_pool_max_size: int = 10
+    crawler_db_pool_acquire_timeout: float = 10.0
+
+    crawler_complete_batch_size: int = 50
+    crawler_complete_flush_ms: int = 100
+
+    # prometheus metrics at /metrics, disabled without a port. Supervisor
+    # workers listen on consecutive ports from this one
+    crawler_metrics_port: Optional[int] = None
+    crawler_metrics_host: str = '0.0.0.0'
+    crawler_loop_lag_interval_seconds: float = 0.5
+
+    crawler_http_fast_path: bool = False
+    crawler_http_timeout_seconds: float = 10.0
+    crawler_http_max_connections_per_host: int = 8
+
+    async def new_db_pool(self) -> Pool:
+        async def connect(*args: Any, **kwargs: Any) -> Connection:
+            return await self.new_db_client()
+
+        return await asyncpg.create_pool(
+            connect=connect,
+            min_size=self.crawler_db_pool_min_size,
+            max_size=self.crawler_db_pool_max_size,
+        )
+
 
 class CrawlerConfigFromDotEnv(CrawlerConfig):
     model_config = SettingsConfigDict(env_file='.env', env_file_encoding='utf-8')
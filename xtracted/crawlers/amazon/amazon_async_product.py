@@ -9,14 +9,91 @@ from playwright.async_api import Browser, BrowserContext, Page
 from pydantic import HttpUrl
 
 from xtracted.context import CrawlContext, CrawlSyncer, DefaultCrawlContext
-from xtracted.model import CrawlerUrl, Extractor
+from xtracted.crawlers.amazon.amazon_html_parser import (
+    TWISTER_MARKER,
+    extract_asin,
+    extract_feature_bullets,
+    extract_twister_data,
+    has_variations,
+    is_bot_wall,
+    is_bot_wall_redirect,
+)
+from xtracted.crawlers.browser_pool import BrowserPool
+from xtracted.crawlers.http_fetcher import HttpFetcher
+from xtracted.crawlers.page_cache import PageCache
+from xtracted.crawlers.readiness import ReadinessPolicy, wait_for_main_world
+from xtracted.crawlers.route_policy import RoutePolicy, RouteStats
+from xtracted.metrics import CRAWL_STAGE_SECONDS
+from xtracted.model import (
+    BlockedCrawlException,
+    CrawlerUrl,
+    Extractor,
+    PermanentCrawlException,
+)
 
 logger = logging.getLogger('__name__')
 
+# statuses no retry will ever change
+PERMANENT_STATUSES = frozenset({404, 410})
+
+BOT_WALL_CHECK = """() => document.querySelector('form[action*="validateCaptcha"], #captchacharacters') !== null || document.title.includes('Robot Check')"""
+
+TWISTER_INIT_DATA = 'window.twisterController?.twisterModel?.twisterJSInitData'
+
+# everything the extractor needs, collected in a single main world evaluation.
+# Product pages with variations register the twister init data from an inline
+# script; without it the twister model is never built.
+EXTRACT_PRODUCT = f"""(() => {{
+  const reviews = document.querySelector('#averageCustomerReviews');
+  let matrix = null;
+  try {{
+    matrix = {TWISTER_INIT_DATA} || null;
+  }} catch (e) {{}}
+  return {{
+    href: document.location.href,
+    asin: reviews ? reviews.getAttribute('data-asin') : null,
+    feature_bullets: Array.from(
+      document.querySelectorAll('#feature-bullets ul li'),
+      li => li.textContent
+    ).filter(text => text).map(text => text.trim()),
+    has_variations: Array.from(document.scripts).some(
+      s => s.text.includes('{TWISTER_MARKER}')
+    ),
+    matrix: matrix,
+  }};
+}})()"""
+
 
 class AmazonAsyncProduct(Extractor):
-    def __init__(self, *, crawl_context: CrawlContext):
+    default_readiness = ReadinessPolicy(
+        wait_until='domcontentloaded',
+        selectors=['#averageCustomerReviews'],
+        timeout_ms=5000,
+    )
+    variations_timeout_ms = 10_000
+
+    def __init__(
+        self,
+        *,
+        crawl_context: CrawlContext,
+        browser_pool: Optional[BrowserPool] = None,
+        route_policy: Optional[RoutePolicy] = None,
+        readiness: Optional[ReadinessPolicy] = None,
+        http_fetcher: Optional[HttpFetcher] = None,
+        variant_depth: int = 0,
+        max_variants: int = 100,
+        page_cache: Optional[PageCache] = None,
+    ):
         self.crawl_context = crawl_context
+        self.browser_pool = browser_pool
+        self.route_policy = route_policy
+        self.readiness = readiness or self.default_readiness
+        self.http_fetcher = http_fetcher
+        self.variant_depth = variant_depth
+        self.max_variants = max_variants
+        self.page_cache = page_cache
+        # html of the page last extracted, kept for the page cache
+        self.snapshot: Optional[str] = None
 
     @staticmethod
     def extract_root_url(url: str) -> Optional[str]:
@@ -25,18 +102,10 @@ class AmazonAsyncProduct(Extractor):
             return f'{parsed_url.scheme}://{parsed_url.netloc}'
         return None
 
-    async def extract_variants(self, page: Page) -> dict[str, Any]:
-        href = await page.evaluate('document.location.href')
+    @staticmethod
+    def build_variants(matrix: dict[str, Any], href: str) -> dict[str, Any]:
         root_url = AmazonAsyncProduct.extract_root_url(href)
 
-        matrix = await page.evaluate(
-            'mw:window.twisterController.twisterModel.twisterJSInitData'
-        )
-
-        # scripts = await page.evaluate('document.scripts["100"].textContent')
-        #
-        # logger.error(scripts)
-
         result = {}
         if 'num_total_variations' in matrix:
             result['variants_count'] = matrix['num_total_variations']
@@ -65,62 +134,180 @@ class AmazonAsyncProduct(Extractor):
             result['variants'] = variants
         return result
 
-    async def extract_asin(self, page: Page) -> Any:
-        return await page.locator('#averageCustomerReviews').first.get_attribute(
-            'data-asin', timeout=5000
-        )
-
-    async def extract_feature_bullets(self, page: Page) -> list[str]:
-        res = []
-        for element in await page.locator('#feature-bullets ul li').all():
-            text_content = await element.text_content()
-            if text_content:
-                res.append(text_content.strip())
-        return res
-
-    async def extract_variations_matrix(self, page: Page) -> dict[str, Any]:
+    async def extract_variations_matrix(
+        self, page: Page, payload: dict[str, Any]
+    ) -> dict[str, Any]:
         try:
-            for i in range(10):
-                try:
-                    return await self.extract_variants(page)
-                except Exception:
-                    await asyncio.sleep(1)
-            raise ValueError('cannot retrieve variation matrix')
+            if not payload['has_variations']:
+                return {}
+            matrix = payload['matrix'] or await wait_for_main_world(
+                page, TWISTER_INIT_DATA, timeout_ms=self.variations_timeout_ms
+            )
+            return AmazonAsyncProduct.build_variants(matrix, payload['href'])
         except Exception as e:
             logger.error(e)
             return {}
 
     async def extract(self, page: Page) -> dict[str, Any]:
-        crawl_url = self.crawl_context.get_crawler_url()
-        await page.goto(str(crawl_url.url), wait_until='load')
-        asin = await self.extract_asin(page)
-        feature_bullets = await self.extract_feature_bullets(page)
-        variants = await self.extract_variations_matrix(page)
+        crawl_url = str(self.crawl_context.get_crawler_url().url)
+        with CRAWL_STAGE_SECONDS.time(stage='navigate'):
+            response = await page.goto(crawl_url, wait_until=self.readiness.wait_until)
+            if response is not None and response.status in PERMANENT_STATUSES:
+                raise PermanentCrawlException(
+                    f'{crawl_url}: http status {response.status}'
+                )
+            # checked before waiting for a product that a bot wall never shows
+            if is_bot_wall_redirect(page.url) or await page.evaluate(BOT_WALL_CHECK):
+                raise BlockedCrawlException(f'{crawl_url}: bot wall at {page.url}')
+            await self.readiness.wait_until_ready(page)
+        with CRAWL_STAGE_SECONDS.time(stage='evaluate'):
+            payload = await page.evaluate(f'mw:{EXTRACT_PRODUCT}')
+            if not payload['asin']:
+                raise PermanentCrawlException(f'{crawl_url}: no ASIN in the page')
+            variants = await self.extract_variations_matrix(page, payload)
+        if self.page_cache:
+            self.snapshot = await page.content()
         extracted = {}
-        extracted['asin'] = asin
-        extracted['feature_bullets'] = feature_bullets
+        extracted['asin'] = payload['asin']
+        extracted['feature_bullets'] = payload['feature_bullets']
         extracted['url'] = str(self.crawl_context.get_crawler_url().url)
         extracted['variants'] = variants
         return extracted
 
-    async def run(self, browser: Browser | BrowserContext) -> None:
+    async def extract_over_http(self) -> Optional[dict[str, Any]]:
+        """Extracts the product from the raw HTML, without a browser.
+
+        Returns None whenever the response cannot be trusted (error status,
+        bot wall, missing ASIN or twister data) so the browser takes over.
+        Raises PermanentCrawlException for pages that do not exist.
+        """
+        if not self.http_fetcher:
+            return None
+        crawl_url = str(self.crawl_context.get_crawler_url().url)
         try:
-            page = await browser.new_page()
-            extracted = await self.extract(page)
-            await self.crawl_context.complete(extracted)
+            with CRAWL_STAGE_SECONDS.time(stage='http'):
+                response = await self.http_fetcher.fetch(crawl_url)
         except Exception as e:
-            logger.error('Error occurred')
-            await self.crawl_context.fail(e)
+            logger.warning(f'{crawl_url}: http fetch failed, {e!r}')
+            return None
+        if response.status in PERMANENT_STATUSES:
+            # no point in asking the browser for a page that does not exist
+            raise PermanentCrawlException(f'{crawl_url}: http status {response.status}')
+        if response.status != 200 or is_bot_wall(response.html):
+            logger.debug(f'{crawl_url}: http status {response.status}, or bot wall')
+            return None
+        asin = extract_asin(response.html)
+        if not asin:
+            return None
+        variants: dict[str, Any] = {}
+        if has_variations(response.html):
+            matrix = extract_twister_data(response.html, asin)
+            if not matrix or 'dimensionValuesDisplayData' not in matrix:
+                return None
+            variants = AmazonAsyncProduct.build_variants(matrix, response.url)
+        self.snapshot = response.html
+        extracted = {}
+        extracted['asin'] = asin
+        extracted['feature_bullets'] = extract_feature_bullets(response.html)
+        extracted['url'] = crawl_url
+        extracted['variants'] = variants
+        return extracted
+
+    def cache_key(self) -> str:
+        crawler_url = self.crawl_context.get_crawler_url()
+        return PageCache.key(str(crawler_url.url), crawler_url.url_id)
+
+    async def extract_from_cache(self) -> Optional[dict[str, Any]]:
+        if not self.page_cache:
+            return None
+        try:
+            with CRAWL_STAGE_SECONDS.time(stage='cache'):
+                cached = await self.page_cache.get(self.cache_key())
+        except Exception as e:
+            logger.warning(f'page cache read failed, {e!r}')
+            return None
+        if cached is None:
+            return None
+        extracted = dict(cached.extracted)
+        extracted['url'] = str(self.crawl_context.get_crawler_url().url)
+        return extracted
+
+    async def store_in_cache(self, extracted: dict[str, Any]) -> None:
+        if not self.page_cache or not extracted.get('asin'):
+            return
+        try:
+            await self.page_cache.put(
+                self.cache_key(), extracted['url'], extracted, self.snapshot
+            )
+        except Exception as e:
+            logger.warning(f'page cache write failed, {e!r}')
+
+    async def expand_variants(self, extracted: dict[str, Any]) -> None:
+        """Enqueues the other variants of the product, one level deeper."""
+        if self.variant_depth <= 0:
+            return
+        urls = [
+            variant['url']
+            for variant in extracted['variants'].get('variants', [])
+            if variant['asin'] != extracted['asin']
+        ][: self.max_variants]
+        if not urls:
+            return
+        try:
+            with CRAWL_STAGE_SECONDS.time(stage='variants'):
+                enqueued = await self.crawl_context.enqueue_many(
+                    urls, variant_depth=self.variant_depth - 1
+                )
+            logger.debug(
+                f'{extracted["asin"]}: {len(enqueued)}/{len(urls)} variants enqueued'
+            )
+        except Exception as e:
+            logger.error(e)
+
+    async def run(self, browser: Browser | BrowserContext) -> dict[str, Any]:
+        """Extracts the product in a new page of `browser`."""
+        page: Optional[Page] = None
+        route_stats: Optional[RouteStats] = None
+        try:
+            page = await browser.new_page()
+            if self.route_policy:
+                route_stats = await self.route_policy.install(page)
+            return await self.extract(page)
         finally:
-            await browser.close()
+            if page:
+                try:
+                    await page.close()
+                except Exception as e:
+                    # the crawl outcome does not depend on it
+                    logger.warning(f'cannot close the page, {e!r}')
+            if route_stats:
+                logger.debug(
+                    f'{self.crawl_context.get_crawler_url().url_id}: blocked {route_stats.blocked_requests} requests, an estimated {route_stats.estimated_bytes_saved} bytes saved'
+                )
 
     async def crawl(self) -> None:
+        """Crawls the url and reports its outcome, complete or fail, once."""
         try:
             await self.crawl_context.set_running()
-            async with AsyncCamoufox(main_world_eval=True) as browser:  # type: ignore
-                await self.run(browser)
+            extracted = await self.extract_from_cache()
+            fetched = extracted is None
+            if not extracted:
+                extracted = await self.extract_over_http()
+                if not extracted:
+                    with CRAWL_STAGE_SECONDS.time(stage='browser'):
+                        if self.browser_pool:
+                            async with self.browser_pool.new_context() as context:
+                                extracted = await self.run(context)
+                        else:
+                            async with AsyncCamoufox(main_world_eval=True) as browser:  # type: ignore
+                                extracted = await self.run(browser)
+                await self.store_in_cache(extracted)
         except Exception as e:
-            logger.error('Error occurred', e)
+            logger.error(f'Error occurred, {e!r}')
+            await self.crawl_context.fail(e)
+            return
+        await self.expand_variants(extracted)
+        await self.crawl_context.complete(extracted, fetched=fetched)
 
 
 if __name__ == '__main__':
@@ -142,6 +329,20 @@ if __name__ == '__main__':
         ) -> Optional[CrawlerUrl]:
             return None
 
+        async def enqueue_many(
+            self,
+            user_id: UUID,
+            job_id: int,
+            urls: list[HttpUrl | str],
+            variant_depth: int = 0,
+        ) -> list[CrawlerUrl]:
+            return []
+
+        async def existing_url_ids(
+            self, user_id: UUID, job_id: int, url_ids: list[str]
+        ) -> set[str]:
+            return set()
+
         async def complete(
             self, crawl_url: CrawlerUrl, msg_id: int | str, data: dict[str, Any]
         ) -> None:
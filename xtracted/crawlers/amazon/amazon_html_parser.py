@@ -0,0 +1,175 @@
+import json
+import re
+from html.parser import HTMLParser
+from typing import Any, Optional
+from urllib.parse import urlparse
+
+DATA_ASIN = re.compile(r'\sdata-asin="([^"]*)"')
+PARENT_ASIN = re.compile(r'"parent_asin"\s*:\s*"([A-Z0-9]{10})"')
+# `twister-js-init` alone also matches the `twister-js-initializer` module
+# every product page loads
+TWISTER_MARKER = 'twister-js-init-dpx-data'
+TWISTER_INIT = f"P.register('{TWISTER_MARKER}'"
+VOID_ELEMENTS = {
+    'area',
+    'base',
+    'br',
+    'col',
+    'embed',
+    'hr',
+    'img',
+    'input',
+    'link',
+    'meta',
+    'param',
+    'source',
+    'track',
+    'wbr',
+}
+# the feature bullets section is a few KB, never parse more than this
+MAX_BULLETS_HTML = 200_000
+CHUNK_SIZE = 8192
+
+
+class FeatureBulletsParser(HTMLParser):
+    """Collects the text of `#feature-bullets ul li`, from the container on."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.bullets: list[str] = []
+        self.done = False
+        self._depth = 0
+        self._ul_depth = 0
+        self._li_depth = 0
+        self._li_text: list[str] = []
+
+    def handle_starttag(self, tag: str, attrs: list[tuple[str, Optional[str]]]) -> None:
+        if self.done or tag in VOID_ELEMENTS:
+            return
+        self._depth += 1
+        if tag == 'ul':
+            self._ul_depth += 1
+        elif tag == 'li' and self._ul_depth:
+            self._li_depth += 1
+
+    def handle_endtag(self, tag: str) -> None:
+        if self.done or tag in VOID_ELEMENTS:
+            return
+        self._depth -= 1
+        if tag == 'ul' and self._ul_depth:
+            self._ul_depth -= 1
+        elif tag == 'li' and self._li_depth:
+            self._li_depth -= 1
+            if self._li_depth == 0:
+                text = ''.join(self._li_text)
+                if text:
+                    self.bullets.append(text.strip())
+                self._li_text = []
+        if self._depth <= 0:
+            self.done = True
+
+    def handle_data(self, data: str) -> None:
+        if not self.done and self._li_depth:
+            self._li_text.append(data)
+
+
+def find_tag(html: str, element_id: str) -> Optional[tuple[int, int]]:
+    """Bounds of the first start tag carrying `id="element_id"`."""
+    position = html.find(f' id="{element_id}"')
+    if position < 0:
+        return None
+    return html.rfind('<', 0, position), html.find('>', position) + 1
+
+
+def extract_asin(html: str) -> Optional[str]:
+    bounds = find_tag(html, 'averageCustomerReviews')
+    if bounds:
+        data_asin = DATA_ASIN.search(html, *bounds)
+        if data_asin:
+            return data_asin.group(1)
+    return None
+
+
+def extract_feature_bullets(html: str) -> list[str]:
+    bounds = find_tag(html, 'feature-bullets')
+    if not bounds:
+        return []
+    parser = FeatureBulletsParser()
+    start = bounds[0]
+    end = min(len(html), start + MAX_BULLETS_HTML)
+    for offset in range(start, end, CHUNK_SIZE):
+        parser.feed(html[offset : min(end, offset + CHUNK_SIZE)])
+        if parser.done:
+            break
+    return parser.bullets
+
+
+def _decode_value(script: str, key: str) -> Any:
+    match = re.search(rf'"{key}"\s*:\s*', script)
+    if not match:
+        return None
+    value, _ = json.JSONDecoder().raw_decode(script, match.end())
+    return value
+
+
+def has_variations(html: str) -> bool:
+    return TWISTER_MARKER in html
+
+
+def extract_twister_data(html: str, asin: Optional[str]) -> Optional[dict[str, Any]]:
+    """Rebuilds the twister init data from the inline registration script.
+
+    The script is a javascript literal rather than JSON, so only the values we
+    need are decoded. `dimensionsDisplay` is computed by the twister model in
+    the browser; it is derived here from the dimension display labels.
+    """
+    start = html.find(TWISTER_INIT)
+    if start < 0:
+        return None
+    end = html.find('</script>', start)
+    script = html[start:end]
+
+    matrix: dict[str, Any] = {}
+    for key in (
+        'num_total_variations',
+        'variationDisplayLabels',
+        'dimensionValuesDisplayData',
+        'dimensions',
+    ):
+        value = _decode_value(script, key)
+        if value is not None:
+            matrix[key] = value
+    if asin:
+        matrix['current_asin'] = asin
+    parent_asin = PARENT_ASIN.search(html)
+    if parent_asin:
+        matrix['parent_asin'] = parent_asin.group(1)
+    labels = matrix.get('variationDisplayLabels')
+    if labels and 'dimensions' in matrix:
+        matrix['dimensionsDisplay'] = [
+            labels.get(dimension, dimension) for dimension in matrix['dimensions']
+        ]
+    return matrix
+
+
+BOT_WALL_MARKERS = (
+    '/errors/validateCaptcha',
+    'id="captchacharacters"',
+    '<title dir="ltr">Robot Check</title>',
+    'api-services-support@amazon.com',
+)
+
+
+def is_bot_wall(html: str) -> bool:
+    return any(marker in html for marker in BOT_WALL_MARKERS)
+
+
+# pages amazon redirects crawlers to instead of the product
+# captcha and account validation challenges, a sign in page or another site
+# is not a block on its own
+BOT_WALL_PATHS = ('/errors/validateCaptcha', '/ap/cvf/')
+
+
+def is_bot_wall_redirect(landed_url: str) -> bool:
+    """True when a product url landed on a captcha or validation challenge."""
+    return urlparse(landed_url).path.startswith(BOT_WALL_PATHS)
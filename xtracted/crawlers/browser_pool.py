@@ -0,0 +1,147 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Optional
+
+from camoufox.async_api import AsyncNewBrowser
+from playwright.async_api import Browser, BrowserContext, Playwright, async_playwright
+from pydantic import BaseModel
+
+logger = logging.getLogger('browser-pool')
+
+
+class BrowserPoolStats(BaseModel):
+    size: int
+    browsers: int
+    contexts_in_use: int
+    contexts_served: int
+    browsers_launched: int
+    browsers_recycled: int
+
+
+class PooledBrowser:
+    def __init__(self, browser: Browser) -> None:
+        self.browser = browser
+        self.contexts_opened = 0
+        self.in_use = 0
+        self.retiring = False
+
+
+class BrowserPool:
+    """Long lived Camoufox browsers handing out isolated contexts.
+
+    Browsers are launched lazily, up to `size` of them, and retired once they
+    have served `max_pages_per_browser` contexts. A retired browser is closed
+    as soon as its last context is released and a fresh one takes its place.
+    """
+
+    def __init__(
+        self,
+        *,
+        size: int = 1,
+        max_pages_per_browser: int = 50,
+        **launch_options: Any,
+    ) -> None:
+        self.size = max(1, size)
+        self.max_pages_per_browser = max(1, max_pages_per_browser)
+        self.launch_options = launch_options or {'main_world_eval': True}
+        self._playwright: Optional[Playwright] = None
+        self._browsers: list[PooledBrowser] = []
+        self._lock = asyncio.Lock()
+        self._contexts_served = 0
+        self._browsers_launched = 0
+        self._browsers_recycled = 0
+
+    async def _launch_browser(self) -> Browser:
+        if self._playwright is None:
+            self._playwright = await async_playwright().start()
+        return await AsyncNewBrowser(self._playwright, **self.launch_options)
+
+    async def _close_browser(self, pooled: PooledBrowser) -> None:
+        try:
+            await pooled.browser.close()
+        except Exception as e:
+            logger.warning(f'error while closing browser: {e}')
+
+    async def _checkout(self) -> PooledBrowser:
+        async with self._lock:
+            self._browsers = [
+                pooled
+                for pooled in self._browsers
+                if pooled.browser.is_connected() or pooled.in_use > 0
+            ]
+            active = [
+                pooled
+                for pooled in self._browsers
+                if not pooled.retiring and pooled.browser.is_connected()
+            ]
+            idle = [pooled for pooled in active if pooled.in_use == 0]
+            if not idle and len(active) < self.size:
+                pooled = PooledBrowser(await self._launch_browser())
+                self._browsers.append(pooled)
+                self._browsers_launched += 1
+                logger.debug(f'browser launched ({self._browsers_launched} so far)')
+            else:
+                pooled = min(idle or active, key=lambda p: p.in_use)
+
+            pooled.in_use += 1
+            pooled.contexts_opened += 1
+            if pooled.contexts_opened >= self.max_pages_per_browser:
+                pooled.retiring = True
+            return pooled
+
+    async def _checkin(self, pooled: PooledBrowser) -> None:
+        async with self._lock:
+            pooled.in_use -= 1
+            self._contexts_served += 1
+            if pooled.in_use > 0 or not (
+                pooled.retiring or not pooled.browser.is_connected()
+            ):
+                return
+            if pooled in self._browsers:
+                self._browsers.remove(pooled)
+            self._browsers_recycled += 1
+        logger.debug(f'recycling browser after {pooled.contexts_opened} contexts')
+        await self._close_browser(pooled)
+
+    @asynccontextmanager
+    async def new_context(
+        self, **context_options: Any
+    ) -> AsyncIterator[BrowserContext]:
+        """Yields a fresh browser context, closed when the block exits."""
+        pooled = await self._checkout()
+        try:
+            try:
+                context = await pooled.browser.new_context(**context_options)
+            except Exception:
+                pooled.retiring = True
+                raise
+            try:
+                yield context
+            finally:
+                try:
+                    await context.close()
+                except Exception as e:
+                    logger.warning(f'error while closing browser context: {e}')
+        finally:
+            await self._checkin(pooled)
+
+    def stats(self) -> BrowserPoolStats:
+        return BrowserPoolStats(
+            size=self.size,
+            browsers=len(self._browsers),
+            contexts_in_use=sum(pooled.in_use for pooled in self._browsers),
+            contexts_served=self._contexts_served,
+            browsers_launched=self._browsers_launched,
+            browsers_recycled=self._browsers_recycled,
+        )
+
+    async def close(self) -> None:
+        async with self._lock:
+            browsers = self._browsers
+            self._browsers = []
+        for pooled in browsers:
+            await self._close_browser(pooled)
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
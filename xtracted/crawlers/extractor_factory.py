@@ -3,14 +3,36 @@ from typing import Any, Optional
 from pydantic import AnyUrl
 from xtracted_common.model import AmazonProductUrl
 
-from xtracted.context import CrawlSyncer, DefaultCrawlContext
+from xtracted.context import CrawlListener, CrawlSyncer, DefaultCrawlContext
 from xtracted.crawlers.amazon.amazon_async_product import AmazonAsyncProduct
+from xtracted.crawlers.browser_pool import BrowserPool
+from xtracted.crawlers.http_fetcher import HttpFetcher
+from xtracted.crawlers.page_cache import PageCache
+from xtracted.crawlers.route_policy import RoutePolicy
 from xtracted.model import CrawlerUrl, Extractor
+from xtracted.seen_urls import SeenUrlRegistry
 
 
 class Extractorfactory:
-    def __init__(self, crawl_syncer: CrawlSyncer):
+    def __init__(
+        self,
+        crawl_syncer: CrawlSyncer,
+        browser_pool: Optional[BrowserPool] = None,
+        route_policy: Optional[RoutePolicy] = None,
+        http_fetcher: Optional[HttpFetcher] = None,
+        seen_urls: Optional[SeenUrlRegistry] = None,
+        max_variants: int = 100,
+        page_cache: Optional[PageCache] = None,
+        listener: Optional[CrawlListener] = None,
+    ):
         self.crawl_syncer = crawl_syncer
+        self.browser_pool = browser_pool
+        self.route_policy = route_policy
+        self.http_fetcher = http_fetcher
+        self.seen_urls = seen_urls
+        self.max_variants = max_variants
+        self.page_cache = page_cache
+        self.listener = listener
 
     def new_instance(
         self, message_id: str | int, mapping: dict[str, Any]
@@ -18,11 +40,27 @@ class Extractorfactory:
         url = AnyUrl(mapping['url'])
         if url.path:
             if AmazonProductUrl.match_url.match(url.path):
+                variant_depth = mapping.pop('variant_depth', 0)
+                crawler_url = CrawlerUrl(**mapping)
+                seen_urls = None
+                if self.seen_urls:
+                    seen_urls = self.seen_urls.for_job(
+                        crawler_url.user_id, crawler_url.job_id
+                    )
+                    seen_urls.add(crawler_url.url_id)
                 return AmazonAsyncProduct(
                     crawl_context=DefaultCrawlContext(
                         message_id=message_id,
-                        crawler_url=CrawlerUrl(**mapping),
+                        crawler_url=crawler_url,
                         crawl_syncer=self.crawl_syncer,
-                    )
+                        seen_urls=seen_urls,
+                        listener=self.listener,
+                    ),
+                    browser_pool=self.browser_pool,
+                    route_policy=self.route_policy,
+                    http_fetcher=self.http_fetcher,
+                    variant_depth=variant_depth,
+                    max_variants=self.max_variants,
+                    page_cache=self.page_cache,
                 )
         return None
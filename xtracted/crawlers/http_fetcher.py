@@ -0,0 +1,60 @@
+import asyncio
+from typing import NamedTuple, Optional
+
+from aiohttp import ClientSession, ClientTimeout, TCPConnector
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64; rv:135.0) Gecko/20100101 Firefox/135.0',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+    'Accept-Language': 'en-GB,en;q=0.5',
+}
+
+
+class HttpPage(NamedTuple):
+    url: str
+    status: int
+    html: str
+
+
+class HttpFetcher:
+    """Shared aiohttp session used to fetch pages without a browser."""
+
+    def __init__(
+        self,
+        *,
+        timeout_seconds: float = 10,
+        max_connections_per_host: int = 8,
+        headers: Optional[dict[str, str]] = None,
+    ) -> None:
+        self.timeout_seconds = timeout_seconds
+        self.max_connections_per_host = max_connections_per_host
+        self.headers = headers or DEFAULT_HEADERS
+        self._session: Optional[ClientSession] = None
+        self._lock = asyncio.Lock()
+
+    async def session(self) -> ClientSession:
+        if self._session is None:
+            async with self._lock:
+                if self._session is None:
+                    self._session = ClientSession(
+                        headers=self.headers,
+                        timeout=ClientTimeout(total=self.timeout_seconds),
+                        connector=TCPConnector(
+                            limit_per_host=self.max_connections_per_host
+                        ),
+                    )
+        return self._session
+
+    async def fetch(self, url: str) -> HttpPage:
+        session = await self.session()
+        async with session.get(url) as response:
+            return HttpPage(
+                url=str(response.url),
+                status=response.status,
+                html=await response.text(errors='replace'),
+            )
+
+    async def close(self) -> None:
+        session, self._session = self._session, None
+        if session is not None:
+            await session.close()
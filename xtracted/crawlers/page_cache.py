@@ -0,0 +1,203 @@
+import asyncio
+import gzip
+import hashlib
+import json
+import logging
+import os
+import time
+import uuid
+from typing import Any, Optional
+from urllib.parse import urlparse
+
+import aiofiles
+import aiofiles.os
+from pydantic import BaseModel
+
+logger = logging.getLogger('page-cache')
+
+# how often the directory is scanned again for what other processes wrote
+RESCAN_SECONDS = 60
+# temporary files this old were left behind by a writer that died
+STALE_TMP_SECONDS = 3600
+
+
+class CachedPage(BaseModel):
+    key: str
+    url: str
+    fetched_at: float
+    extracted: dict[str, Any]
+
+
+class CacheEntry:
+    def __init__(self, size: int, used_at: float) -> None:
+        self.size = size
+        self.used_at = used_at
+
+
+class PageCache:
+    """Extracted products, and their HTML when known, stored on disk.
+
+    Entries are keyed by marketplace and ASIN so that any url of a product
+    hits the same entry. Entries older than `ttl_seconds` are never served,
+    and the least recently used ones are evicted once the cache holds more
+    than `max_bytes`.
+
+    The directory may be shared by several processes: the sizes and recency
+    of the entries are read from the directory every `rescan_seconds`, and
+    a hit touches the entry so that the other processes see it was used.
+    In between, the cap only accounts for the writes of this process.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        *,
+        ttl_seconds: int,
+        max_bytes: int,
+        rescan_seconds: float = RESCAN_SECONDS,
+    ) -> None:
+        self.directory = directory
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.rescan_seconds = rescan_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries: Optional[dict[str, CacheEntry]] = None
+        self._scanned_at = 0.0
+        self._lock = asyncio.Lock()
+
+    @staticmethod
+    def key(url: str, asin: str) -> str:
+        netloc = urlparse(url).netloc.lower()
+        return f'{netloc.removeprefix("www.")}/{asin.upper()}'
+
+    def _name(self, key: str) -> str:
+        return hashlib.sha256(key.encode()).hexdigest()[:32]
+
+    def _path(self, name: str, suffix: str) -> str:
+        return os.path.join(self.directory, f'{name}{suffix}')
+
+    def _scan(self) -> dict[str, CacheEntry]:
+        """Sizes and recency of the entries on disk, blocking."""
+        os.makedirs(self.directory, exist_ok=True)
+        entries: dict[str, CacheEntry] = {}
+        now = time.time()
+        with os.scandir(self.directory) as scan:
+            for entry in scan:
+                try:
+                    stat = entry.stat()
+                    if entry.name.endswith('.tmp'):
+                        if now - stat.st_mtime > STALE_TMP_SECONDS:
+                            os.remove(entry.path)
+                        continue
+                except FileNotFoundError:
+                    # removed by another process meanwhile
+                    continue
+                name, _, _ = entry.name.partition('.')
+                known = entries.setdefault(name, CacheEntry(0, stat.st_mtime))
+                known.size += stat.st_size
+                known.used_at = max(known.used_at, stat.st_mtime)
+        return entries
+
+    async def _index(self) -> dict[str, CacheEntry]:
+        """Sizes and recency of the entries, scanned again every `rescan_seconds`."""
+        entries = self._entries
+        if entries is None or self._rescan_due():
+            async with self._lock:
+                entries = self._entries
+                if entries is None or self._rescan_due():
+                    entries = await asyncio.to_thread(self._scan)
+                    self._entries = entries
+                    self._scanned_at = time.monotonic()
+        return entries
+
+    def _rescan_due(self) -> bool:
+        return time.monotonic() - self._scanned_at >= self.rescan_seconds
+
+    async def _remove(self, name: str) -> None:
+        entries = await self._index()
+        entries.pop(name, None)
+        for suffix in ('.json', '.html.gz'):
+            try:
+                await aiofiles.os.remove(self._path(name, suffix))
+            except FileNotFoundError:
+                pass
+
+    async def get(self, key: str) -> Optional[CachedPage]:
+        name = self._name(key)
+        entries = await self._index()
+        try:
+            async with aiofiles.open(self._path(name, '.json'), 'r') as f:
+                page = CachedPage(**json.loads(await f.read()))
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except Exception as e:
+            logger.warning(f'{key}: unreadable cache entry, {e!r}')
+            await self._remove(name)
+            self.misses += 1
+            return None
+
+        if page.key != key or time.time() - page.fetched_at > self.ttl_seconds:
+            await self._remove(name)
+            self.misses += 1
+            return None
+        if name in entries:
+            entries[name].used_at = time.time()
+        try:
+            await asyncio.to_thread(os.utime, self._path(name, '.json'))
+        except FileNotFoundError:
+            pass
+        self.hits += 1
+        return page
+
+    async def get_html(self, key: str) -> Optional[str]:
+        try:
+            async with aiofiles.open(
+                self._path(self._name(key), '.html.gz'), 'rb'
+            ) as f:
+                compressed = await f.read()
+        except FileNotFoundError:
+            return None
+        return (await asyncio.to_thread(gzip.decompress, compressed)).decode()
+
+    async def _write(self, path: str, data: bytes) -> None:
+        # written aside then renamed so that readers never see half a file,
+        # under a name of its own as another put may write the same entry
+        tmp = f'{path}.{os.getpid()}.{uuid.uuid4().hex}.tmp'
+        async with aiofiles.open(tmp, 'wb') as f:
+            await f.write(data)
+        await aiofiles.os.replace(tmp, path)
+
+    async def put(
+        self, key: str, url: str, extracted: dict[str, Any], html: Optional[str] = None
+    ) -> None:
+        name = self._name(key)
+        entries = await self._index()
+        page = CachedPage(key=key, url=url, fetched_at=time.time(), extracted=extracted)
+        data = page.model_dump_json().encode()
+        await self._write(self._path(name, '.json'), data)
+        size = len(data)
+        if html is not None:
+            compressed = await asyncio.to_thread(gzip.compress, html.encode(), 6)
+            await self._write(self._path(name, '.html.gz'), compressed)
+            size += len(compressed)
+        else:
+            try:
+                await aiofiles.os.remove(self._path(name, '.html.gz'))
+            except FileNotFoundError:
+                pass
+        entries[name] = CacheEntry(size, time.time())
+        await self._evict()
+
+    async def _evict(self) -> None:
+        entries = await self._index()
+        total = sum(entry.size for entry in entries.values())
+        if total <= self.max_bytes:
+            return
+        for name, entry in sorted(entries.items(), key=lambda item: item[1].used_at):
+            if total <= self.max_bytes:
+                break
+            total -= entry.size
+            await self._remove(name)
+            logger.debug(f'evicted {name}, {entry.size} bytes')
@@ -0,0 +1,71 @@
+import asyncio
+import time
+from typing import Any, Literal
+
+from playwright.async_api import Page
+from pydantic import BaseModel
+
+ALL_SELECTORS_PRESENT = (
+    'selectors => selectors.every(s => document.querySelector(s) !== null)'
+)
+
+
+def main_world_global(path: str) -> str:
+    """Expression testing that a dotted global path is defined in the page."""
+    return f'window.{path.replace(".", "?.")} != null'
+
+
+async def wait_for_main_world(
+    page: Page, expression: str, *, timeout_ms: int, poll_interval_ms: int = 100
+) -> Any:
+    """Polls `expression` in the page main world until it is truthy.
+
+    Camoufox only reaches page globals through `mw:` evaluations, which
+    `wait_for_function` does not support, hence the polling.
+    """
+    deadline = time.monotonic() + timeout_ms / 1000
+    while True:
+        value = await page.evaluate(f'mw:{expression}')
+        if value:
+            return value
+        if time.monotonic() >= deadline:
+            raise TimeoutError(f'{expression} not satisfied within {timeout_ms}ms')
+        await asyncio.sleep(poll_interval_ms / 1000)
+
+
+class ReadinessPolicy(BaseModel):
+    """When an extractor may start reading a page.
+
+    Navigation returns at `wait_until`, then we wait for every selector to be
+    attached and every global to be defined, within `timeout_ms`.
+    """
+
+    wait_until: Literal['commit', 'domcontentloaded', 'load', 'networkidle'] = (
+        'domcontentloaded'
+    )
+    selectors: list[str] = []
+    js_globals: list[str] = []
+    timeout_ms: int = 5000
+    poll_interval_ms: int = 100
+
+    async def wait_until_ready(self, page: Page) -> None:
+        started = time.monotonic()
+        if self.selectors:
+            await page.wait_for_function(
+                ALL_SELECTORS_PRESENT,
+                arg=self.selectors,
+                polling=self.poll_interval_ms,
+                timeout=self.timeout_ms,
+            )
+        if self.js_globals:
+            elapsed_ms = int((time.monotonic() - started) * 1000)
+            await wait_for_main_world(
+                page,
+                ' && '.join(main_world_global(path) for path in self.js_globals),
+                timeout_ms=max(0, self.timeout_ms - elapsed_ms),
+                poll_interval_ms=self.poll_interval_ms,
+            )
+
+    async def navigate(self, page: Page, url: str) -> None:
+        await page.goto(url, wait_until=self.wait_until)
+        await self.wait_until_ready(page)
@@ -0,0 +1,108 @@
+from typing import Optional
+from urllib.parse import urlparse
+
+from playwright.async_api import BrowserContext, Page, Request, Route
+from pydantic import BaseModel
+
+# rough transfer size of the resources we abort, used to estimate savings as
+# the actual size of an aborted response is never known
+ESTIMATED_RESOURCE_BYTES = {
+    'image': 40_000,
+    'media': 500_000,
+    'font': 35_000,
+    'stylesheet': 25_000,
+    'script': 30_000,
+}
+DEFAULT_RESOURCE_BYTES = 10_000
+
+
+class RouteStats(BaseModel):
+    """Requests let through and aborted by a route policy.
+
+    `estimated_bytes_saved` is not measured: it adds up a per resource type
+    average for every aborted request.
+    """
+
+    allowed_requests: int = 0
+    blocked_requests: int = 0
+    blocked_by_type: dict[str, int] = {}
+    estimated_bytes_saved: int = 0
+
+    def record_blocked(self, resource_type: str) -> None:
+        self.blocked_requests += 1
+        self.blocked_by_type[resource_type] = (
+            self.blocked_by_type.get(resource_type, 0) + 1
+        )
+        self.estimated_bytes_saved += ESTIMATED_RESOURCE_BYTES.get(
+            resource_type, DEFAULT_RESOURCE_BYTES
+        )
+
+
+class RoutePolicy(BaseModel):
+    """Decides which requests a page is allowed to make.
+
+    The main frame document is always loaded. Other requests, iframes
+    included, are aborted when their resource type is blocked, when their host is in `blocked_domains`, or when
+    `allowed_domains` is set and their host is not part of it.
+    """
+
+    blocked_resource_types: set[str] = set()
+    blocked_domains: list[str] = []
+    allowed_domains: list[str] = []
+
+    @staticmethod
+    def _match_domain(host: str, domains: list[str]) -> bool:
+        return any(host == domain or host.endswith(f'.{domain}') for domain in domains)
+
+    def should_block(
+        self, url: str, resource_type: str, main_frame: bool = False
+    ) -> bool:
+        if main_frame and resource_type == 'document':
+            return False
+        if resource_type in self.blocked_resource_types:
+            return True
+        host = urlparse(url).hostname or ''
+        if self._match_domain(host, self.blocked_domains):
+            return True
+        if self.allowed_domains and not self._match_domain(host, self.allowed_domains):
+            return True
+        return False
+
+    def is_noop(self) -> bool:
+        return not (
+            self.blocked_resource_types or self.blocked_domains or self.allowed_domains
+        )
+
+    async def install(self, target: Page | BrowserContext) -> Optional[RouteStats]:
+        """Routes every request of `target` through the policy.
+
+        Returns the stats collected for `target`, or None when the policy
+        would not block anything and no route has been installed.
+        """
+        if self.is_noop():
+            return None
+        stats = RouteStats()
+
+        async def handle(route: Route) -> None:
+            request = route.request
+            if self.should_block(
+                request.url, request.resource_type, _is_main_frame_navigation(request)
+            ):
+                stats.record_blocked(request.resource_type)
+                await route.abort('blockedbyclient')
+            else:
+                stats.allowed_requests += 1
+                await route.fallback()
+
+        await target.route('**/*', handle)
+        return stats
+
+
+def _is_main_frame_navigation(request: Request) -> bool:
+    if not request.is_navigation_request():
+        return False
+    try:
+        return request.frame.parent_frame is None
+    except Exception:
+        # requests of service workers have no frame
+        return False
@@ -0,0 +1,332 @@
+import asyncio
+import bisect
+import logging
+import math
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional, TypeVar
+
+from aiohttp import web
+
+logger = logging.getLogger('metrics')
+
+LabelValues = tuple[str, ...]
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# seconds, from a cached page to a slow browser crawl
+DEFAULT_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names: tuple[str, ...], values: LabelValues) -> str:
+    if not names:
+        return ''
+    pairs = ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return f'{{{pairs}}}'
+
+
+class Metric(ABC):
+    kind = 'untyped'
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labels = labels
+
+    def _key(self, labels: dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.labels):
+            raise ValueError(f'{self.name} expects labels {self.labels}')
+        return tuple(str(labels[name]) for name in self.labels)
+
+    @abstractmethod
+    def samples(self) -> Iterator[str]:
+        pass
+
+    def render(self) -> str:
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.kind}']
+        lines.extend(self.samples())
+        return '\n'.join(lines)
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()) -> None:
+        super().__init__(name, help, labels)
+        self.values: dict[LabelValues, float] = {}
+        if not labels:
+            self.values[()] = 0
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self.values.get(self._key(labels), 0)
+
+    def samples(self) -> Iterator[str]:
+        for key, value in sorted(self.values.items()):
+            yield f'{self.name}{_format_labels(self.labels, key)} {_format_value(value)}'
+
+
+class Gauge(Metric):
+    """A value set by the code, or read from `function` at scrape time."""
+
+    kind = 'gauge'
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()) -> None:
+        super().__init__(name, help, labels)
+        self.values: dict[LabelValues, float] = {}
+        if not labels:
+            self.values[()] = 0
+        self.function: Optional[Callable[[], float]] = None
+
+    def set(self, value: float, **labels: str) -> None:
+        self.values[self._key(labels)] = value
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        self.function = function
+
+    def samples(self) -> Iterator[str]:
+        if self.function is not None:
+            try:
+                yield f'{self.name} {_format_value(self.function())}'
+            except Exception as e:
+                logger.warning(f'{self.name}: {e!r}')
+            return
+        for key, value in sorted(self.values.items()):
+            yield f'{self.name}{_format_labels(self.labels, key)} {_format_value(value)}'
+
+
+class HistogramValues:
+    def __init__(self, buckets: int) -> None:
+        self.counts = [0] * buckets
+        self.sum = 0.0
+        self.count = 0
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        self.values: dict[LabelValues, HistogramValues] = {}
+        if not labels:
+            self.values[()] = HistogramValues(len(self.buckets))
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        values = self.values.get(key)
+        if values is None:
+            values = HistogramValues(len(self.buckets))
+            self.values[key] = values
+        # counts are per bucket here, made cumulative when rendered
+        position = bisect.bisect_left(self.buckets, value)
+        if position < len(self.buckets):
+            values.counts[position] += 1
+        values.sum += value
+        values.count += 1
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def count(self, **labels: str) -> int:
+        values = self.values.get(self._key(labels))
+        return values.count if values else 0
+
+    def samples(self) -> Iterator[str]:
+        names = self.labels + ('le',)
+        for key, values in sorted(self.values.items()):
+            cumulative = 0
+            for bucket, count in zip(self.buckets, values.counts):
+                cumulative += count
+                labels = _format_labels(names, key + (_format_value(bucket),))
+                yield f'{self.name}_bucket{labels} {cumulative}'
+            labels = _format_labels(names, key + ('+Inf',))
+            yield f'{self.name}_bucket{labels} {values.count}'
+            labels = _format_labels(self.labels, key)
+            yield f'{self.name}_sum{labels} {_format_value(values.sum)}'
+            yield f'{self.name}_count{labels} {values.count}'
+
+
+M = TypeVar('M', bound=Metric)
+
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        self.metrics: dict[str, Metric] = {}
+
+    def _register(self, metric: M) -> M:
+        if metric.name in self.metrics:
+            raise ValueError(f'{metric.name} already registered')
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labels: tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(name, help, labels))
+
+    def gauge(self, name: str, help: str, labels: tuple[str, ...] = ()) -> Gauge:
+        return self._register(Gauge(name, help, labels))
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        labels: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self._register(Histogram(name, help, labels, buckets))
+
+    def render(self) -> str:
+        """The metrics in the Prometheus text exposition format."""
+        return ''.join(f'{metric.render()}\n' for metric in self.metrics.values())
+
+
+REGISTRY = MetricsRegistry()
+
+CRAWLS_IN_FLIGHT = REGISTRY.gauge('xtracted_crawls_in_flight', 'Crawl tasks running')
+CRAWL_SECONDS = REGISTRY.histogram(
+    'xtracted_crawl_duration_seconds', 'Crawl task duration'
+)
+CRAWL_STAGE_SECONDS = REGISTRY.histogram(
+    'xtracted_crawl_stage_seconds', 'Duration of each crawl stage', ('stage',)
+)
+CRAWL_ERRORS = REGISTRY.counter(
+    'xtracted_crawl_errors_total', 'Failed crawls by kind of error', ('kind',)
+)
+QUEUE_READ_SECONDS = REGISTRY.histogram(
+    'xtracted_queue_read_seconds',
+    'Duration of the queue reads, polling reads excluded',
+    ('queue',),
+)
+QUEUE_POLL_SECONDS = REGISTRY.histogram(
+    'xtracted_queue_poll_seconds',
+    'Duration of the polling reads, the wait for messages included',
+    ('queue',),
+)
+MESSAGES_READ = REGISTRY.counter(
+    'xtracted_messages_read_total', 'Messages read from the queues', ('queue',)
+)
+MESSAGES_DEFERRED = REGISTRY.counter(
+    'xtracted_messages_deferred_total', 'Url messages sent back to the queue'
+)
+MESSAGES_ARCHIVED = REGISTRY.counter(
+    'xtracted_messages_archived_total',
+    'Url messages archived, crawled or given up on',
+    ('reason',),
+)
+DB_CALL_SECONDS = REGISTRY.histogram(
+    'xtracted_db_call_seconds', 'Duration of the crawl syncer calls', ('method',)
+)
+BROWSERS = REGISTRY.gauge('xtracted_browser_pool_browsers', 'Browsers running')
+BROWSER_CONTEXTS_IN_USE = REGISTRY.gauge(
+    'xtracted_browser_pool_contexts_in_use', 'Browser contexts in use'
+)
+BROWSERS_LAUNCHED = REGISTRY.gauge(
+    'xtracted_browser_pool_browsers_launched', 'Browsers launched so far'
+)
+BROWSERS_RECYCLED = REGISTRY.gauge(
+    'xtracted_browser_pool_browsers_recycled', 'Browsers retired so far'
+)
+LOOP_LAG_SECONDS = REGISTRY.histogram(
+    'xtracted_event_loop_lag_seconds',
+    'How late the event loop runs a timer',
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+
+
+class LoopLagMonitor:
+    """Sleeps `interval_seconds` at a time and records how late it wakes up.
+
+    A busy event loop, e.g. parsing HTML inline, delays every crawl and
+    heartbeat it runs.
+    """
+
+    def __init__(self, interval_seconds: float = 0.5) -> None:
+        self.interval_seconds = interval_seconds
+
+    async def run(self) -> None:
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval_seconds)
+            lag = time.perf_counter() - started - self.interval_seconds
+            LOOP_LAG_SECONDS.observe(max(0, lag))
+
+
+class MetricsServer:
+    """Serves `registry` at /metrics and monitors the event loop lag."""
+
+    def __init__(
+        self,
+        *,
+        host: str,
+        port: int,
+        registry: MetricsRegistry = REGISTRY,
+        loop_lag_interval_seconds: float = 0.5,
+    ) -> None:
+        self.host = host
+        self.port = port
+        self.registry = registry
+        self.loop_lag = LoopLagMonitor(loop_lag_interval_seconds)
+
+    async def handle_metrics(self, request: web.Request) -> web.Response:
+        return web.Response(
+            body=self.registry.render().encode(),
+            headers={'Content-Type': CONTENT_TYPE},
+        )
+
+    def new_web_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get('/metrics', self.handle_metrics)
+        return app
+
+    async def run(self) -> None:
+        runner = web.AppRunner(self.new_web_app(), access_log=None)
+        await runner.setup()
+        try:
+            try:
+                await web.TCPSite(runner, self.host, self.port).start()
+                logger.info(f'metrics served on {self.host}:{self.port}/metrics')
+            except OSError as e:
+                # the worker is still worth running without its metrics
+                logger.error(f'cannot serve metrics on port {self.port}, {e!r}')
+            await self.loop_lag.run()
+        finally:
+            await runner.cleanup()
@@ -3,7 +3,7 @@ from typing import Optional
 from uuid import UUID
 
 from asyncpg import Record
-from pydantic import HttpUrl
+from pydantic import BaseModel, HttpUrl
 from xtracted_common.model import (
     CrawlJobUrl,
     CrawlJobUrlInput,
@@ -16,6 +16,40 @@ class CrawlException(Exception):
     pass
 
 
+class PermanentCrawlException(CrawlException):
+    """Crawling the url again will not help, e.g. a 404 or a page without ASIN."""
+
+
+class BlockedCrawlException(CrawlException):
+    """The site answered with a captcha or a bot wall instead of the page."""
+
+
+class HostPolicy(BaseModel):
+    """How hard a single host may be crawled."""
+
+    rate_per_second: float = 2.0
+    burst: int = 4
+    max_in_flight: int = 4
+
+    def share(self, index: int, processes: int) -> 'HostPolicy':
+        """The part of the policy enforced by process `index` of `processes`.
+
+        Each process limits its own crawls, so the policy is split between
+        them like the crawl budget. A process keeps at least one crawl in
+        flight and a burst of one.
+        """
+
+        def split(total: int) -> int:
+            share, remainder = divmod(max(total, processes), processes)
+            return share + (1 if index < remainder else 0)
+
+        return HostPolicy(
+            rate_per_second=self.rate_per_second / processes,
+            burst=split(self.burst),
+            max_in_flight=split(self.max_in_flight),
+        )
+
+
 class Extractor(ABC):
     @abstractmethod
     async def crawl(self) -> None:
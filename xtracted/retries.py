@@ -0,0 +1,44 @@
+import random
+from typing import Callable, Literal, Optional
+
+from xtracted.model import (
+    BlockedCrawlException,
+    InvalidUrlException,
+    PermanentCrawlException,
+)
+
+ErrorKind = Literal['permanent', 'transient', 'blocked']
+
+
+def error_kind(error: Exception) -> ErrorKind:
+    """Anything not known to be permanent or blocking is worth a retry."""
+    if isinstance(error, (PermanentCrawlException, InvalidUrlException)):
+        return 'permanent'
+    if isinstance(error, BlockedCrawlException):
+        return 'blocked'
+    return 'transient'
+
+
+def retry_delay(
+    kind: ErrorKind,
+    retries: int,
+    *,
+    max_retries: int,
+    base_seconds: float,
+    max_seconds: float,
+    blocked_cooldown_seconds: float,
+    rng: Callable[[], float] = random.random,
+) -> Optional[int]:
+    """Seconds before the `retries`-th attempt is redelivered, None to give up.
+
+    Transient errors back off exponentially from `base_seconds` up to
+    `max_seconds`, blocking errors wait at least `blocked_cooldown_seconds`.
+    Half of the delay is random so that urls failing together, say on a
+    host going down, do not all come back at once.
+    """
+    if kind == 'permanent' or retries >= max_retries:
+        return None
+    delay = min(max_seconds, base_seconds * 2 ** max(0, retries - 1))
+    if kind == 'blocked':
+        delay = max(delay, blocked_cooldown_seconds)
+    return max(1, round(delay / 2 + rng() * delay / 2))
@@ -0,0 +1,145 @@
+import hashlib
+import math
+from collections import OrderedDict
+from typing import Iterator, Optional
+from uuid import UUID
+
+
+class LruSet:
+    """Exact set of the `capacity` most recently seen keys."""
+
+    def __init__(self, capacity: int) -> None:
+        self.capacity = max(1, capacity)
+        self._keys: OrderedDict[str, None] = OrderedDict()
+
+    def __contains__(self, key: str) -> bool:
+        if key in self._keys:
+            self._keys.move_to_end(key)
+            return True
+        return False
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._keys)
+
+    def add(self, key: str) -> None:
+        self._keys[key] = None
+        self._keys.move_to_end(key)
+        if len(self._keys) > self.capacity:
+            self._keys.popitem(last=False)
+
+
+class BloomFilter:
+    """Fixed size bloom filter sized for `capacity` keys at `error_rate`."""
+
+    def __init__(self, capacity: int, error_rate: float) -> None:
+        self.capacity = max(1, capacity)
+        bits = -self.capacity * math.log(error_rate) / math.log(2) ** 2
+        self.size = max(8, int(math.ceil(bits)))
+        self.hashes = max(1, round(self.size / self.capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: str) -> list[int]:
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+    def __contains__(self, key: str) -> bool:
+        return all(
+            self.bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(key)
+        )
+
+    def add(self, key: str) -> None:
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def is_full(self) -> bool:
+        return self.count >= self.capacity
+
+
+class SeenUrls:
+    """Url ids a job is known to have, checked before going to the database.
+
+    Small jobs are tracked exactly. Past `exact_capacity` ids the job switches
+    to a bloom filter of bounded size; a false positive, at `error_rate`,
+    skips a url the job does not have. Once the bloom filter holds
+    `bloom_capacity` ids it stops answering and every url goes to the
+    database again, which stays the source of truth.
+    """
+
+    def __init__(
+        self, *, exact_capacity: int, bloom_capacity: int, error_rate: float
+    ) -> None:
+        self.exact_capacity = exact_capacity
+        self.bloom_capacity = bloom_capacity
+        self.error_rate = error_rate
+        self.exact: Optional[LruSet] = LruSet(exact_capacity)
+        self.bloom: Optional[BloomFilter] = None
+        self.hits = 0
+
+    def __contains__(self, url_id: str) -> bool:
+        if self.exact is not None:
+            seen = url_id in self.exact
+        elif self.bloom is not None and not self.bloom.is_full():
+            seen = url_id in self.bloom
+        else:
+            seen = False
+        if seen:
+            self.hits += 1
+        return seen
+
+    def add(self, url_id: str) -> None:
+        if self.exact is not None:
+            if url_id in self.exact or len(self.exact) < self.exact_capacity:
+                self.exact.add(url_id)
+                return
+            if self.bloom_capacity <= 0:
+                # no bloom filter, the exact set evicts its oldest id
+                self.exact.add(url_id)
+                return
+            self.bloom = BloomFilter(self.bloom_capacity, self.error_rate)
+            for known in self.exact:
+                self.bloom.add(known)
+            self.exact = None
+        if self.bloom is not None and not self.bloom.is_full():
+            self.bloom.add(url_id)
+
+
+class SeenUrlRegistry:
+    """The SeenUrls of the `max_jobs` most recently crawled jobs."""
+
+    def __init__(
+        self,
+        *,
+        max_jobs: int = 64,
+        exact_capacity: int = 10_000,
+        bloom_capacity: int = 1_000_000,
+        error_rate: float = 1e-4,
+    ) -> None:
+        self.max_jobs = max(1, max_jobs)
+        self.exact_capacity = exact_capacity
+        self.bloom_capacity = bloom_capacity
+        self.error_rate = error_rate
+        self._jobs: OrderedDict[tuple[UUID, int], SeenUrls] = OrderedDict()
+
+    def for_job(self, user_id: UUID, job_id: int) -> SeenUrls:
+        key = (user_id, job_id)
+        seen_urls = self._jobs.get(key)
+        if seen_urls is None:
+            seen_urls = SeenUrls(
+                exact_capacity=self.exact_capacity,
+                bloom_capacity=self.bloom_capacity,
+                error_rate=self.error_rate,
+            )
+            self._jobs[key] = seen_urls
+            if len(self._jobs) > self.max_jobs:
+                self._jobs.popitem(last=False)
+        else:
+            self._jobs.move_to_end(key)
+        return seen_urls
@@ -0,0 +1,157 @@
+import asyncio
+import json
+import logging
+from collections import Counter
+from typing import Any, NamedTuple, Optional
+from uuid import UUID
+
+from asyncpg import Connection
+
+from xtracted.crawler_configuration import CrawlerConfig
+from xtracted.metrics import DB_CALL_SECONDS, MESSAGES_ARCHIVED
+from xtracted.model import CrawlerUrl
+from xtracted.services.postgres_clients import PostgresClients
+
+logger = logging.getLogger('completion-writer')
+
+# the schema of job_urls has no completion time, a column added on demand
+SELECT_COMPLETED_AT = """select exists(select 1 from pg_attribute where attrelid = 'job_urls'::regclass and attname = 'completed_at' and not attisdropped)"""
+ADD_COMPLETED_AT = (
+    """alter table job_urls add column if not exists completed_at timestamptz"""
+)
+
+
+async def install_completed_at(conn: Connection) -> None:
+    """Adds `job_urls.completed_at`, the time a url was last completed.
+
+    The column is looked up first, the alter table would lock `job_urls`
+    exclusively even when it is already there.
+    """
+    if not await conn.fetchval(SELECT_COMPLETED_AT):
+        await conn.execute(ADD_COMPLETED_AT)
+
+
+class PendingCompletion(NamedTuple):
+    crawler_url: CrawlerUrl
+    msg_id: int | str
+    data: dict[str, Any]
+    future: asyncio.Future
+
+
+class PostgresCompletionWriter:
+    """Group commits url completions.
+
+    Completions are buffered until `crawler_complete_batch_size` of them are
+    waiting or `crawler_complete_flush_ms` elapsed since the first one, then
+    written with one statement per table. Callers wait until their batch is
+    committed, so a message is still only archived once its data is stored.
+
+    Rows are locked in key order, job_urls then api_requests, so batches
+    flushed concurrently by several processes cannot deadlock.
+    """
+
+    def __init__(self, config: CrawlerConfig, clients: PostgresClients) -> None:
+        self.config = config
+        self.clients = clients
+        self.batch_size = max(1, config.crawler_complete_batch_size)
+        self.flush_seconds = config.crawler_complete_flush_ms / 1000
+        self._pending: list[PendingCompletion] = []
+        self._batch_full = asyncio.Event()
+        self._flush_task: Optional[asyncio.Task] = None
+        self._completed_at_installed = False
+
+    async def complete(
+        self, crawler_url: CrawlerUrl, msg_id: int | str, data: dict[str, Any]
+    ) -> None:
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append(PendingCompletion(crawler_url, msg_id, data, future))
+        if len(self._pending) >= self.batch_size:
+            self._batch_full.set()
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_later())
+        await future
+
+    async def _flush_later(self) -> None:
+        try:
+            await asyncio.wait_for(self._batch_full.wait(), self.flush_seconds)
+        except asyncio.TimeoutError:
+            pass
+        await self.flush()
+
+    async def flush(self) -> None:
+        while self._pending:
+            batch = self._pending[: self.batch_size]
+            del self._pending[: self.batch_size]
+            if len(self._pending) < self.batch_size:
+                self._batch_full.clear()
+            try:
+                with DB_CALL_SECONDS.time(method='complete_batch'):
+                    await self._write(batch)
+            except Exception as e:
+                for pending in batch:
+                    if not pending.future.done():
+                        pending.future.set_exception(e)
+            else:
+                MESSAGES_ARCHIVED.inc(len(batch), reason='complete')
+                for pending in batch:
+                    if not pending.future.done():
+                        pending.future.set_result(None)
+
+    async def _write(self, batch: list[PendingCompletion]) -> None:
+        job_urls = json.dumps(
+            [
+                {
+                    'user_id': str(pending.crawler_url.user_id),
+                    'job_id': pending.crawler_url.job_id,
+                    'url_id': pending.crawler_url.url_id,
+                    'status': pending.crawler_url.status,
+                    'data': pending.data,
+                }
+                for pending in batch
+            ]
+        )
+        requests = Counter(pending.crawler_url.user_id for pending in batch)
+        user_ids = sorted(requests)
+        jobs = sorted(
+            {
+                (pending.crawler_url.user_id, pending.crawler_url.job_id)
+                for pending in batch
+            }
+        )
+        msg_ids = [pending.msg_id for pending in batch]
+
+        queue = await self.clients.queue()
+        async with self.clients.acquire() as conn:
+            if not self._completed_at_installed:
+                await install_completed_at(conn)
+                self._completed_at_installed = True
+            async with conn.transaction():
+                # the updates lock rows in plan order, lock them in key order first
+                await conn.execute(
+                    """select 1 from job_urls as j join json_populate_recordset(null::job_urls, $1::json) as c on j.job_id = c.job_id and j.user_id = c.user_id and j.url_id = c.url_id order by j.user_id, j.job_id, j.url_id for update of j""",
+                    job_urls,
+                )
+                await conn.execute(
+                    """select 1 from api_requests where user_id = any($1::uuid[]) order by user_id for update""",
+                    user_ids,
+                )
+                await conn.execute(
+                    """update job_urls as j set status = c.status, data = c.data, completed_at = now() from json_populate_recordset(null::job_urls, $1::json) as c where j.job_id = c.job_id and j.user_id = c.user_id and j.url_id = c.url_id""",
+                    job_urls,
+                )
+                await conn.execute(
+                    """update api_requests as a set requests = a.requests - c.completed from unnest($1::uuid[], $2::int[]) as c(user_id, completed) where a.user_id = c.user_id""",
+                    user_ids,
+                    [requests[user_id] for user_id in user_ids],
+                )
+                await queue.archive_batch('job_urls', msg_ids=msg_ids, conn=conn)
+            await self._update_last_fetched_urls(conn, jobs)
+        logger.debug(f'flushed {len(batch)} completions')
+
+    async def _update_last_fetched_urls(
+        self, conn: Connection, jobs: list[tuple[UUID, int]]
+    ) -> None:
+        await conn.executemany(
+            """insert into running_jobs(user_id,job_id,job_status,last_fetched_url) values($1, $2, 'running', now()) on conflict (user_id, job_id) do update set last_fetched_url=now()""",
+            jobs,
+        )
@@ -1,3 +1,4 @@
+import json
 from abc import ABC, abstractmethod
 from typing import Optional
 from uuid import UUID
@@ -5,7 +6,8 @@ from uuid import UUID
 from pydantic import HttpUrl
 
 from xtracted.crawler_configuration import CrawlerConfig
-from xtracted.model import CrawlerUrl, CrawlerUrlFactory
+from xtracted.model import CrawlerUrl, CrawlerUrlFactory, CrawlerUrlInput
+from xtracted.services.postgres_clients import PostgresClients
 
 
 class CrawlersService(ABC):
@@ -25,14 +27,34 @@ class CrawlersService(ABC):
     ) -> Optional[CrawlerUrl]:
         pass
 
+    @abstractmethod
+    async def add_crawler_urls(
+        self,
+        user_id: UUID,
+        job_id: int,
+        urls: list[HttpUrl | str],
+        *,
+        variant_depth: int = 0,
+        max_job_urls: Optional[int] = None,
+    ) -> list[CrawlerUrl]:
+        pass
+
+    @abstractmethod
+    async def existing_url_ids(
+        self, user_id: UUID, job_id: int, url_ids: list[str]
+    ) -> set[str]:
+        pass
+
 
 class PostgresCrawlersService(CrawlersService):
-    def __init__(self, config: CrawlerConfig) -> None:
+    def __init__(
+        self, config: CrawlerConfig, clients: Optional[PostgresClients] = None
+    ) -> None:
         self.config = config
+        self.clients = clients or PostgresClients(config)
 
     async def list_crawler_urls(self, user_id: UUID, job_id: int) -> list[CrawlerUrl]:
-        conn = await self.config.new_db_client()
-        try:
+        async with self.clients.acquire() as conn:
             async with conn.transaction():
                 return [
                     CrawlerUrl.from_record(record)
@@ -42,14 +64,11 @@ class PostgresCrawlersService(CrawlersService):
                         user_id,
                     )
                 ]
-        finally:
-            await conn.close()
 
     async def get_crawler_url(
         self, user_id: UUID, job_id: int, url_id: str
     ) -> Optional[CrawlerUrl]:
-        conn = await self.config.new_db_client()
-        try:
+        async with self.clients.acquire() as conn:
             record = await conn.fetchrow(
                 """select * from job_urls where user_id = $1 and job_id = $2 and url_id = $3""",
                 user_id,
@@ -59,59 +78,88 @@ class PostgresCrawlersService(CrawlersService):
             if record:
                 return CrawlerUrl.from_record(record)
             return None
-        finally:
-            await conn.close()
+
+    async def existing_url_ids(
+        self, user_id: UUID, job_id: int, url_ids: list[str]
+    ) -> set[str]:
+        """The `url_ids` the job already holds."""
+        async with self.clients.acquire() as conn:
+            records = await conn.fetch(
+                """select url_id from job_urls where user_id = $1 and job_id = $2 and url_id = any($3::text[])""",
+                user_id,
+                job_id,
+                url_ids,
+            )
+        return {record['url_id'] for record in records}
 
     async def add_crawler_url(
         self, user_id: UUID, job_id: int, url: HttpUrl | str
     ) -> Optional[CrawlerUrl]:
-        conn = await self.config.new_db_client()
-        input = CrawlerUrlFactory.new_url_input(
-            user_id=user_id,
-            job_id=job_id,
-            url=url,
-        )
-        if input:
-            try:
-                record = await conn.fetchrow(
-                    """select * from job_urls where user_id = $1 and job_id = $2 and url_id = $3""",
-                    input.user_id,
-                    input.job_id,
-                    input.url_id,
+        added = await self.add_crawler_urls(user_id=user_id, job_id=job_id, urls=[url])
+        return added[0] if added else None
+
+    async def add_crawler_urls(
+        self,
+        user_id: UUID,
+        job_id: int,
+        urls: list[HttpUrl | str],
+        *,
+        variant_depth: int = 0,
+        max_job_urls: Optional[int] = None,
+    ) -> list[CrawlerUrl]:
+        """Adds the urls the job does not have yet and enqueues them.
+
+        Unsupported urls are ignored. Returns the urls actually added, a url
+        already in the job, or added concurrently, is skipped by the insert.
+        With `max_job_urls`, urls past what the job may still hold are
+        dropped. `variant_depth` is passed on to the crawl of the new urls.
+        """
+        inputs: dict[str, CrawlerUrlInput] = {}
+        for url in urls:
+            input = CrawlerUrlFactory.new_url_input(
+                user_id=user_id,
+                job_id=job_id,
+                url=url,
+            )
+            if input and input.url_id not in inputs:
+                inputs[input.url_id] = input
+        if not inputs:
+            return []
+
+        rows = [
+            input.model_dump(
+                mode='json', include={'user_id', 'job_id', 'url_id', 'url', 'url_type'}
+            )
+            for input in inputs.values()
+        ]
+        async with self.clients.acquire() as conn:
+            queue = await self.clients.queue()
+            async with conn.transaction():
+                records = await conn.fetch(
+                    """insert into job_urls(user_id,job_id,url_id,url,job_urls_seq,url_type) select c.user_id, c.job_id, c.url_id, c.url, nextval($2), c.url_type from json_populate_recordset(null::job_urls, $1::json) with ordinality as c where $3::bigint is null or c.ordinality <= $3 - (select count(*) from job_urls where user_id = $4 and job_id = $5) order by c.ordinality on conflict do nothing returning *""",
+                    json.dumps(rows),
+                    f'job_urls_seq_{user_id}',
+                    max_job_urls,
+                    user_id,
+                    job_id,
                 )
-                if record:
-                    return None
-
-                queue = await self.config.new_pgmq_client()
-                async with conn.transaction():
-                    job_urls_seq = await conn.fetchval(
-                        """insert into job_urls(user_id,job_id,url_id,url,job_urls_seq,url_type) values($1,$2,$3,$4,nextval($5),$6) returning job_urls_seq""",
-                        input.user_id,
-                        input.job_id,
-                        input.url_id,
-                        str(input.url),
-                        f'job_urls_seq_{input.user_id}',
-                        input.url_type,
-                    )
-                    await queue.send(
+                if records:
+                    await queue.send_batch(
                         'job_urls',
-                        {
-                            'event': 'new_url',
-                            'job_id': input.job_id,
-                            'user_id': input.user_id,
-                            'url_id': input.url_id,
-                            'url': str(input.url),
-                        },
+                        [
+                            {
+                                'event': 'new_url',
+                                'job_id': record['job_id'],
+                                'user_id': str(record['user_id']),
+                                'url_type': record['url_type'],
+                                'url_id': record['url_id'],
+                                'url': record['url'],
+                                'retries': record['retries'],
+                                'job_urls_seq': record['job_urls_seq'],
+                                'variant_depth': variant_depth,
+                            }
+                            for record in records
+                        ],
                         conn=conn,
                     )
-                return CrawlerUrl(
-                    user_id=input.user_id,
-                    job_id=input.job_id,
-                    url_id=input.url_id,
-                    url=input.url,
-                    url_type=input.url_type,
-                    job_urls_seq=job_urls_seq,
-                )
-            finally:
-                await conn.close()
-        return None
+        return [CrawlerUrl.from_record(record) for record in records]
@@ -0,0 +1,56 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+from asyncpg import Connection, Pool
+from tembo_pgmq_python.async_queue import PGMQueue
+
+from xtracted.crawler_configuration import CrawlerConfig
+
+
+class PostgresClients:
+    """Postgres resources shared by the worker loops, the syncer and the services.
+
+    The pool is created on first use so that the owner can be built outside of
+    a running event loop.
+    """
+
+    def __init__(self, config: CrawlerConfig) -> None:
+        self.config = config
+        self._pool: Optional[Pool] = None
+        self._queue: Optional[PGMQueue] = None
+        self._lock = asyncio.Lock()
+        self._queue_lock = asyncio.Lock()
+
+    async def db_pool(self) -> Pool:
+        if self._pool is None:
+            async with self._lock:
+                if self._pool is None:
+                    self._pool = await self.config.new_db_pool()
+        return self._pool
+
+    async def queue(self) -> PGMQueue:
+        if self._queue is None:
+            async with self._queue_lock:
+                if self._queue is None:
+                    self._queue = await self.config.new_pgmq_client()
+        return self._queue
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[Connection]:
+        pool = await self.db_pool()
+        async with pool.acquire(
+            timeout=self.config.crawler_db_pool_acquire_timeout
+        ) as conn:
+            yield conn
+
+    async def close(self) -> None:
+        queue, self._queue = self._queue, None
+        # the queue client owns a pool of its own, created by PGMQueue.init()
+        queue_pool: Optional[Pool] = getattr(queue, 'pool', None)
+        if queue_pool is not None:
+            await queue_pool.close()
+
+        pool, self._pool = self._pool, None
+        if pool is not None:
+            await pool.close()
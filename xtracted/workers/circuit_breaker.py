@@ -0,0 +1,149 @@
+import logging
+import time
+from typing import Callable, Literal
+from urllib.parse import urlparse
+
+from pydantic import BaseModel
+
+logger = logging.getLogger('circuit-breaker')
+
+BreakerState = Literal['closed', 'open', 'half_open']
+
+
+class BreakerStats(BaseModel):
+    state: BreakerState
+    consecutive_blocks: int
+    times_opened: int
+    # seconds until an open breaker lets a probe through
+    retry_in_seconds: float
+
+
+class Breaker:
+    def __init__(self, cooldown_seconds: float) -> None:
+        self.state: BreakerState = 'closed'
+        self.consecutive_blocks = 0
+        self.times_opened = 0
+        self.cooldown_seconds = cooldown_seconds
+        self.open_until = 0.0
+        # urls admitted as probes since the breaker went half open
+        self.probes: set[str] = set()
+
+
+class CircuitBreakers:
+    """A circuit breaker per netloc, fed with the outcome of the crawls.
+
+    `threshold` consecutive blocked crawls open the breaker of a netloc: its
+    urls are deferred for `cooldown_seconds`. Then up to `half_open_probes`
+    urls are let through. A probe crawled fine closes the breaker, a blocked
+    one opens it again for twice as long, up to `max_cooldown_seconds`. Only
+    the probes decide: other crawls ending meanwhile were admitted before the
+    breaker opened.
+
+    Like the politeness scheduler, `admit` returns the seconds a url should
+    be deferred by, 0 when it may be crawled, and every admitted url must be
+    released once crawled.
+    """
+
+    def __init__(
+        self,
+        *,
+        threshold: int = 3,
+        cooldown_seconds: float = 60,
+        max_cooldown_seconds: float = 900,
+        half_open_probes: int = 1,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.threshold = max(1, threshold)
+        self.cooldown_seconds = cooldown_seconds
+        self.max_cooldown_seconds = max(cooldown_seconds, max_cooldown_seconds)
+        self.half_open_probes = max(1, half_open_probes)
+        self.clock = clock
+        self.breakers: dict[str, Breaker] = {}
+
+    @staticmethod
+    def netloc(url: str) -> str:
+        return urlparse(url).netloc
+
+    def _breaker(self, netloc: str) -> Breaker:
+        breaker = self.breakers.get(netloc)
+        if breaker is None:
+            breaker = Breaker(self.cooldown_seconds)
+            self.breakers[netloc] = breaker
+        return breaker
+
+    def _open(self, netloc: str, breaker: Breaker) -> None:
+        breaker.state = 'open'
+        breaker.probes.clear()
+        breaker.times_opened += 1
+        breaker.open_until = self.clock() + breaker.cooldown_seconds
+        logger.warning(
+            f'{netloc}: blocked {breaker.consecutive_blocks} times, pausing it for {breaker.cooldown_seconds}s'
+        )
+
+    def state(self, url: str) -> BreakerState:
+        breaker = self.breakers.get(self.netloc(url))
+        return breaker.state if breaker else 'closed'
+
+    def admit(self, url: str) -> float:
+        netloc = self.netloc(url)
+        breaker = self.breakers.get(netloc)
+        if breaker is None or breaker.state == 'closed':
+            return 0
+        if breaker.state == 'open':
+            wait = breaker.open_until - self.clock()
+            if wait > 0:
+                return wait
+            breaker.state = 'half_open'
+            logger.info(f'{netloc}: probing')
+        if len(breaker.probes) >= self.half_open_probes:
+            # wait for the probes in flight before sending more
+            return min(self.cooldown_seconds, breaker.cooldown_seconds)
+        breaker.probes.add(url)
+        return 0
+
+    def release(self, url: str) -> None:
+        breaker = self.breakers.get(self.netloc(url))
+        if breaker:
+            breaker.probes.discard(url)
+
+    def record_success(self, url: str) -> None:
+        netloc = self.netloc(url)
+        breaker = self.breakers.get(netloc)
+        if breaker is None or breaker.state == 'open':
+            return
+        if breaker.state == 'half_open':
+            if url not in breaker.probes:
+                return
+            logger.info(f'{netloc}: probe crawled fine, resuming')
+            breaker.probes.clear()
+        breaker.state = 'closed'
+        breaker.consecutive_blocks = 0
+        breaker.cooldown_seconds = self.cooldown_seconds
+
+    def record_blocked(self, url: str) -> None:
+        netloc = self.netloc(url)
+        breaker = self._breaker(netloc)
+        if breaker.state == 'half_open' and url not in breaker.probes:
+            return
+        breaker.consecutive_blocks += 1
+        if breaker.state == 'half_open':
+            breaker.cooldown_seconds = min(
+                breaker.cooldown_seconds * 2, self.max_cooldown_seconds
+            )
+            self._open(netloc, breaker)
+        elif breaker.state == 'closed' and breaker.consecutive_blocks >= self.threshold:
+            self._open(netloc, breaker)
+
+    def stats(self) -> dict[str, BreakerStats]:
+        now = self.clock()
+        return {
+            netloc: BreakerStats(
+                state=breaker.state,
+                consecutive_blocks=breaker.consecutive_blocks,
+                times_opened=breaker.times_opened,
+                retry_in_seconds=max(0, breaker.open_until - now)
+                if breaker.state == 'open'
+                else 0,
+            )
+            for netloc, breaker in self.breakers.items()
+        }
@@ -0,0 +1,162 @@
+import json
+import logging
+from typing import Any, Literal, NamedTuple, Optional
+
+from asyncpg import Connection
+from tembo_pgmq_python.messages import Message
+
+logger = logging.getLogger('fair-scheduler')
+
+FairKey = Literal['user', 'user_job']
+
+# arbitrary key serializing the index creation across workers
+INDEX_LOCK_KEY = 7_430_118
+
+# the key of the url messages sent without a user
+NO_USER_KEY = 'no-user'
+USER_KEY = f"""coalesce(message->>'user_id', '{NO_USER_KEY}')"""
+
+CREATE_USER_INDEX = f"""create index concurrently if not exists xtracted_job_urls_fair_user on pgmq.q_job_urls (({USER_KEY}), msg_id)"""
+# a failed concurrent build leaves an invalid index behind
+SELECT_INVALID_INDEX = """select not indisvalid from pg_index where indexrelid = to_regclass('pgmq.xtracted_job_urls_fair_user')"""
+DROP_INVALID_INDEX = (
+    """drop index concurrently if exists pgmq.xtracted_job_urls_fair_user"""
+)
+
+# loose index scan over the users having messages, then the oldest visible
+# messages of each of them
+SELECT_CANDIDATES = f"""with recursive users as ((select {USER_KEY} as user_id from pgmq.q_job_urls order by {USER_KEY} limit 1) union all select (select {USER_KEY} from pgmq.q_job_urls where {USER_KEY} > users.user_id order by {USER_KEY} limit 1) from users where users.user_id is not null) select heads.msg_id, heads.message from users cross join lateral (select msg_id, message from pgmq.q_job_urls where {USER_KEY} = users.user_id and vt <= clock_timestamp() order by msg_id limit $1) heads where users.user_id is not null"""
+
+# the vt condition is checked again once the row is locked, so a message
+# claimed by another worker in the meantime is skipped
+CLAIM_MESSAGES = """update pgmq.q_job_urls set vt = clock_timestamp() + make_interval(secs => $2), read_ct = read_ct + 1 where msg_id = any($1::bigint[]) and vt <= clock_timestamp() returning msg_id, read_ct, enqueued_at, vt, message"""
+
+
+class Candidate(NamedTuple):
+    msg_id: int
+    message: dict[str, Any]
+
+
+async def install_fair_index(conn: Connection) -> bool:
+    """Builds the index of the fair reads without blocking the enqueues.
+
+    Returns False when another worker holds the lock, i.e. is building it:
+    waiting for it inside a statement would hold up the concurrent build.
+    """
+    if not await conn.fetchval('select pg_try_advisory_lock($1)', INDEX_LOCK_KEY):
+        return False
+    try:
+        if await conn.fetchval(SELECT_INVALID_INDEX):
+            await conn.execute(DROP_INVALID_INDEX)
+        await conn.execute(CREATE_USER_INDEX)
+    finally:
+        await conn.execute('select pg_advisory_unlock($1)', INDEX_LOCK_KEY)
+    return True
+
+
+class FairScheduler:
+    """Deficit round robin over the users, or jobs, sharing `job_urls`.
+
+    Each round a key earns its weight in credits and spends one per message,
+    so a heavy job never delays another user by more than a round. A key
+    keeps its turn across reads until it runs out of credits, so small reads
+    still honour the weights. Weights come from the tier of the user,
+    unknown users and messages without a user get `default_tier`.
+    """
+
+    def __init__(
+        self,
+        *,
+        key: FairKey = 'user',
+        tier_weights: Optional[dict[str, float]] = None,
+        user_tiers: Optional[dict[str, str]] = None,
+        default_tier: str = 'default',
+    ) -> None:
+        self.key = key
+        self.tier_weights = tier_weights or {}
+        self.user_tiers = user_tiers or {}
+        self.default_tier = default_tier
+        self.deficits: dict[str, float] = {}
+        # keys in service order, the first one is served next
+        self.active: list[str] = []
+        # the first key once it earned its credits for the current turn
+        self.credited: Optional[str] = None
+        self._index_installed = False
+
+    @staticmethod
+    def _user_of(message: dict) -> str:
+        user_id = message.get('user_id')
+        return NO_USER_KEY if user_id is None else str(user_id)
+
+    def key_of(self, message: dict) -> str:
+        if self.key == 'user_job':
+            return f'{self._user_of(message)}/{message.get("job_id")}'
+        return self._user_of(message)
+
+    def weight_of(self, message: dict) -> float:
+        tier = self.user_tiers.get(self._user_of(message), self.default_tier)
+        return max(self.tier_weights.get(tier, 1.0), 0.01)
+
+    def _end_turn(self) -> None:
+        self.active.append(self.active.pop(0))
+        self.credited = None
+
+    def select(self, candidates: list[Candidate], qty: int) -> list[Candidate]:
+        """Picks up to `qty` candidates, oldest first within each key."""
+        backlog: dict[str, list[Candidate]] = {}
+        for candidate in sorted(candidates, key=lambda c: c.msg_id):
+            backlog.setdefault(self.key_of(candidate.message), []).append(candidate)
+
+        # a key with nothing waiting loses its turn and its credits
+        self.active = [key for key in self.active if key in backlog]
+        self.active += [key for key in backlog if key not in self.active]
+        self.deficits = {key: self.deficits.get(key, 0) for key in self.active}
+        if self.credited not in backlog:
+            self.credited = None
+
+        selected: list[Candidate] = []
+        while len(selected) < qty and any(backlog.values()):
+            key = self.active[0]
+            messages = backlog[key]
+            if messages and self.credited != key:
+                self.deficits[key] += self.weight_of(messages[0].message)
+                self.credited = key
+            while messages and self.deficits[key] >= 1 and len(selected) < qty:
+                selected.append(messages.pop(0))
+                self.deficits[key] -= 1
+            if len(selected) >= qty and self.deficits[key] >= 1:
+                # the turn goes on with the next read
+                break
+            if not messages and len(selected) < qty:
+                # it had fewer candidates than asked for, none is left
+                self.deficits[key] = 0
+            self._end_turn()
+        return selected
+
+    async def read(self, conn: Connection, *, vt: int, qty: int) -> list[Message]:
+        """Claims up to `qty` messages of `job_urls`, fairly across keys."""
+        if not self._index_installed:
+            self._index_installed = await install_fair_index(conn)
+        rows = await conn.fetch(SELECT_CANDIDATES, qty)
+        candidates = [
+            Candidate(row['msg_id'], json.loads(row['message'])) for row in rows
+        ]
+        selected = self.select(candidates, qty)
+        if not selected:
+            return []
+        claimed = await conn.fetch(
+            CLAIM_MESSAGES, [candidate.msg_id for candidate in selected], vt
+        )
+        logger.debug(
+            f'{len(claimed)}/{len(selected)} messages claimed out of {len(candidates)} candidates'
+        )
+        return [
+            Message(
+                msg_id=row['msg_id'],
+                read_ct=row['read_ct'],
+                enqueued_at=row['enqueued_at'],
+                vt=row['vt'],
+                message=json.loads(row['message']),
+            )
+            for row in sorted(claimed, key=lambda row: row['msg_id'])
+        ]
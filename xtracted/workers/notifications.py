@@ -0,0 +1,124 @@
+import asyncio
+import logging
+from typing import Optional
+
+from asyncpg import Connection
+
+from xtracted.crawler_configuration import CrawlerConfig
+
+logger = logging.getLogger('notifications')
+
+NOTIFY_CHANNEL = 'xtracted_queues'
+NOTIFIED_QUEUES = ('jobs', 'job_urls')
+# arbitrary key serializing the trigger installation across workers
+INSTALL_LOCK_KEY = 7_430_117
+
+# statement level, so a send_batch of thousands of urls notifies once
+CREATE_NOTIFY_FUNCTION = f"""create or replace function pgmq.xtracted_notify_queue() returns trigger language plpgsql as $$ begin perform pg_notify('{NOTIFY_CHANNEL}', substr(TG_TABLE_NAME, 3)); return null; end; $$"""
+SELECT_NOTIFIED_QUEUES = """select substr(c.relname, 3) from pg_trigger t join pg_class c on c.oid = t.tgrelid join pg_namespace n on n.oid = c.relnamespace where n.nspname = 'pgmq' and t.tgname = 'xtracted_notify'"""
+
+
+async def _missing_triggers(conn: Connection) -> list[str]:
+    notified = {row[0] for row in await conn.fetch(SELECT_NOTIFIED_QUEUES)}
+    return [queue_name for queue_name in NOTIFIED_QUEUES if queue_name not in notified]
+
+
+async def install_notify_triggers(conn: Connection) -> None:
+    """Notifies `NOTIFY_CHANNEL` with the queue name on every enqueue.
+
+    Creating a trigger locks its queue against enqueues, so the triggers
+    are only created when missing.
+    """
+    if not await _missing_triggers(conn):
+        return
+    async with conn.transaction():
+        await conn.execute('select pg_advisory_xact_lock($1)', INSTALL_LOCK_KEY)
+        # another worker may have installed them while we waited for the lock
+        missing = await _missing_triggers(conn)
+        if missing:
+            await conn.execute(CREATE_NOTIFY_FUNCTION)
+        for queue_name in missing:
+            await conn.execute(
+                f"""create trigger xtracted_notify after insert on pgmq.q_{queue_name} for each statement execute function pgmq.xtracted_notify_queue()"""
+            )
+
+
+async def seconds_until_visible(conn: Connection, queue_name: str) -> Optional[float]:
+    """Seconds until the next invisible message of `queue_name` is visible again.
+
+    Messages becoming visible, e.g. retried or deferred ones, are not
+    notified. None when no message is invisible.
+    """
+    return await conn.fetchval(
+        f"""select extract(epoch from min(vt) - clock_timestamp())::float from pgmq.q_{queue_name} where vt > clock_timestamp()"""
+    )
+
+
+class QueueNotifier:
+    """Wakes the worker loops when a message is sent to their queue.
+
+    Owns one dedicated connection LISTENing on `NOTIFY_CHANNEL`. Notifications
+    only shorten the wait: `wait` always returns after `timeout` seconds so
+    the loops keep polling, slowly, if a notification is ever lost.
+    """
+
+    def __init__(self, config: CrawlerConfig) -> None:
+        self.config = config
+        self.events = {queue_name: asyncio.Event() for queue_name in NOTIFIED_QUEUES}
+        self._conn: Optional[Connection] = None
+        self._lock = asyncio.Lock()
+
+    def _on_notification(
+        self, conn: Connection, pid: int, channel: str, payload: str
+    ) -> None:
+        event = self.events.get(payload)
+        if event:
+            event.set()
+
+    def _on_termination(self, conn: Connection) -> None:
+        logger.warning('notification connection lost, falling back to polling')
+        self._conn = None
+
+    def is_listening(self) -> bool:
+        return self._conn is not None and not self._conn.is_closed()
+
+    async def listen(self) -> bool:
+        """Connects the listener unless it already is, returns whether it is."""
+        if self.is_listening():
+            return True
+        async with self._lock:
+            if self.is_listening():
+                return True
+            conn: Optional[Connection] = None
+            try:
+                conn = await self.config.new_db_client()
+                await install_notify_triggers(conn)
+                await conn.add_listener(NOTIFY_CHANNEL, self._on_notification)
+                conn.add_termination_listener(self._on_termination)
+                self._conn = conn
+            except Exception as e:
+                logger.error(e)
+                if conn is not None:
+                    await conn.close()
+                return False
+        return True
+
+    def arm(self, queue_name: str) -> None:
+        """Forgets past notifications, call it right before reading the queue."""
+        self.events[queue_name].clear()
+
+    async def wait(self, queue_name: str, timeout: float) -> bool:
+        """Waits for a message on `queue_name`, returns False on timeout."""
+        try:
+            await asyncio.wait_for(self.events[queue_name].wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def close(self) -> None:
+        conn, self._conn = self._conn, None
+        if conn is not None and not conn.is_closed():
+            try:
+                await conn.remove_listener(NOTIFY_CHANNEL, self._on_notification)
+            finally:
+                await conn.close()
@@ -15,35 +15,170 @@
 
 
 import asyncio  # noqa: I001
+import math
+import signal
+import time
 from xtracted.xtracted_logging import logging
 from asyncpg import Connection
 from tembo_pgmq_python.async_queue import PGMQueue
 from tembo_pgmq_python.messages import Message
-from xtracted.context import PostgresCrawlSyncer
+from xtracted.context import CrawlListener, PostgresCrawlSyncer
 from xtracted.crawler_configuration import CrawlerConfig, CrawlerConfigFromDotEnv
+from xtracted.crawlers.browser_pool import BrowserPool
 from xtracted.crawlers.extractor_factory import Extractorfactory
+from xtracted.crawlers.http_fetcher import HttpFetcher
+from xtracted.crawlers.page_cache import PageCache
+from xtracted.crawlers.route_policy import RoutePolicy
+from xtracted.metrics import (
+    BROWSER_CONTEXTS_IN_USE,
+    BROWSERS,
+    BROWSERS_LAUNCHED,
+    BROWSERS_RECYCLED,
+    CRAWL_ERRORS,
+    CRAWL_SECONDS,
+    CRAWLS_IN_FLIGHT,
+    MESSAGES_DEFERRED,
+    MESSAGES_READ,
+    QUEUE_POLL_SECONDS,
+    QUEUE_READ_SECONDS,
+    MetricsServer,
+)
+from xtracted.model import CrawlerUrl
+from xtracted.retries import error_kind
+from xtracted.seen_urls import SeenUrlRegistry
+from xtracted.services.completion_writer import install_completed_at
+from xtracted.services.postgres_clients import PostgresClients
+from xtracted.workers.circuit_breaker import CircuitBreakers
+from xtracted.workers.fair_scheduler import FairScheduler
+from xtracted.workers.notifications import QueueNotifier, seconds_until_visible
+from xtracted.workers.politeness import PolitenessScheduler
+from xtracted.workers.visibility import VisibilityHeartbeat, set_visibility
 
 logger = logging.getLogger(__name__)
 
 
-class PGCrawlJobWorker:
+class PGCrawlJobWorker(CrawlListener):
     def __init__(self, config: CrawlerConfig) -> None:
-        crawl_syncer = PostgresCrawlSyncer(config)
         self.config = config
+        self.clients = PostgresClients(config)
+        self.crawl_syncer = PostgresCrawlSyncer(config, self.clients)
         self.tasks = set[asyncio.Task]()
+        self.polling_tasks = set[asyncio.Task]()
         self.crawling_tasks = set[asyncio.Task]()
-        self.extractor_factory = Extractorfactory(crawl_syncer)
+        # url messages read but neither crawling nor deferred yet
+        self.unstarted = set[int]()
+        # set whenever a crawl task ends and frees a slot
+        self.slot_freed = asyncio.Event()
+        self._completed_at_installed = False
+        self.heartbeat = VisibilityHeartbeat(
+            self.clients,
+            'job_urls',
+            vt=config.crawler_url_vt,
+            interval_seconds=config.crawler_url_heartbeat_seconds,
+        )
+        self.browser_pool = BrowserPool(
+            size=config.crawler_browser_pool_size,
+            max_pages_per_browser=config.crawler_browser_max_pages,
+        )
+        self.route_policy = RoutePolicy(
+            blocked_resource_types=set(config.crawler_block_resource_types),
+            blocked_domains=config.crawler_block_domains,
+            allowed_domains=config.crawler_allow_domains,
+        )
+        self.politeness = PolitenessScheduler(
+            config.crawler_politeness_default,
+            config.crawler_politeness_hosts,
+            saturated_defer_seconds=config.crawler_politeness_defer_seconds,
+        )
+        self.circuit_breakers = CircuitBreakers(
+            threshold=config.crawler_breaker_threshold,
+            cooldown_seconds=config.crawler_breaker_cooldown_seconds,
+            max_cooldown_seconds=config.crawler_breaker_max_cooldown_seconds,
+            half_open_probes=config.crawler_breaker_half_open_probes,
+        )
+        self.fair_scheduler = (
+            FairScheduler(
+                key=config.crawler_fair_key,
+                tier_weights=config.crawler_fair_tier_weights,
+                user_tiers=config.crawler_fair_user_tiers,
+            )
+            if config.crawler_fair_scheduling
+            else None
+        )
+        self.notifier = QueueNotifier(config) if config.crawler_listen_notify else None
+        self.http_fetcher = (
+            HttpFetcher(
+                timeout_seconds=config.crawler_http_timeout_seconds,
+                max_connections_per_host=config.crawler_http_max_connections_per_host,
+            )
+            if config.crawler_http_fast_path
+            else None
+        )
+        self.seen_urls = SeenUrlRegistry(
+            max_jobs=config.crawler_seen_urls_max_jobs,
+            exact_capacity=config.crawler_seen_urls_exact_capacity,
+            bloom_capacity=config.crawler_seen_urls_bloom_capacity,
+            error_rate=config.crawler_seen_urls_error_rate,
+        )
+        self.page_cache = (
+            PageCache(
+                config.crawler_page_cache_dir,
+                ttl_seconds=config.crawler_page_cache_ttl_seconds,
+                max_bytes=config.crawler_page_cache_max_bytes,
+            )
+            if config.crawler_page_cache_dir
+            else None
+        )
+        self.metrics_server = (
+            MetricsServer(
+                host=config.crawler_metrics_host,
+                port=config.crawler_metrics_port,
+                loop_lag_interval_seconds=config.crawler_loop_lag_interval_seconds,
+            )
+            if config.crawler_metrics_port
+            else None
+        )
+        if self.metrics_server:
+            BROWSERS.set_function(lambda: self.browser_pool.stats().browsers)
+            BROWSER_CONTEXTS_IN_USE.set_function(
+                lambda: self.browser_pool.stats().contexts_in_use
+            )
+            BROWSERS_LAUNCHED.set_function(
+                lambda: self.browser_pool.stats().browsers_launched
+            )
+            BROWSERS_RECYCLED.set_function(
+                lambda: self.browser_pool.stats().browsers_recycled
+            )
+        self.extractor_factory = Extractorfactory(
+            self.crawl_syncer,
+            self.browser_pool,
+            self.route_policy,
+            self.http_fetcher,
+            self.seen_urls,
+            config.crawler_variants_per_product,
+            self.page_cache,
+            self,
+        )
 
     def run(self) -> None:
         """Starts the worker"""
         task = asyncio.create_task(self.check_for_new_job_task())
         self.tasks.add(task)
+        self.polling_tasks.add(task)
         # task.add_done_callback(self.tasks.discard)
 
         task = asyncio.create_task(self.check_for_new_job_urls())
         self.tasks.add(task)
+        self.polling_tasks.add(task)
         # task.add_done_callback(self.tasks.discard)
 
+        task = asyncio.create_task(self.heartbeat.run())
+        self.tasks.add(task)
+
+        if self.metrics_server:
+            task = asyncio.create_task(self.metrics_server.run())
+            self.tasks.add(task)
+
         # await asyncio.gather(*self.tasks)
 
     async def start(self) -> None:
@@ -51,7 +186,42 @@ class PGCrawlJobWorker:
         for task in self.tasks:
             await task
 
+    async def drain(self, timeout: float) -> None:
+        """Stops reading messages and shuts down once the crawls in flight end.
+
+        Crawls still running after `timeout` seconds are cancelled, their
+        messages are released like those of the crawls never started, unless
+        the crawl already reported its outcome.
+        """
+        for task in self.polling_tasks:
+            if task.cancel():
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        if self.crawling_tasks:
+            logger.warning(
+                f'draining {len(self.crawling_tasks)} crawls, waiting up to {timeout}s'
+            )
+            _, pending = await asyncio.wait(self.crawling_tasks.copy(), timeout=timeout)
+            if pending:
+                logger.warning(f'{len(pending)} crawls did not finish in time')
+        await self.cancel()
+
+    async def _release_messages(self, msg_ids: list[int]) -> None:
+        """Makes `msg_ids` visible again right away, for another worker to crawl."""
+        if not msg_ids:
+            return
+        try:
+            async with self.clients.acquire() as conn:
+                released = await set_visibility(conn, 'job_urls', msg_ids, 0)
+            logger.info(f'{released} unfinished messages released')
+        except Exception as e:
+            logger.error(e)
+
     async def cancel(self) -> None:
+        # taken before the crawl tasks are cancelled and stop being tracked
+        unfinished = list(self.heartbeat.msg_ids | self.unstarted)
         for task in self.crawling_tasks.copy():
             if task.cancel():
                 try:
@@ -68,6 +238,50 @@ class PGCrawlJobWorker:
                 except asyncio.CancelledError:
                     pass
 
+        logger.debug(f'browser pool stats: {self.browser_pool.stats()}')
+        await self.browser_pool.close()
+        if self.http_fetcher:
+            await self.http_fetcher.close()
+        if self.notifier:
+            await self.notifier.close()
+        await self.crawl_syncer.flush()
+        await self._release_messages(unfinished)
+        await self.clients.close()
+
+    def on_complete(
+        self, crawler_url: CrawlerUrl, msg_id: int | str, fetched: bool = True
+    ) -> None:
+        # reported, so neither extended nor released any more
+        self.heartbeat.untrack(int(msg_id))
+        # a page served from the cache says nothing about the site
+        if fetched:
+            self.circuit_breakers.record_success(str(crawler_url.url))
+
+    def on_error(
+        self, crawler_url: CrawlerUrl, msg_id: int | str, error: Exception
+    ) -> None:
+        # its retry delay must not be overwritten by the heartbeat or a release
+        self.heartbeat.untrack(int(msg_id))
+        kind = error_kind(error)
+        CRAWL_ERRORS.inc(kind=kind)
+        if kind == 'blocked':
+            self.circuit_breakers.record_blocked(str(crawler_url.url))
+
+    def release(self, url: str) -> None:
+        """Gives back what admit took for `url`."""
+        self.politeness.release(url)
+        self.circuit_breakers.release(url)
+
+    def admit(self, url: str) -> float:
+        """Seconds to defer `url` by, 0 once both its breaker and host admit it."""
+        delay = self.circuit_breakers.admit(url)
+        if delay:
+            return delay
+        delay = self.politeness.admit(url)
+        if delay:
+            self.circuit_breakers.release(url)
+        return delay
+
     async def _log_job_error(self, error: Exception, db_client: Connection) -> None:
         logger.error(error)
 
@@ -76,49 +290,74 @@ class PGCrawlJobWorker:
 
         mapping = message.message
         mapping['retries'] = message.read_ct
+        url = mapping['url']
         extractor = self.extractor_factory.new_instance(
             message_id=message.msg_id, mapping=message.message
         )
 
         if extractor:
-            logger.debug(f'creating crawl task for url: {message.message["url"]}')
+            logger.debug(f'creating crawl task for url: {url}')
+            started = time.perf_counter()
             crawl_task = asyncio.create_task(extractor.crawl())
             self.crawling_tasks.add(crawl_task)
-            crawl_task.add_done_callback(self.crawling_tasks.discard)
+            CRAWLS_IN_FLIGHT.set(len(self.crawling_tasks))
+            self.heartbeat.track(message.msg_id)
+            crawl_task.add_done_callback(
+                lambda task: self._crawl_task_done(task, message.msg_id, url, started)
+            )
+        else:
+            self.release(url)
+
+    def _crawl_task_done(
+        self, task: asyncio.Task, msg_id: int, url: str, started: float
+    ) -> None:
+        self.crawling_tasks.discard(task)
+        CRAWLS_IN_FLIGHT.set(len(self.crawling_tasks))
+        CRAWL_SECONDS.observe(time.perf_counter() - started)
+        self.heartbeat.untrack(msg_id)
+        self.release(url)
+        self.slot_freed.set()
+
+    async def _defer_messages(
+        self, db_client: Connection, deferred: dict[int, list[int]]
+    ) -> None:
+        for delay, msg_ids in deferred.items():
+            await set_visibility(db_client, 'job_urls', msg_ids, delay)
+            MESSAGES_DEFERRED.inc(len(msg_ids))
+            logger.debug(f'{len(msg_ids)} messages deferred by {delay}s')
+
+    def free_slots(self) -> int:
+        return max(0, self.config.crawler_max_crawl_tasks - len(self.crawling_tasks))
 
     async def _handle_run_job_event(
         self, message: Message, queue: PGMQueue, db_client: Connection
     ) -> None:
         try:
+            if not self._completed_at_installed:
+                await install_completed_at(db_client)
+                self._completed_at_installed = True
             async with db_client.transaction():
                 job_id = message.message['job_id']
                 user_id = message.message['user_id']
-                # reset all
-                await db_client.execute(
-                    """update job_urls set data = NULL, created_at = now(), retries = 0, status = 'pending'::public.crawl_url_status where user_id = $1 and job_id=$2""",
+                variant_depth = message.message.get(
+                    'variant_depth', self.config.crawler_variant_depth
+                )
+                # an incremental run only recrawls the urls that are not
+                # complete, have no data, or were completed too long ago
+                incremental = message.message.get('mode') == 'incremental'
+                max_age_seconds = message.message.get(
+                    'max_age_seconds', self.config.crawler_incremental_max_age_seconds
+                )
+                # reset the urls and fan them out in a single statement
+                enqueued = await db_client.fetchval(
+                    """with reset as (update job_urls set data = NULL, created_at = now(), completed_at = NULL, retries = 0, status = 'pending'::public.crawl_url_status where user_id = $1 and job_id = $2 and (not $4::boolean or status <> 'complete'::public.crawl_url_status or data is null or completed_at is null or completed_at < now() - make_interval(secs => $5::int)) returning *) select count(*) from pgmq.send_batch('job_urls', array(select jsonb_build_object('event', 'new_url', 'job_id', job_id, 'user_id', user_id, 'url_type', url_type, 'url_id', url_id, 'url', url, 'retries', retries, 'job_urls_seq', job_urls_seq, 'variant_depth', $3::int) from reset order by job_urls_seq), 0)""",
                     user_id,
                     job_id,
+                    variant_depth,
+                    incremental,
+                    max_age_seconds,
                 )
-
-                async for record in db_client.cursor(
-                    'SELECT * from job_urls where job_id = $1 and user_id = $2',
-                    job_id,
-                    user_id,
-                ):
-                    await queue.send(
-                        'job_urls',
-                        {
-                            'event': 'new_url',
-                            'job_id': job_id,
-                            'user_id': user_id,
-                            'url_type': record['url_type'],
-                            'url_id': record['url_id'],
-                            'url': record['url'],
-                            'retries': record['retries'],
-                            'job_urls_seq': record['job_urls_seq'],
-                        },
-                        conn=db_client,
-                    )
+                logger.debug(f'job {job_id}: {enqueued} urls enqueued')
 
                 # change jobs status to running
                 await db_client.execute(
@@ -150,69 +389,193 @@ class PGCrawlJobWorker:
             self.crawl(message)
         except Exception as e:
             logger.error(e)
+            if message.msg_id not in self.heartbeat.msg_ids:
+                # no crawl task owns the host slot admitted for this message
+                self.release(message.message['url'])
             if message.read_ct >= 3:
                 await queue.archive('job_urls', msg_id=message.msg_id, conn=db_client)
 
+    async def read_messages(
+        self,
+        queue: PGMQueue,
+        db_client: Connection,
+        queue_name: str,
+        *,
+        vt: int,
+        qty: int,
+        max_poll_seconds: int,
+        poll_interval_ms: int,
+    ) -> list[Message]:
+        """Reads without polling when notifications are on, polls otherwise.
+
+        Url messages are claimed by the fair scheduler when it is enabled.
+        """
+        listening = self.notifier is not None and await self.notifier.listen()
+        if self.notifier and listening:
+            self.notifier.arm(queue_name)
+        if queue_name == 'job_urls' and self.fair_scheduler:
+            with QUEUE_READ_SECONDS.time(queue=queue_name):
+                messages = await self.fair_scheduler.read(db_client, vt=vt, qty=qty)
+        elif listening:
+            with QUEUE_READ_SECONDS.time(queue=queue_name):
+                messages = await queue.read_batch(
+                    queue_name, vt=vt, batch_size=qty, conn=db_client
+                )
+        else:
+            # mostly the wait for a message, kept apart from the reads
+            with QUEUE_POLL_SECONDS.time(queue=queue_name):
+                messages = await queue.read_with_poll(
+                    queue_name,
+                    vt=vt,
+                    qty=qty,
+                    max_poll_seconds=max_poll_seconds,
+                    poll_interval_ms=poll_interval_ms,
+                    conn=db_client,
+                )
+        messages = messages or []
+        MESSAGES_READ.inc(len(messages), queue=queue_name)
+        return messages
+
+    async def wait_for_messages(self, queue_name: str) -> None:
+        """Sleeps until `queue_name` is notified, read_with_poll already waited otherwise.
+
+        A notified wait ends early when an invisible message is due back.
+        """
+        if self.notifier and self.notifier.is_listening():
+            timeout = self.config.crawler_notify_fallback_poll_seconds
+            try:
+                async with self.clients.acquire() as db_client:
+                    visible_in = await seconds_until_visible(db_client, queue_name)
+                if visible_in is not None:
+                    timeout = min(timeout, visible_in)
+            except Exception as e:
+                logger.error(e)
+            await self.notifier.wait(queue_name, timeout)
+        elif queue_name == 'job_urls' and self.fair_scheduler:
+            await asyncio.sleep(self.config.crawler_url_poll_interval_ms / 1000)
+
+    async def wait_for_slot(self, timeout: float) -> None:
+        """Sleeps until a crawl ends or `timeout` seconds have passed."""
+        try:
+            await asyncio.wait_for(self.slot_freed.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
     async def check_for_new_job_task(self) -> None:
-        queue = await self.config.new_pgmq_client()
+        queue = await self.clients.queue()
 
         while True:
-            db_client = await self.config.new_db_client()
             try:
-                messages = await queue.read_with_poll(
-                    'jobs',
-                    vt=self.config.crawler_job_vt,
-                    qty=self.config.crawler_job_qty,
-                    max_poll_seconds=self.config.crawler_job_max_poll_seconds,
-                    poll_interval_ms=self.config.crawler_job_poll_interval_ms,
-                    conn=db_client,
-                )
+                async with self.clients.acquire() as db_client:
+                    messages = await self.read_messages(
+                        queue,
+                        db_client,
+                        'jobs',
+                        vt=self.config.crawler_job_vt,
+                        qty=self.config.crawler_job_qty,
+                        max_poll_seconds=self.config.crawler_job_max_poll_seconds,
+                        poll_interval_ms=self.config.crawler_job_poll_interval_ms,
+                    )
 
-                if messages:
-                    for msg in messages:
-                        if 'event' in msg.message and msg.message['event'] == 'run_job':
-                            await self._handle_run_job_event(msg, queue, db_client)
+                    if messages:
+                        for msg in messages:
+                            if (
+                                'event' in msg.message
+                                and msg.message['event'] == 'run_job'
+                            ):
+                                await self._handle_run_job_event(msg, queue, db_client)
+                if not messages:
+                    await self.wait_for_messages('jobs')
 
             except asyncio.CancelledError:
                 logger.warning('Check for new job task cancelled')
                 raise
-            finally:
-                await db_client.close()
 
     async def check_for_new_job_urls(self) -> None:
-        queue = await self.config.new_pgmq_client()
+        queue = await self.clients.queue()
 
         while True:
-            if len(self.crawling_tasks) >= self.config.crawler_max_crawl_tasks:
-                await asyncio.sleep(0.5)
-                logger.debug(
-                    f'Number of crawling tasks: {len(self.crawling_tasks)} -> sleeping ..'
-                )
-            else:
-                db_client = await self.config.new_db_client()
-                try:
-                    messages = await queue.read_with_poll(
+            try:
+                free_slots = self.free_slots()
+                if free_slots == 0:
+                    # nothing can be started, wait for a crawl to finish
+                    # rather than reading messages we would hold invisible
+                    logger.debug(
+                        f'Number of crawling tasks: {len(self.crawling_tasks)} -> waiting for a free slot ..'
+                    )
+                    self.slot_freed.clear()
+                    await self.slot_freed.wait()
+                    continue
+
+                # a crawl ending from now on ends the wait for a slot below
+                self.slot_freed.clear()
+                deferred: dict[int, list[int]] = {}
+                async with self.clients.acquire() as db_client:
+                    messages = await self.read_messages(
+                        queue,
+                        db_client,
                         'job_urls',
                         vt=self.config.crawler_url_vt,
-                        qty=self.config.crawler_url_qty,
+                        qty=min(free_slots, self.config.crawler_url_qty),
                         max_poll_seconds=self.config.crawler_url_max_poll_seconds,
                         poll_interval_ms=self.config.crawler_url_poll_interval_ms,
-                        conn=db_client,
                     )
                     logger.debug(f'polling: received {len(messages)} messages')
                     if messages:
+                        self.unstarted.update(msg.msg_id for msg in messages)
+                        # messages for a busy or blocked host go back to the
+                        # queue rather than holding a crawl slot
                         for msg in messages:
                             if (
                                 'event' in msg.message
                                 and msg.message['event'] == 'new_url'
                             ):
+                                delay = self.admit(msg.message['url'])
+                                if delay:
+                                    deferred.setdefault(math.ceil(delay), []).append(
+                                        msg.msg_id
+                                    )
+                                    continue
                                 await self._handle_new_url_event(msg, queue, db_client)
+                            self.unstarted.discard(msg.msg_id)
+                        await self._defer_messages(db_client, deferred)
+                        for msg_ids in deferred.values():
+                            self.unstarted.difference_update(msg_ids)
+                if not messages:
+                    await self.wait_for_messages('job_urls')
+                elif len(messages) == sum(map(len, deferred.values())):
+                    # reading right away would only defer more messages of
+                    # the same hosts, wait for a crawl to end or a deferral.
+                    # An open breaker defers by minutes, the other hosts
+                    # queued behind its messages must not wait that long
+                    await self.wait_for_slot(
+                        min(min(deferred), self.config.crawler_politeness_defer_seconds)
+                    )
 
-                except asyncio.CancelledError:
-                    logger.warning('Check for new url task cancelled')
-                    raise
-                finally:
-                    await db_client.close()
+            except asyncio.CancelledError:
+                logger.warning('Check for new url task cancelled')
+                raise
+
+
+async def main(config: CrawlerConfig) -> None:
+    """Runs a worker until SIGTERM or SIGINT, then drains it."""
+    worker = PGCrawlJobWorker(config=config)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop.set)
+
+    worker.run()
+    stopping = asyncio.create_task(stop.wait())
+    # the worker loops only end on an unexpected error
+    await asyncio.wait({stopping, *worker.tasks}, return_when=asyncio.FIRST_COMPLETED)
+    if stop.is_set():
+        logger.warning('stop signal received, draining')
+        await worker.drain(config.crawler_drain_timeout_seconds)
+    else:
+        stopping.cancel()
+        logger.error('a worker loop ended, exiting')
+        await worker.cancel()
 
 
 if __name__ == '__main__':
@@ -223,7 +586,15 @@ if __name__ == '__main__':
             'Max conccurrent crawling tasks', config.crawler_max_crawl_tasks
         )
     )
+    logger.info(
+        '{:30s} {:>10s}'.format('Listen/notify', str(config.crawler_listen_notify))
+    )
     logger.info('{:30s} {:10d}'.format('Url visibility timeout', config.crawler_url_vt))
+    logger.info(
+        '{:30s} {:10.1f}'.format(
+            'Url heartbeat in seconds', config.crawler_url_heartbeat_seconds
+        )
+    )
     logger.info('{:30s} {:10d}'.format('Url messages quantity', config.crawler_url_qty))
     logger.info(
         '{:30s} {:10d}'.format(
@@ -247,7 +618,29 @@ if __name__ == '__main__':
             'Job poll interval im ms', config.crawler_job_poll_interval_ms
         )
     )
+    logger.info(
+        '{:30s} {:10d}'.format('Browser pool size', config.crawler_browser_pool_size)
+    )
+    logger.info(
+        '{:30s} {:10d}'.format('Pages per browser', config.crawler_browser_max_pages)
+    )
+    logger.info(
+        '{:30s} {:10d}'.format('DB pool min size', config.crawler_db_pool_min_size)
+    )
+    logger.info(
+        '{:30s} {:10d}'.format('DB pool max size', config.crawler_db_pool_max_size)
+    )
+    logger.info(
+        '{:30s} {:>10s}'.format('HTTP fast path', str(config.crawler_http_fast_path))
+    )
+    logger.info(
+        '{:30s} {:10.1f}'.format(
+            'Drain timeout in seconds', config.crawler_drain_timeout_seconds
+        )
+    )
+    logger.info(
+        '{:30s} {:>10s}'.format('Metrics port', str(config.crawler_metrics_port))
+    )
     logger.info('*****************************************')
 
-    worker = PGCrawlJobWorker(config=config)
-    asyncio.run(worker.start())
+    asyncio.run(main(config))
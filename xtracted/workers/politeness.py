@@ -0,0 +1,130 @@
+import math
+import time
+from typing import Callable, Optional
+from urllib.parse import urlparse
+
+from pydantic import BaseModel
+
+from xtracted.model import HostPolicy
+
+# longest a message is ever pushed back, even for a host with no rate at all
+MAX_DEFER_SECONDS = 60
+
+
+class HostStats(BaseModel):
+    in_flight: int
+    admitted: int
+    deferred: int
+
+
+class TokenBucket:
+    def __init__(self, rate_per_second: float, capacity: int, now: float) -> None:
+        self.rate_per_second = rate_per_second
+        self.capacity = max(1, capacity)
+        self.tokens = float(self.capacity)
+        self.updated = now
+
+    def take(self, now: float) -> float:
+        """Takes a token, or returns the seconds until one is available."""
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self.updated) * self.rate_per_second
+        )
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        if self.rate_per_second <= 0:
+            return math.inf
+        return (1 - self.tokens) / self.rate_per_second
+
+
+class HostState:
+    def __init__(self, policy: HostPolicy, now: float) -> None:
+        self.policy = policy
+        self.bucket = TokenBucket(policy.rate_per_second, policy.burst, now)
+        self.in_flight = 0
+        self.admitted = 0
+        self.deferred = 0
+        # when the next message deferred for the host is due back
+        self.next_slot = now
+
+
+class PolitenessScheduler:
+    """Rate and concurrency limits per netloc.
+
+    `admit` either admits a url, which then counts as in flight until
+    `release`, or returns how many seconds the caller should defer it by.
+    Policies are matched on the host or any of its parent domains, so
+    `amazon.de` also covers `www.amazon.de`.
+
+    Deferred messages of a host are spread at its rate: the more of them
+    wait, the further back the next one is pushed, up to `MAX_DEFER_SECONDS`.
+    """
+
+    def __init__(
+        self,
+        default_policy: HostPolicy,
+        host_policies: Optional[dict[str, HostPolicy]] = None,
+        *,
+        saturated_defer_seconds: float = 2,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.default_policy = default_policy
+        self.host_policies = host_policies or {}
+        self.saturated_defer_seconds = saturated_defer_seconds
+        self.clock = clock
+        self.hosts: dict[str, HostState] = {}
+
+    @staticmethod
+    def netloc(url: str) -> str:
+        return urlparse(url).netloc
+
+    def policy_for(self, netloc: str) -> HostPolicy:
+        host = netloc.split(':')[0]
+        while host:
+            if host in self.host_policies:
+                return self.host_policies[host]
+            _, _, host = host.partition('.')
+        return self.default_policy
+
+    def _state(self, netloc: str) -> HostState:
+        state = self.hosts.get(netloc)
+        if state is None:
+            state = HostState(self.policy_for(netloc), self.clock())
+            self.hosts[netloc] = state
+        return state
+
+    def _defer(self, state: HostState, now: float, wait: float) -> float:
+        state.deferred += 1
+        rate = state.policy.rate_per_second
+        interval = 1 / rate if rate > 0 else MAX_DEFER_SECONDS
+        slot = max(now + min(wait, MAX_DEFER_SECONDS), state.next_slot)
+        state.next_slot = min(slot + interval, now + MAX_DEFER_SECONDS)
+        return min(slot - now, MAX_DEFER_SECONDS)
+
+    def admit(self, url: str) -> float:
+        state = self._state(self.netloc(url))
+        now = self.clock()
+        if state.in_flight >= state.policy.max_in_flight:
+            return self._defer(state, now, self.saturated_defer_seconds)
+        wait = state.bucket.take(now)
+        if wait > 0:
+            return self._defer(state, now, wait)
+        state.in_flight += 1
+        state.admitted += 1
+        return 0
+
+    def release(self, url: str) -> None:
+        state = self.hosts.get(self.netloc(url))
+        if state and state.in_flight > 0:
+            state.in_flight -= 1
+
+    def stats(self) -> dict[str, HostStats]:
+        return {
+            netloc: HostStats(
+                in_flight=state.in_flight,
+                admitted=state.admitted,
+                deferred=state.deferred,
+            )
+            for netloc, state in self.hosts.items()
+        }
@@ -0,0 +1,240 @@
+import asyncio  # noqa: I001
+from xtracted.xtracted_logging import logging
+import multiprocessing
+import os
+import queue
+import signal
+import time
+from multiprocessing.process import BaseProcess
+from multiprocessing.queues import Queue
+from types import FrameType
+from typing import Any, Optional
+
+from pydantic import BaseModel
+
+from xtracted.crawler_configuration import CrawlerConfig, CrawlerConfigFromDotEnv
+from xtracted.crawlers.browser_pool import BrowserPoolStats
+from xtracted.workers.pg_crawl_job_worker import PGCrawlJobWorker
+
+logger = logging.getLogger('supervisor')
+
+# a child dying faster than this after its start is restarted with a delay
+MIN_CHILD_UPTIME_SECONDS = 10
+RESTART_DELAY_SECONDS = 5
+STOP_TIMEOUT_SECONDS = 30
+
+
+class WorkerStats(BaseModel):
+    index: int
+    pid: int
+    max_crawl_tasks: int
+    crawling_tasks: int
+    browser_pool: BrowserPoolStats
+    # netlocs paused by their circuit breaker
+    open_circuits: list[str] = []
+
+
+class SupervisorStats(BaseModel):
+    workers: int
+    restarts: int
+    max_crawl_tasks: int
+    crawling_tasks: int
+    contexts_served: int
+    browsers_launched: int
+    open_circuits: list[str]
+
+
+def split_budget(total: int, processes: int) -> list[int]:
+    """Spreads `total` crawl tasks over `processes`, at least one each."""
+    share, remainder = divmod(max(total, processes), processes)
+    return [share + (1 if index < remainder else 0) for index in range(processes)]
+
+
+def aggregate_stats(stats: list[WorkerStats], restarts: int) -> SupervisorStats:
+    return SupervisorStats(
+        workers=len(stats),
+        restarts=restarts,
+        max_crawl_tasks=sum(s.max_crawl_tasks for s in stats),
+        crawling_tasks=sum(s.crawling_tasks for s in stats),
+        contexts_served=sum(s.browser_pool.contexts_served for s in stats),
+        browsers_launched=sum(s.browser_pool.browsers_launched for s in stats),
+        open_circuits=sorted({netloc for s in stats for netloc in s.open_circuits}),
+    )
+
+
+async def serve(index: int, config: CrawlerConfig, stats_queue: Queue) -> int:
+    """Runs a worker until SIGTERM, then drains it, returns the process exit code."""
+    worker = PGCrawlJobWorker(config)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop.set)
+
+    worker.run()
+    exit_code = 0
+    try:
+        while not stop.is_set():
+            try:
+                await asyncio.wait_for(
+                    stop.wait(), config.crawler_stats_interval_seconds
+                )
+            except asyncio.TimeoutError:
+                pass
+            stats_queue.put(
+                WorkerStats(
+                    index=index,
+                    pid=os.getpid(),
+                    max_crawl_tasks=config.crawler_max_crawl_tasks,
+                    crawling_tasks=len(worker.crawling_tasks),
+                    browser_pool=worker.browser_pool.stats(),
+                    open_circuits=[
+                        netloc
+                        for netloc, breaker in worker.circuit_breakers.stats().items()
+                        if breaker.state != 'closed'
+                    ],
+                ).model_dump()
+            )
+            # the worker loops only end on an unexpected error
+            failed = [task for task in worker.tasks if task.done()]
+            if failed:
+                logger.error(f'worker {index}: a worker loop ended, exiting')
+                exit_code = 1
+                break
+    finally:
+        if stop.is_set():
+            await worker.drain(config.crawler_drain_timeout_seconds)
+        else:
+            await worker.cancel()
+    return exit_code
+
+
+def run_worker(index: int, settings: dict[str, Any], stats_queue: Queue) -> None:
+    config = CrawlerConfig(**settings)
+    raise SystemExit(asyncio.run(serve(index, config, stats_queue)))
+
+
+class Supervisor:
+    """Runs `processes` workers, each with its own event loop and pools.
+
+    The global `crawler_total_crawl_tasks` budget is split across them.
+    SIGTERM and SIGINT are forwarded to every worker. A worker exiting on its
+    own is restarted.
+    """
+
+    def __init__(self, config: CrawlerConfig) -> None:
+        self.config = config
+        self.processes = config.crawler_processes or os.cpu_count() or 1
+        total = (
+            config.crawler_total_crawl_tasks
+            or self.processes * config.crawler_max_crawl_tasks
+        )
+        self.budget = split_budget(total, self.processes)
+        self.context = multiprocessing.get_context('spawn')
+        self.stats_queue: Queue = self.context.Queue()
+        self.children: dict[int, BaseProcess] = {}
+        self.started_at: dict[int, float] = {}
+        self.restart_at: dict[int, float] = {}
+        self.stats: dict[int, WorkerStats] = {}
+        self.restarts = 0
+        self.stopping = False
+
+    def start_child(self, index: int) -> None:
+        settings = self.config.model_dump()
+        settings['crawler_max_crawl_tasks'] = self.budget[index]
+        settings['crawler_politeness_default'] = (
+            self.config.crawler_politeness_default.share(index, self.processes)
+        ).model_dump()
+        settings['crawler_politeness_hosts'] = {
+            host: policy.share(index, self.processes).model_dump()
+            for host, policy in self.config.crawler_politeness_hosts.items()
+        }
+        if self.config.crawler_metrics_port:
+            settings['crawler_metrics_port'] = self.config.crawler_metrics_port + index
+        child = self.context.Process(
+            target=run_worker,
+            args=(index, settings, self.stats_queue),
+            name=f'crawl-worker-{index}',
+        )
+        child.start()
+        self.children[index] = child
+        self.started_at[index] = time.monotonic()
+        logger.info(
+            f'worker {index} started, pid {child.pid}, {self.budget[index]} crawl tasks'
+        )
+
+    def stop(self, signum: int, frame: Optional[FrameType]) -> None:
+        logger.warning(f'signal {signum} received, stopping workers')
+        self.stopping = True
+        for child in self.children.values():
+            if child.is_alive() and child.pid:
+                os.kill(child.pid, signal.SIGTERM)
+
+    def check_children(self) -> None:
+        now = time.monotonic()
+        for index, child in self.children.items():
+            if child.is_alive() or self.stopping:
+                continue
+            if index not in self.restart_at:
+                logger.error(f'worker {index} exited with code {child.exitcode}')
+                self.stats.pop(index, None)
+                uptime = now - self.started_at[index]
+                delay = (
+                    RESTART_DELAY_SECONDS if uptime < MIN_CHILD_UPTIME_SECONDS else 0
+                )
+                self.restart_at[index] = now + delay
+            if now >= self.restart_at[index]:
+                del self.restart_at[index]
+                self.restarts += 1
+                self.start_child(index)
+
+    def drain_stats(self) -> None:
+        while True:
+            try:
+                stats = WorkerStats(**self.stats_queue.get_nowait())
+            except queue.Empty:
+                return
+            self.stats[stats.index] = stats
+
+    def run(self) -> None:
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        for index in range(self.processes):
+            self.start_child(index)
+
+        last_report = time.monotonic()
+        while not self.stopping:
+            time.sleep(1)
+            self.check_children()
+            self.drain_stats()
+            if (
+                time.monotonic() - last_report
+                >= self.config.crawler_stats_interval_seconds
+            ):
+                last_report = time.monotonic()
+                logger.info(
+                    f'stats: {aggregate_stats(list(self.stats.values()), self.restarts)}'
+                )
+
+        # workers first drain their crawls in flight
+        deadline = (
+            time.monotonic()
+            + self.config.crawler_drain_timeout_seconds
+            + STOP_TIMEOUT_SECONDS
+        )
+        for index, child in self.children.items():
+            child.join(max(0, deadline - time.monotonic()))
+            if child.is_alive():
+                logger.error(f'worker {index} did not stop in time, killing it')
+                child.kill()
+                child.join()
+        logger.info('all workers stopped')
+
+
+if __name__ == '__main__':
+    config = CrawlerConfigFromDotEnv()
+    supervisor = Supervisor(config)
+    logger.info('************* SUPERVISOR CONFIG *************')
+    logger.info('{:30s} {:10d}'.format('Worker processes', supervisor.processes))
+    logger.info('{:30s} {:10d}'.format('Total crawl tasks', sum(supervisor.budget)))
+    logger.info('*********************************************')
+    supervisor.run()
@@ -0,0 +1,89 @@
+import asyncio
+import logging
+
+from asyncpg import Connection
+
+from xtracted.services.postgres_clients import PostgresClients
+
+logger = logging.getLogger('visibility')
+
+
+async def set_visibility(
+    conn: Connection,
+    queue_name: str,
+    msg_ids: list[int],
+    vt: int,
+    *,
+    extend_only: bool = False,
+) -> int:
+    """Makes `msg_ids` invisible for `vt` more seconds, in one round trip.
+
+    With `extend_only` a message already invisible for longer, e.g. one
+    waiting for a retry, keeps its visibility timeout.
+    Returns the number of messages still in the queue.
+    """
+    if not msg_ids:
+        return 0
+    if extend_only:
+        return await conn.fetchval(
+            f"""with extended as (update pgmq.q_{queue_name} set vt = greatest(vt, clock_timestamp() + make_interval(secs => $2)) where msg_id = any($1::bigint[]) returning 1) select count(*) from extended""",
+            msg_ids,
+            vt,
+        )
+    return await conn.fetchval(
+        """select count(*) from unnest($2::bigint[]) as ids(msg_id), lateral pgmq.set_vt($1, ids.msg_id, $3)""",
+        queue_name,
+        msg_ids,
+        vt,
+    )
+
+
+class VisibilityHeartbeat:
+    """Extends the visibility timeout of the messages being crawled.
+
+    Every `interval_seconds` the messages of all in-flight crawls are pushed
+    `vt` seconds into the future with a single statement, so a short visibility
+    timeout only matters once the worker stops beating.
+    """
+
+    def __init__(
+        self,
+        clients: PostgresClients,
+        queue_name: str,
+        *,
+        vt: int,
+        interval_seconds: float,
+    ) -> None:
+        self.clients = clients
+        self.queue_name = queue_name
+        self.vt = vt
+        self.interval_seconds = interval_seconds
+        self.msg_ids = set[int]()
+
+    def track(self, msg_id: int) -> None:
+        self.msg_ids.add(msg_id)
+
+    def untrack(self, msg_id: int) -> None:
+        self.msg_ids.discard(msg_id)
+
+    async def beat(self) -> int:
+        msg_ids = list(self.msg_ids)
+        if not msg_ids:
+            return 0
+        async with self.clients.acquire() as conn:
+            # a message failing meanwhile may have been delayed for a retry
+            extended = await set_visibility(
+                conn, self.queue_name, msg_ids, self.vt, extend_only=True
+            )
+        logger.debug(f'{self.queue_name}: extended {extended}/{len(msg_ids)} messages')
+        return extended
+
+    async def run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            try:
+                await self.beat()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(e)